@@ -0,0 +1,124 @@
+"""
+Process-wide aiohttp client shared by every apiCrm resolver.
+
+Streamlit runs each page through its own `asyncio.run(...)`, and an aiohttp session is
+bound to the event loop that created it. To keep a single connection pool (and its TLS
+handshakes, keep-alive sockets and DNS cache) alive across reruns, the session lives on a
+dedicated background event loop and callers hand their work over to it with `crm_client.run`.
+"""
+
+import os
+import atexit
+import asyncio
+import logging
+import threading
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+
+class CrmClientManager:
+    """
+    Owns one long-lived aiohttp ClientSession with a tuned TCPConnector.
+
+    Args:
+        limit: Total simultaneous connections in the pool
+        limit_per_host: Simultaneous connections to the CRM host
+        keepalive_timeout: Seconds an idle connection is kept open for reuse
+        ttl_dns_cache: Seconds DNS lookups are cached
+        total_timeout: Total timeout in seconds for a single request
+    """
+
+    def __init__(self, limit=None, limit_per_host=None, keepalive_timeout=None, ttl_dns_cache=None, total_timeout=None):
+        self.limit = limit if limit is not None else int(os.getenv('API_CRM_POOL_LIMIT', 100))
+        self.limit_per_host = limit_per_host if limit_per_host is not None else int(os.getenv('API_CRM_POOL_LIMIT_PER_HOST', 20))
+        self.keepalive_timeout = keepalive_timeout if keepalive_timeout is not None else float(os.getenv('API_CRM_KEEPALIVE_TIMEOUT', 60))
+        self.ttl_dns_cache = ttl_dns_cache if ttl_dns_cache is not None else int(os.getenv('API_CRM_DNS_TTL', 300))
+        self.total_timeout = total_timeout if total_timeout is not None else float(os.getenv('API_CRM_TIMEOUT', 300))
+
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+        self._session = None
+
+    @property
+    def loop(self):
+        """The background event loop that owns the shared session, started on first use."""
+        with self._lock:
+            if self._loop is None or self._loop.is_closed() or not self._thread.is_alive():
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=self._run_loop, args=(loop,), name='crm-client-loop', daemon=True)
+                thread.start()
+                self._loop, self._thread, self._session = loop, thread, None
+                logger.info("Started shared CRM client loop")
+            return self._loop
+
+    @staticmethod
+    def _run_loop(loop):
+        asyncio.set_event_loop(loop)
+        loop.run_forever()
+
+    async def _get_session(self):
+        """Return the shared session, creating it on the manager loop if needed."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=self.ttl_dns_cache,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.total_timeout)
+            )
+            logger.info(f"Created shared CRM session (limit={self.limit}, limit_per_host={self.limit_per_host})")
+        return self._session
+
+    async def run(self, handler):
+        """
+        Await `handler(session)` on the manager loop and return its result.
+
+        Safe to call from any event loop, including the throwaway loops created by asyncio.run.
+
+        Args:
+            handler: Callable receiving the shared ClientSession and returning an awaitable
+        """
+        loop = self.loop
+
+        async def _call():
+            session = await self._get_session()
+            return await handler(session)
+
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+
+        if running_loop is loop:
+            return await _call()
+
+        future = asyncio.run_coroutine_threadsafe(_call(), loop)
+        return await asyncio.wrap_future(future)
+
+    def close(self):
+        """Close the shared session and stop the background loop."""
+        with self._lock:
+            loop, thread, session = self._loop, self._thread, self._session
+            self._loop, self._thread, self._session = None, None, None
+
+        if loop is None or loop.is_closed():
+            return
+
+        try:
+            if session is not None and not session.closed:
+                asyncio.run_coroutine_threadsafe(session.close(), loop).result(timeout=5)
+        except Exception as e:
+            logger.error(f"Error closing shared CRM session: {str(e)}")
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join(timeout=5)
+            loop.close()
+
+
+crm_client = CrmClientManager()
+atexit.register(crm_client.close)
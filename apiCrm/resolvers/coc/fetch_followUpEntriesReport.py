@@ -1,7 +1,8 @@
 import asyncio
 import logging
 from typing import List, Dict
-from ..fetch_graphql import fetch_graphql
+from ..paginator import fetch_all_pages
+from ..client_session import crm_client
 from dotenv import load_dotenv
 import os
 from datetime import datetime
@@ -57,55 +58,12 @@ async def fetch_followUpEntriesReport(session, start_date: str, end_date: str) -
     
     logger.info(f"Attempting to fetch follow-ups entries report from {start_date} to {end_date}")
     
-    data = await fetch_graphql(session, api_url, query, variables)
-    
-    if data is None or 'errors' in data:
-        error_msg = data.get('errors', [{'message': 'Unknown error'}])[0]['message'] if data else 'No data returned'
-        logger.error(f"Failed initial follow-ups entries report fetch: {error_msg}")
+    followUpEntries = await fetch_all_pages(session, api_url, query, variables, 'followUpEntriesReport')
+    if followUpEntries is None:
         return all_followUpEntries  # Return empty list on initial failure
     
     try:
-        if 'data' in data and 'followUpEntriesReport' in data['data']:
-            # Process first page
-            followUpEntries = data['data']['followUpEntriesReport']['data']
-            meta = data['data']['followUpEntriesReport']['meta']
-            
-            # Transform first page of data
-            page_transformed = process_followUpEntries_data(followUpEntries, start_date, end_date)
-            all_followUpEntries.extend(page_transformed)
-            
-            last_page = meta.get('lastPage', 1)
-            total_records = meta.get('total', 0)
-            
-            logger.info(f"Successfully fetched page 1/{last_page}, got {len(followUpEntries)} followUpEntries out of approximately {total_records}")
-            
-            # If we have more pages, fetch them
-            if last_page > 1:
-                for page in range(2, last_page + 1):
-                    variables['currentPage'] = page
-                    page_data = await fetch_graphql(session, api_url, query, variables)
-                    
-                    if page_data is None or 'errors' in page_data:
-                        error_msg = page_data.get('errors', [{'message': 'Unknown error'}])[0]['message'] if page_data else 'No data returned'
-                        logger.error(f"Failed to fetch followUpEntries on page {page}/{last_page}. Error: {error_msg}")
-                        continue
-                    
-                    if 'data' in page_data and 'followUpEntriesReport' in page_data['data']:
-                        page_followUpEntries = page_data['data']['followUpEntriesReport']['data']
-                        
-                        # Transform data for this page
-                        page_transformed = process_followUpEntries_data(page_followUpEntries, start_date, end_date)
-                        all_followUpEntries.extend(page_transformed)
-                        
-                        logger.info(f"Successfully fetched page {page}/{last_page}, got {len(page_followUpEntries)} followUpEntries")
-                    else:
-                        logger.error(f"Unexpected API response structure on page {page}: {page_data}")
-                    
-                    # Add a delay between requests to avoid rate limiting
-                    await asyncio.sleep(0.5)
-        else:
-            logger.error(f"Unexpected API response structure: {data}")
-    
+        all_followUpEntries.extend(process_followUpEntries_data(followUpEntries, start_date, end_date))
     except Exception as e:
         logger.error(f"Error processing followUpEntries data: {str(e)}")
     
@@ -131,7 +89,7 @@ def process_followUpEntries_data(followUpEntries, start_date, end_date):
 
 async def fetch_and_process_followUpEntriesReport(start_date: str, end_date: str) -> List[Dict]:
     """
-    Creates a session and fetches follow-up entries report data.
+    Fetches follow-up entries report data using the shared CRM client session.
     
     Args:
         start_date: Start date in ISO format (YYYY-MM-DD)
@@ -140,9 +98,4 @@ async def fetch_and_process_followUpEntriesReport(start_date: str, end_date: str
     Returns:
         List of processed follow-up entries report dictionaries ready for database insertion
     """
-    import aiohttp
-    
-    async with aiohttp.ClientSession() as session:
-        followUpEntries = await fetch_followUpEntriesReport(session, start_date, end_date)
-    
-    return followUpEntries
+    return await crm_client.run(lambda session: fetch_followUpEntriesReport(session, start_date, end_date))
@@ -1,7 +1,8 @@
 import asyncio
 import logging
 from typing import List, Dict
-from ..fetch_graphql import fetch_graphql
+from ..paginator import fetch_all_pages
+from ..client_session import crm_client
 from dotenv import load_dotenv
 import os
 from datetime import datetime
@@ -57,55 +58,12 @@ async def fetch_leadsByUserReport(session, start_date: str, end_date: str) -> Li
         'perPage': 20
     }
     
-    data = await fetch_graphql(session, api_url, query, variables)
-    
-    if data is None or 'errors' in data:
-        error_msg = data.get('errors', [{'message': 'Unknown error'}])[0]['message'] if data else 'No data returned'
-        logger.error(f"Failed initial leads by user report fetch: {error_msg}")
+    leads_data = await fetch_all_pages(session, api_url, query, variables, 'leadsByUserReport')
+    if leads_data is None:
         return all_leads  # Return empty list on initial failure
     
     try:
-        if 'data' in data and 'leadsByUserReport' in data['data']:
-            # Process first page
-            leads_data = data['data']['leadsByUserReport']['data']
-            meta = data['data']['leadsByUserReport']['meta']
-            
-            # Transform first page of data
-            page_transformed = process_leads_data(leads_data, start_date, end_date)
-            all_leads.extend(page_transformed)
-            
-            last_page = meta.get('lastPage', 1)
-            total_records = meta.get('total', 0)
-            
-            logger.info(f"Successfully fetched page 1/{last_page}, got {len(leads_data)} leads out of approximately {total_records}")
-            
-            # If we have more pages, fetch them
-            if last_page > 1:
-                for page in range(2, last_page + 1):
-                    variables['currentPage'] = page
-                    page_data = await fetch_graphql(session, api_url, query, variables)
-                    
-                    if page_data is None or 'errors' in page_data:
-                        error_msg = page_data.get('errors', [{'message': 'Unknown error'}])[0]['message'] if page_data else 'No data returned'
-                        logger.error(f"Failed to fetch leads by user report on page {page}/{last_page}. Error: {error_msg}")
-                        continue
-                    
-                    if 'data' in page_data and 'leadsByUserReport' in page_data['data']:
-                        page_leads = page_data['data']['leadsByUserReport']['data']
-                        
-                        # Transform data for this page
-                        page_transformed = process_leads_data(page_leads, start_date, end_date)
-                        all_leads.extend(page_transformed)
-                        
-                        logger.info(f"Successfully fetched page {page}/{last_page}, got {len(page_leads)} leads")
-                    else:
-                        logger.error(f"Unexpected API response structure on page {page}: {page_data}")
-                    
-                    # Add a delay between requests to avoid rate limiting
-                    await asyncio.sleep(0.5)
-        else:
-            logger.error(f"Unexpected API response structure: {data}")
-    
+        all_leads.extend(process_leads_data(leads_data, start_date, end_date))
     except Exception as e:
         logger.error(f"Error processing leads by user report data: {str(e)}")
     
@@ -147,7 +105,7 @@ def process_leads_data(leads, start_date, end_date):
 
 async def fetch_and_process_leadsByUserReport(start_date: str, end_date: str) -> List[Dict]:
     """
-    Creates a session and fetches leads by user report data.
+    Fetches leads by user report data using the shared CRM client session.
     
     Args:
         start_date: Start date in ISO format (YYYY-MM-DD)
@@ -156,9 +114,4 @@ async def fetch_and_process_leadsByUserReport(start_date: str, end_date: str) ->
     Returns:
         List of processed leads by user report dictionaries ready for database insertion
     """
-    import aiohttp
-    
-    async with aiohttp.ClientSession() as session:
-        leadsByUserReport = await fetch_leadsByUserReport(session, start_date, end_date)
-    
-    return leadsByUserReport
+    return await crm_client.run(lambda session: fetch_leadsByUserReport(session, start_date, end_date))
@@ -0,0 +1,122 @@
+"""
+Column-oriented output for the CRM resolvers.
+
+The views turn every report into a DataFrame right away, so materializing a Python dict per
+row first only costs memory and time. Report rows are kept as Arrow tables while they are
+read from the cache, merged and de-duplicated, and converted once into what the caller asked
+for: 'records' (List[Dict], the default), 'columns' (Dict[str, List]) or 'dataframe'. The
+resolvers hand the cache {column: values} built by their transform, so a report fetched as
+'columns' or 'dataframe' never has a dict per row.
+"""
+
+import logging
+from typing import Dict, List, Optional, Union
+import pandas as pd
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - pyarrow ships with streamlit
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+OUTPUT_FORMATS = ('records', 'columns', 'dataframe')
+
+
+def validate_output(output: str) -> str:
+    if output not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format '{output}', expected one of {list(OUTPUT_FORMATS)}")
+    return output
+
+
+def as_records(rows: Union[List[Dict], Dict[str, List]]) -> List[Dict]:
+    """Report rows as one dict per row, whether they are records or {column: values}."""
+    if isinstance(rows, dict):
+        return [dict(zip(rows, values)) for values in zip(*rows.values())]
+    return rows
+
+
+def rows_to_table(rows: Union[List[Dict], Dict[str, List]]):
+    """
+    Arrow table from report rows, or None when pyarrow is missing or cannot type a column.
+
+    Args:
+        rows: {column: values}, as the transforms build them, or a list of dicts
+    """
+    if pa is None:
+        return None
+    if not isinstance(rows, dict):
+        rows = rows_to_output(rows, 'columns')
+    try:
+        return pa.Table.from_pydict(rows)
+    except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+        logger.warning(f"Could not convert report rows to Arrow: {str(e)}")
+        return None
+
+
+def concat_tables(tables: List):
+    """Concatenates day or shard tables, unifying columns that are missing or typed differently."""
+    tables = [table for table in tables if table is not None]
+    if not tables:
+        return pa.table({})
+    return pa.concat_tables(tables, promote_options='permissive')
+
+
+def dedupe_table(table, id_key: Optional[str]):
+    """Keeps the first row for every id, rows without an id are kept (see sharding.dedupe_by_id)."""
+    if id_key is None or id_key not in table.column_names:
+        return table
+    seen = set()
+    keep = []
+    for row_id in table.column(id_key).to_pylist():
+        if row_id in (None, ''):
+            keep.append(True)
+        elif row_id in seen:
+            keep.append(False)
+        else:
+            seen.add(row_id)
+            keep.append(True)
+    if all(keep):
+        return table
+    return table.filter(pa.array(keep))
+
+
+def table_to_output(table, output: str = 'records') -> Union[List[Dict], Dict[str, List], pd.DataFrame]:
+    """Converts an Arrow table into the requested output format."""
+    if output == 'dataframe':
+        return table.to_pandas()
+    if output == 'columns':
+        return table.to_pydict()
+    return table.to_pylist()
+
+
+def rows_to_output(rows: Union[List[Dict], Dict[str, List]], output: str = 'records') -> Union[List[Dict], Dict[str, List], pd.DataFrame]:
+    """Converts report rows into the requested output format without going through Arrow."""
+    if isinstance(rows, dict):
+        if output == 'records':
+            return as_records(rows)
+        return pd.DataFrame(rows) if output == 'dataframe' else rows
+    if output == 'dataframe':
+        return pd.DataFrame(rows)
+    if output == 'columns':
+        columns = {}
+        for row in rows:
+            for key in row:
+                columns.setdefault(key, None)
+        return {key: [row.get(key) for row in rows] for key in columns}
+    return rows
+
+
+def add_constant_columns(rows: Union[List[Dict], Dict[str, List], pd.DataFrame], values: Dict) -> Union[List[Dict], Dict[str, List], pd.DataFrame]:
+    """
+    Adds columns holding the same value on every row, to rows in any output format.
+
+    Used for values that depend on the request rather than on the CRM rows, which therefore
+    cannot be part of what report_cache stores per day.
+    """
+    if isinstance(rows, pd.DataFrame):
+        return rows.assign(**values)
+    if isinstance(rows, dict):
+        count = len(next(iter(rows.values()), []))
+        return {**rows, **{key: [value] * count for key, value in values.items()}}
+    return [{**row, **values} for row in rows]
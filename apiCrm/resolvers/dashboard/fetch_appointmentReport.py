@@ -5,8 +5,14 @@ python -m apiCrm.tests.fetch_appointmentReport_test
 
 import asyncio
 import logging
-from typing import List, Dict
-from ..fetch_graphql import fetch_graphql
+from typing import List, Dict, Optional, Union
+import pandas as pd
+from ..paginator import _record_failure, fetch_all_pages
+from ..client_session import crm_client
+from ..report_cache import report_cache
+from ..sharding import fetch_sharded
+from ..incremental_sync import fetch_incremental
+from ..transformer import Coalesce, Const, Field, Join, Transformer
 from dotenv import load_dotenv
 import os
 from datetime import datetime
@@ -14,7 +20,125 @@ from datetime import datetime
 load_dotenv()
 logger = logging.getLogger(__name__)
 
-async def fetch_appointmentReport(session, start_date: str, end_date: str) -> List[Dict]:
+# GraphQL fields (dotted paths) each output column of process_appointments_data is built from
+APPOINTMENT_COLUMN_FIELDS = {
+    'ID agendamento': ['id'],
+    'ID cliente': ['customer.id'],
+    'Nome cliente': ['customer.name'],
+    'CPF': ['customer.taxvatFormatted'],
+    'Email': ['customer.email'],
+    'Telefone': ['customer.telephones.number'],
+    'Endereço': ['customer.addressLine'],
+    'Fonte de cadastro do cliente': ['customer.source.title'],
+    'Unidade do agendamento': ['store.name'],
+    'Procedimento': ['procedure.name'],
+    'Prestador': ['employee.name'],
+    'Grupo do procedimento': ['procedure.groupLabel'],
+    'Data': ['startDate'],
+    'Hora': [],
+    'Status': ['status.label'],
+    'Duração': [],
+    'Máquina': [],
+    'Data primeira atendente': ['oldestParent.createdAt', 'updatedAt'],
+    'Nome da primeira atendente': ['oldestParent.createdBy.name', 'createdBy.name'],
+    'Grupo da primeira atendente': ['oldestParent.createdBy.group.name', 'createdBy.group.name'],
+    'Observação (mais recente)': ['comments.comment'],
+    'Última data de alteração do status': ['updatedAt'],
+    'Último usuário a alterar o status': ['updatedBy.name'],
+    'Possui evolução?': ['latestProgressComment.comment'],
+    'Comentário mais recente da evolução': ['latestProgressComment.comment'],
+    'Data mais recente da evolução': ['latestProgressComment.createdAt'],
+    'Usuário mais recente da evolução': ['latestProgressComment.user.name'],
+    'Tem foto do lote?': ['batchPhotoUrl'],
+    'Tem foto do antes?': ['beforePhotoUrl'],
+    'Tem foto do depois?': ['afterPhotoUrl'],
+}
+
+# Requested by the full query although no output column uses them
+APPOINTMENT_EXTRA_FIELDS = ['endDate', 'status.code']
+
+def resolve_appointment_columns(columns: Optional[List[str]] = None) -> Optional[List[str]]:
+    """
+    Validates a column projection and makes sure 'ID agendamento' is part of it.
+
+    Args:
+        columns: Output columns a view needs, None for all of them
+
+    Returns:
+        Ordered list of unique columns, or None for all of them
+    """
+    if columns is None:
+        return None
+    unknown = [column for column in columns if column not in APPOINTMENT_COLUMN_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown appointment columns: {unknown}")
+    return list(dict.fromkeys(['ID agendamento', *columns]))
+
+def _render_selection(tree: Dict, indent: int) -> str:
+    lines = []
+    for field, children in tree.items():
+        if children:
+            lines.append(f"{' ' * indent}{field} {{")
+            lines.append(_render_selection(children, indent + 4))
+            lines.append(f"{' ' * indent}}}")
+        else:
+            lines.append(f"{' ' * indent}{field}")
+    return '\n'.join(lines)
+
+def build_appointments_query(columns: Optional[List[str]] = None, date_filter: str = 'startDateRange') -> str:
+    """
+    Builds an appointmentsReport query selecting only the fields the given columns need.
+
+    Args:
+        columns: Output columns a view needs, None for every column
+        date_filter: Date range filter, 'startDateRange', 'createdAtRange' or 'updatedAtRange'
+
+    Returns:
+        GraphQL query string
+    """
+    columns = resolve_appointment_columns(columns)
+    if columns is None:
+        paths = [path for fields in APPOINTMENT_COLUMN_FIELDS.values() for path in fields] + APPOINTMENT_EXTRA_FIELDS
+    else:
+        paths = [path for column in columns for path in APPOINTMENT_COLUMN_FIELDS[column]]
+
+    tree = {}
+    for path in paths:
+        node = tree
+        for field in path.split('.'):
+            node = node.setdefault(field, {})
+
+    return f'''
+    query AppointmentsReport($start: Date!, $end: Date!, $currentPage: Int!, $perPage: Int!) {{
+        appointmentsReport(
+            filters: {{ {date_filter}: {{ start: $start, end: $end }} }}
+            pagination: {{ currentPage: $currentPage, perPage: $perPage }}
+        ) {{
+            data {{
+{_render_selection(tree, 16)}
+            }}
+            meta {{
+                currentPage
+                perPage
+                lastPage
+                total
+            }}
+        }}
+    }}
+    '''
+
+def appointments_cache_key(columns: Optional[List[str]] = None, date_filter: str = 'startDateRange'):
+    """Cache identity of a projection: the generated query plus the transform that consumes it."""
+    return (build_appointments_query(columns, date_filter), APPOINTMENTS_TRANSFORM.select(resolve_appointment_columns(columns)).signature)
+
+async def fetch_appointmentReport(
+    session,
+    start_date: str,
+    end_date: str,
+    date_filter: str = 'startDateRange',
+    columns: Optional[List[str]] = None,
+    output: str = 'records',
+) -> Union[List[Dict], Dict[str, List]]:
     """
     Fetches appointment report data from the CRM API within a specified date range.
     
@@ -22,640 +146,201 @@ async def fetch_appointmentReport(session, start_date: str, end_date: str) -> Li
         session: The aiohttp ClientSession object
         start_date: Start date in ISO format (YYYY-MM-DD)
         end_date: End date in ISO format (YYYY-MM-DD)
+        date_filter: Date range filter the range applies to, 'startDateRange', 'createdAtRange' or 'updatedAtRange'
+        columns: Output columns to fetch and return, None for all of them
+        output: 'records' (list of dicts) or 'columns' (dict of lists)
         
     Returns:
-        List of appointment report dictionaries
+        Appointment report rows in the requested output format
     """
-    current_page = 1
     all_appointments = []
     api_url = os.getenv('API_CRM_URL', 'https://open-api.eprocorpo.com.br/graphql')
-
-    # Updated query with correct pagination parameters
-    query = '''
-    query AppointmentsReport($start: Date!, $end: Date!, $currentPage: Int!, $perPage: Int!) {
-        appointmentsReport(
-            filters: { startDateRange: { start: $start, end: $end } }
-            pagination: { currentPage: $currentPage, perPage: $perPage }
-        ) {
-            data {
-                afterPhotoUrl
-                batchPhotoUrl
-                beforePhotoUrl
-                endDate
-                id
-                startDate
-                updatedAt
-
-                createdBy {
-                    name
-                    group {
-                        name
-                    }
-                }
-
-                status {
-                    code
-                    label
-                }
-
-                oldestParent {
-                    createdAt
-                    createdBy {
-                        name
-                        group {
-                            name
-                        }
-                    }
-                }
-
-                customer {
-                    addressLine
-                    email
-                    id
-                    name
-                    taxvatFormatted
-                    telephones {
-                        number
-                    }
-                    source {
-                        title
-                    }
-                }
-
-                store {
-                    name
-                }
-
-                procedure {
-                    groupLabel
-                    name
-                }
-
-                employee {
-                    name
-                }
-
-                comments {
-                    comment
-                }
-
-                updatedBy {
-                    name
-                }
-
-                latestProgressComment {
-                    comment
-                    createdAt
-                    user {
-                        name
-                    }
-                }
-            }
-            meta {
-                currentPage
-                perPage
-                lastPage
-                total
-            }
-        }
-    }
-    '''
+    columns = resolve_appointment_columns(columns)
+    query = build_appointments_query(columns, date_filter)
 
     variables = {
         'start': start_date,
         'end': end_date,
-        'currentPage': current_page,
+        'currentPage': 1,
         'perPage': 400
     }
     
     logger.info(f"Attempting to fetch appointments from {start_date} to {end_date}")
     
+    appointments_data = await fetch_all_pages(session, api_url, query, variables, 'appointmentsReport')
+    if appointments_data is None:
+        return all_appointments  # Return empty list on initial failure
+    
+    if not appointments_data:
+        logger.info("No appointments found in the specified date range")
+        return all_appointments
+    
+    logger.info(f"Total appointments fetched: {len(appointments_data)}")
+    
     try:
-        # Make the initial GraphQL request
-        data = await fetch_graphql(session, api_url, query, variables)
-        
-        # Carefully check for None and errors
-        if data is None:
-            logger.error("GraphQL request returned None response")
-            return all_appointments
-            
-        if 'errors' in data:
-            error_msg = "Unknown error"
-            if data['errors'] and isinstance(data['errors'], list) and len(data['errors']) > 0:
-                if 'message' in data['errors'][0]:
-                    error_msg = data['errors'][0]['message']
-            logger.error(f"Failed initial appointments fetch: {error_msg}")
-            return all_appointments
-            
-        try:
-            if 'data' not in data:
-                logger.error("No 'data' field in GraphQL response")
-                return all_appointments
-                
-            if 'appointmentsReport' not in data['data']:
-                logger.error("No 'appointmentsReport' field in GraphQL data")
-                return all_appointments
-                
-            appointments_report = data['data']['appointmentsReport']
-            if not appointments_report:
-                logger.error("Empty 'appointmentsReport' in response")
-                return all_appointments
-                
-            # Check first for the appointments data
-            if 'data' not in appointments_report:
-                logger.info("No 'data' field in appointmentsReport")
-                return all_appointments
-                
-            appointments_data = appointments_report.get('data', [])
-            if not appointments_data:
-                logger.info("No appointments found in the specified date range")
-                return all_appointments
-            
-            meta = appointments_report.get('meta', {})
-            if meta is None:
-                meta = {}
-            
-            current_page = meta.get('currentPage', 1)
-            last_page = meta.get('lastPage', 1)
-            
-            all_appointments.extend(appointments_data)
-            
-            if current_page < last_page:
-                logger.info(f"Fetching remaining {last_page - current_page} pages")
-                
-                for page in range(current_page + 1, last_page + 1):
-                    logger.info(f"Fetching page {page} of {last_page}")
-                    
-                    variables['currentPage'] = page
-                    
-                    try:
-                        page_data = await fetch_graphql(session, api_url, query, variables)
-                        
-                        if page_data and 'data' in page_data and 'appointmentsReport' in page_data['data']:
-                            page_appointments_report = page_data['data']['appointmentsReport']
-                            if page_appointments_report and 'data' in page_appointments_report:
-                                page_appointments = page_appointments_report['data']                                
-                                all_appointments.extend(page_appointments)
-                                logger.info(f"Added {len(page_appointments)} appointments from page {page}")
-                            else:
-                                logger.warning(f"No appointment data found on page {page}")
-                        else:
-                            logger.warning(f"Invalid response structure for page {page}")
-                    except Exception as e:
-                        logger.error(f"Error fetching page {page}: {str(e)}")            
-            logger.info(f"Total appointments fetched: {len(all_appointments)}")
-            
-            processed_appointments = []
-            for appointment in all_appointments:
-                if appointment is None:
-                    continue
-                
-                try:
-                    # Extract necessary objects with fallbacks
-                    customer = appointment.get('customer', {}) or {}
-                    store = appointment.get('store', {}) or {}
-                    procedure = appointment.get('procedure', {}) or {}
-                    employee = appointment.get('employee', {}) or {}
-                    status = appointment.get('status', {}) or {}
-                    updatedBy = appointment.get('updatedBy', {}) or {}
-                    oldestParent = appointment.get('oldestParent', {}) or {}
-                    latestProgressComment = appointment.get('latestProgressComment', {}) or {}
-                    
-                    # Nested objects one level deeper
-                    customer_source = customer.get('source', {}) or {}
-                    latestProgressComment_user = latestProgressComment.get('user', {}) or {}
-                    
-                    # Telephones with safety checks
-                    telephones_data = customer.get('telephones', []) or []
-                    telephones = ', '.join([tel.get('number', '') for tel in telephones_data if tel and isinstance(tel, dict)]) if telephones_data else ''
-                    
-                    # Comments with safety checks
-                    comments_data = appointment.get('comments', []) or []
-                    comments = '; '.join([c.get('comment', '') for c in comments_data if c and isinstance(c, dict)]) if comments_data else ''
-                    
-                    # R -> oldestParent.createdAt (quando disponível) ou updatedAt (caso contrário)
-                    # S -> oldestParent.createdBy.name (quando disponível) ou updatedBy.name (caso contrário)
-                    # T -> oldestParent.createdBy.group.name (quando disponível) ou updatedBy.group.name (caso contrário)
-                    def safe_get(d, path):
-                        for key in path:
-                            if not isinstance(d, dict) or key not in d:
-                                return None
-                            d = d[key]
-                        return d
-
-                    # Nome da primeira atendente (S): oldestParent.createdBy.name → fallback: appointment.createdBy.name
-                    created_by_name = safe_get(oldestParent, ["createdBy", "name"]) or safe_get(appointment, ["createdBy", "name"]) or "_não disponível"
-                    
-                    # Grupo da primeira atendente (T): oldestParent.createdBy.group.name → fallback: appointment.createdBy.group.name
-                    created_by_group = safe_get(oldestParent, ["createdBy", "group", "name"]) or safe_get(appointment, ["createdBy", "group", "name"]) or "_não disponível"
-                    
-                    created_at = oldestParent.get('createdAt') or appointment.get('updatedAt', '')
-                    # created_by = oldestParent.get('createdBy') if oldestParent else None
-                    # if created_by:
-                    #     created_by_name = created_by.get('name', '')
-                    #     group = created_by.get('group')
-                    #     if group:
-                    #         created_by_group = group.get('name', "_não disponível")
-                    
-                    # Format createdAt as dd/MM/yyyy HH:mm if it's not empty
-                    formatted_created_at = ''
-                    if created_at:
-                        try:
-                            dt = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
-                            formatted_created_at = dt.strftime('%d/%m/%Y %H:%M')
-                        except Exception as e:
-                            logger.error(f"Error formatting createdAt date: {str(e)}")
-                            formatted_created_at = created_at  # Fallback to original format
-
-                    # Map fields to the expected column names for the UI, with default values
-                    transformed_appointment = {
-                        'ID agendamento': appointment.get('id', ''),                      # A -> id
-                        'ID cliente': customer.get('id', ''),                             # B -> customer.id
-                        'Nome cliente': customer.get('name', ''),                         # C -> customer.name
-                        'CPF': customer.get('taxvatFormatted', ''),                       # D -> customer.taxvatFormatted
-                        'Email': customer.get('email', ''),                               # E -> customer.email
-                        'Telefone': telephones,                                           # F -> customer.telephones.*.number
-                        'Endereço': customer.get('addressLine', ''),                      # G -> customer.addressLine
-                        'Fonte de cadastro do cliente': customer_source.get('title', ''), # H -> customer.source.title
-                        'Unidade do agendamento': store.get('name', ''),                  # I -> store.name
-                        'Procedimento': procedure.get('name', ''),                        # J -> procedure.name
-                        'Prestador': employee.get('name', ''),                            # K -> employee.name
-                        'Grupo do procedimento': procedure.get('groupLabel', ''),         # L -> procedure.groupLabel
-                        'Data': appointment.get('startDate', ''),                          # M -> startDate
-                        'Hora': '',                                                       # N -> startDate time
-                        'Status': status.get('label', ''),                                # O -> status.label
-                        'Duração': '',                                                    # P -> startDate + endDate
-                        'Máquina': None,                                                  # Q -> NULL
-                        'Data primeira atendente': formatted_created_at,                  # R -> oldestParent.createdAt
-                        'Nome da primeira atendente': created_by_name,                    # S -> oldestParent.createdBy.name
-                        'Grupo da primeira atendente': created_by_group,                  # T -> oldestParent.createdBy.group.name
-                        'Observação (mais recente)': comments,                             # U -> comments.comment
-                        'Última data de alteração do status': appointment.get('updatedAt', ''), # V -> updatedAt
-                        'Último usuário a alterar o status': updatedBy.get('name', ''),   # W -> updatedBy.name
-                        'Possui evolução?': 'Sim' if latestProgressComment.get('comment', '') else 'Não', # X -> latestProgressComment.comment
-                        'Comentário mais recente da evolução': latestProgressComment.get('comment', ''),  # Y -> latestProgressComment.comment
-                        'Data mais recente da evolução': latestProgressComment.get('createdAt', ''), # Z -> latestProgressComment.createdAt
-                        'Usuário mais recente da evolução': latestProgressComment_user.get('name', ''), # AA -> latestProgressComment.user.name
-                        'Tem foto do lote?': 'Sim' if appointment.get('batchPhotoUrl', '') else 'Não',           # AB -> batchPhotoUrl (if exists "Sim", otherwise "Não")
-                        'Tem foto do antes?': 'Sim' if appointment.get('beforePhotoUrl', '') else 'Não',         # AC -> beforePhotoUrl (if exists "Sim", otherwise "Não") 
-                        'Tem foto do depois?': 'Sim' if appointment.get('afterPhotoUrl', '') else 'Não'          # AD -> afterPhotoUrl (if exists "Sim", otherwise "Não")
-                    }
-                    processed_appointments.append(transformed_appointment)
-                except Exception as e:
-                    logger.error(f"Error processing appointment: {str(e)}")
-                    continue
-            return processed_appointments
-            
-        except Exception as e:
-            logger.error(f"Error processing appointment data: {str(e)}")
-            import traceback
-            logger.error(f"Traceback: {traceback.format_exc()}")
-            return all_appointments
-            
+        return process_appointments_data(appointments_data, columns, output)
     except Exception as e:
-        logger.error(f"Error making GraphQL request: {str(e)}")
+        logger.error(f"Error processing appointment data: {str(e)}")
         import traceback
         logger.error(f"Traceback: {traceback.format_exc()}")
+        _record_failure('appointmentsReport', reason=f"processing ({str(e)})")
         return all_appointments
 
-async def fetch_and_process_appointment_report(start_date: str, end_date: str) -> List[Dict]:
+def _format_first_attendant_date(created_at):
+    """Format createdAt as dd/MM/yyyy HH:mm if it's not empty"""
+    if not created_at:
+        return ''
+    try:
+        return datetime.fromisoformat(created_at.replace('Z', '+00:00')).strftime('%d/%m/%Y %H:%M')
+    except Exception as e:
+        logger.error(f"Error formatting createdAt date: {str(e)}")
+        _record_failure('appointmentsReport', reason=f"createdAt format ({str(e)})")
+        return created_at  # Fallback to original format
+
+def _yes_no(value):
+    return 'Sim' if value else 'Não'
+
+# Map fields to the expected column names for the UI, with default values.
+# Fields missing from a projected query fall back to the same defaults as empty values.
+APPOINTMENTS_TRANSFORM = Transformer([
+    Field('ID agendamento', 'id', ''),                                     # A -> id
+    Field('ID cliente', 'customer.id', ''),                                # B -> customer.id
+    Field('Nome cliente', 'customer.name', ''),                            # C -> customer.name
+    Field('CPF', 'customer.taxvatFormatted', ''),                          # D -> customer.taxvatFormatted
+    Field('Email', 'customer.email', ''),                                  # E -> customer.email
+    Join('Telefone', 'customer.telephones', item='number', default=''),    # F -> customer.telephones.*.number
+    Field('Endereço', 'customer.addressLine', ''),                         # G -> customer.addressLine
+    Field('Fonte de cadastro do cliente', 'customer.source.title', ''),    # H -> customer.source.title
+    Field('Unidade do agendamento', 'store.name', ''),                     # I -> store.name
+    Field('Procedimento', 'procedure.name', ''),                           # J -> procedure.name
+    Field('Prestador', 'employee.name', ''),                               # K -> employee.name
+    Field('Grupo do procedimento', 'procedure.groupLabel', ''),            # L -> procedure.groupLabel
+    Field('Data', 'startDate', ''),                                        # M -> startDate
+    Const('Hora', ''),                                                     # N -> startDate time
+    Field('Status', 'status.label', ''),                                   # O -> status.label
+    Const('Duração', ''),                                                  # P -> startDate + endDate
+    Const('Máquina', None),                                                # Q -> NULL
+    # R -> oldestParent.createdAt (quando disponível) ou updatedAt (caso contrário)
+    Coalesce('Data primeira atendente', ['oldestParent.createdAt', 'updatedAt'], '', convert=_format_first_attendant_date),
+    # S -> oldestParent.createdBy.name (quando disponível) ou createdBy.name (caso contrário)
+    Coalesce('Nome da primeira atendente', ['oldestParent.createdBy.name', 'createdBy.name'], '_não disponível'),
+    # T -> oldestParent.createdBy.group.name (quando disponível) ou createdBy.group.name (caso contrário)
+    Coalesce('Grupo da primeira atendente', ['oldestParent.createdBy.group.name', 'createdBy.group.name'], '_não disponível'),
+    Join('Observação (mais recente)', 'comments', item='comment', sep='; ', default=''),  # U -> comments.comment
+    Field('Última data de alteração do status', 'updatedAt', ''),          # V -> updatedAt
+    Field('Último usuário a alterar o status', 'updatedBy.name', ''),      # W -> updatedBy.name
+    Field('Possui evolução?', 'latestProgressComment.comment', '', convert=_yes_no),  # X -> latestProgressComment.comment
+    Field('Comentário mais recente da evolução', 'latestProgressComment.comment', ''),  # Y -> latestProgressComment.comment
+    Field('Data mais recente da evolução', 'latestProgressComment.createdAt', ''),  # Z -> latestProgressComment.createdAt
+    Field('Usuário mais recente da evolução', 'latestProgressComment.user.name', ''),  # AA -> latestProgressComment.user.name
+    Field('Tem foto do lote?', 'batchPhotoUrl', '', convert=_yes_no),      # AB -> batchPhotoUrl (if exists "Sim", otherwise "Não")
+    Field('Tem foto do antes?', 'beforePhotoUrl', '', convert=_yes_no),    # AC -> beforePhotoUrl (if exists "Sim", otherwise "Não")
+    Field('Tem foto do depois?', 'afterPhotoUrl', '', convert=_yes_no),    # AD -> afterPhotoUrl (if exists "Sim", otherwise "Não")
+])
+
+def process_appointments_data(appointments_data, columns: Optional[List[str]] = None, output: str = 'records'):
     """
-    Creates a session and fetches appointment report data.
+    Helper function to process and transform appointment data consistently.
+
+    Args:
+        appointments_data: Raw appointments from the report
+        columns: Output columns to keep, None keeps all of them
+        output: 'records' (list of dicts) or 'columns' (dict of lists)
+    """
+    return APPOINTMENTS_TRANSFORM.select(columns).transform(appointments_data, output)
+
+async def fetch_and_process_appointment_report(
+    start_date: str,
+    end_date: str,
+    incremental: bool = False,
+    columns: Optional[List[str]] = None,
+    output: str = 'records',
+) -> Union[List[Dict], Dict[str, List], pd.DataFrame]:
+    """
+    Fetches appointment report data using the shared CRM client session.
     
     Args:
         start_date: Start date in ISO format (YYYY-MM-DD)
         end_date: End date in ISO format (YYYY-MM-DD)
+        incremental: Merge only the appointments updated since the last load into a local snapshot
+        columns: Output columns the caller needs, None for all of them
+        output: 'records' (list of dicts), 'columns' (dict of lists) or 'dataframe'
         
     Returns:
-        List of processed lead report dictionaries ready for database insertion
+        Processed appointment rows in the requested output format
     """
-    import aiohttp
-    
-    async with aiohttp.ClientSession() as session:
-        appointments = await fetch_appointmentReport(session, start_date, end_date)
-    
-    return appointments
-
-
-async def fetch_appointmentReportCreatedAt(session, start_date: str, end_date: str) -> List[Dict]:
+    if not incremental:
+        return await crm_client.run(lambda session: report_cache.fetch(
+            'appointmentsReport',
+            lambda day_start, day_end: fetch_appointmentReport(session, day_start, day_end, columns=columns, output='columns'),
+            start_date, end_date, id_key='ID agendamento',
+            resolver=appointments_cache_key(columns), output=output
+        ))
+
+    # The snapshot is merged on 'ID agendamento' and stored per day of 'Data'
+    if columns is not None:
+        columns = [*columns, 'Data']
+
+    async def sync(session):
+        return await fetch_incremental(
+            'appointmentsReport',
+            lambda start, end: fetch_sharded(
+                lambda shard_start, shard_end: fetch_appointmentReport(session, shard_start, shard_end, columns=columns, output='columns'),
+                start, end, id_key='ID agendamento'
+            ),
+            lambda updated_start, updated_end: fetch_appointmentReport(session, updated_start, updated_end, date_filter='updatedAtRange', columns=columns),
+            start_date, end_date,
+            id_key='ID agendamento',
+            date_key='Data',
+            resolver=appointments_cache_key(columns),
+            output=output,
+        )
+
+    return await crm_client.run(sync)
+
+async def fetch_appointmentReportCreatedAt(
+    session,
+    start_date: str,
+    end_date: str,
+    columns: Optional[List[str]] = None,
+    output: str = 'records',
+) -> Union[List[Dict], Dict[str, List]]:
     """
-    Fetches appointment report data from the CRM API within a specified date range.
+    Fetches appointment report data from the CRM API for appointments created within a specified date range.
     
     Args:
         session: The aiohttp ClientSession object
         start_date: Start date in ISO format (YYYY-MM-DD)
         end_date: End date in ISO format (YYYY-MM-DD)
+        columns: Output columns to fetch and return, None for all of them
+        output: 'records' (list of dicts) or 'columns' (dict of lists)
         
     Returns:
-        List of appointment report dictionaries
+        Appointment report rows in the requested output format
     """
-    current_page = 1
-    all_appointments = []
-    api_url = os.getenv('API_CRM_URL', 'https://open-api.eprocorpo.com.br/graphql')
-
-    # Updated query with correct pagination parameters
-    # Updated query with correct pagination parameters
-    query = '''
-    query AppointmentsReport($start: Date!, $end: Date!, $currentPage: Int!, $perPage: Int!) {
-        appointmentsReport(
-            filters: { createdAtRange: { start: $start, end: $end } }
-            pagination: { currentPage: $currentPage, perPage: $perPage }
-        ) {
-            data {
-                afterPhotoUrl
-                batchPhotoUrl
-                beforePhotoUrl
-                endDate
-                id
-                startDate
-                updatedAt
-
-                createdBy {
-                    name
-                    group {
-                        name
-                    }
-                }
-
-                status {
-                    code
-                    label
-                }
-
-                oldestParent {
-                    createdAt
-                    createdBy {
-                        name
-                        group {
-                            name
-                        }
-                    }
-                }
-
-                customer {
-                    addressLine
-                    email
-                    id
-                    name
-                    taxvatFormatted
-                    telephones {
-                        number
-                    }
-                    source {
-                        title
-                    }
-                }
-
-                store {
-                    name
-                }
-
-                procedure {
-                    groupLabel
-                    name
-                }
-
-                employee {
-                    name
-                }
-
-                comments {
-                    comment
-                }
-
-                updatedBy {
-                    name
-                }
-
-                latestProgressComment {
-                    comment
-                    createdAt
-                    user {
-                        name
-                    }
-                }
-            }
-            meta {
-                currentPage
-                perPage
-                lastPage
-                total
-            }
-        }
-    }
-    '''
-
-    variables = {
-        'start': start_date,
-        'end': end_date,
-        'currentPage': current_page,
-        'perPage': 400
-    }
-    
-    logger.info(f"Attempting to fetch appointments from {start_date} to {end_date}")
-    
-    try:
-        # Make the initial GraphQL request
-        data = await fetch_graphql(session, api_url, query, variables)
-        
-        # Carefully check for None and errors
-        if data is None:
-            logger.error("GraphQL request returned None response")
-            return all_appointments
-            
-        if 'errors' in data:
-            error_msg = "Unknown error"
-            if data['errors'] and isinstance(data['errors'], list) and len(data['errors']) > 0:
-                if 'message' in data['errors'][0]:
-                    error_msg = data['errors'][0]['message']
-            logger.error(f"Failed initial appointments fetch: {error_msg}")
-            return all_appointments
-            
-        try:
-            if 'data' not in data:
-                logger.error("No 'data' field in GraphQL response")
-                return all_appointments
-                
-            if 'appointmentsReport' not in data['data']:
-                logger.error("No 'appointmentsReport' field in GraphQL data")
-                return all_appointments
-                
-            appointments_report = data['data']['appointmentsReport']
-            if not appointments_report:
-                logger.error("Empty 'appointmentsReport' in response")
-                return all_appointments
-                
-            # Check first for the appointments data
-            if 'data' not in appointments_report:
-                logger.info("No 'data' field in appointmentsReport")
-                return all_appointments
-                
-            appointments_data = appointments_report.get('data', [])
-            if not appointments_data:
-                logger.info("No appointments found in the specified date range")
-                return all_appointments
-            
-            meta = appointments_report.get('meta', {})
-            if meta is None:
-                meta = {}
-            
-            current_page = meta.get('currentPage', 1)
-            last_page = meta.get('lastPage', 1)
-            
-            all_appointments.extend(appointments_data)
-            
-            if current_page < last_page:
-                logger.info(f"Fetching remaining {last_page - current_page} pages")
-                
-                for page in range(current_page + 1, last_page + 1):
-                    logger.info(f"Fetching page {page} of {last_page}")
-                    
-                    variables['currentPage'] = page
-                    
-                    try:
-                        page_data = await fetch_graphql(session, api_url, query, variables)
-                        
-                        if page_data and 'data' in page_data and 'appointmentsReport' in page_data['data']:
-                            page_appointments_report = page_data['data']['appointmentsReport']
-                            if page_appointments_report and 'data' in page_appointments_report:
-                                page_appointments = page_appointments_report['data']                                
-                                all_appointments.extend(page_appointments)
-                                logger.info(f"Added {len(page_appointments)} appointments from page {page}")
-                            else:
-                                logger.warning(f"No appointment data found on page {page}")
-                        else:
-                            logger.warning(f"Invalid response structure for page {page}")
-                    except Exception as e:
-                        logger.error(f"Error fetching page {page}: {str(e)}")            
-            logger.info(f"Total appointments fetched: {len(all_appointments)}")
-            
-            processed_appointments = []
-            for appointment in all_appointments:
-                if appointment is None:
-                    continue
-                
-                try:
-                    # Extract necessary objects with fallbacks
-                    customer = appointment.get('customer', {}) or {}
-                    store = appointment.get('store', {}) or {}
-                    procedure = appointment.get('procedure', {}) or {}
-                    employee = appointment.get('employee', {}) or {}
-                    status = appointment.get('status', {}) or {}
-                    updatedBy = appointment.get('updatedBy', {}) or {}
-                    oldestParent = appointment.get('oldestParent', {}) or {}
-                    latestProgressComment = appointment.get('latestProgressComment', {}) or {}
-                    
-                    # Nested objects one level deeper
-                    customer_source = customer.get('source', {}) or {}
-                    latestProgressComment_user = latestProgressComment.get('user', {}) or {}
-                    
-                    # Telephones with safety checks
-                    telephones_data = customer.get('telephones', []) or []
-                    telephones = ', '.join([tel.get('number', '') for tel in telephones_data if tel and isinstance(tel, dict)]) if telephones_data else ''
-                    
-                    # Comments with safety checks
-                    comments_data = appointment.get('comments', []) or []
-                    comments = '; '.join([c.get('comment', '') for c in comments_data if c and isinstance(c, dict)]) if comments_data else ''
-                    
-                    # R -> oldestParent.createdAt (quando disponível) ou updatedAt (caso contrário)
-                    # S -> oldestParent.createdBy.name (quando disponível) ou updatedBy.name (caso contrário)
-                    # T -> oldestParent.createdBy.group.name (quando disponível) ou updatedBy.group.name (caso contrário)
-                    def safe_get(d, path):
-                        for key in path:
-                            if not isinstance(d, dict) or key not in d:
-                                return None
-                            d = d[key]
-                        return d
-
-                    # Nome da primeira atendente (S): oldestParent.createdBy.name → fallback: appointment.createdBy.name
-                    created_by_name = safe_get(oldestParent, ["createdBy", "name"]) or safe_get(appointment, ["createdBy", "name"]) or "_não disponível"
-                    
-                    # Grupo da primeira atendente (T): oldestParent.createdBy.group.name → fallback: appointment.createdBy.group.name
-                    created_by_group = safe_get(oldestParent, ["createdBy", "group", "name"]) or safe_get(appointment, ["createdBy", "group", "name"]) or "_não disponível"
-                    
-                    created_at = oldestParent.get('createdAt') or appointment.get('updatedAt', '')
-                    # created_by = oldestParent.get('createdBy') if oldestParent else None
-                    # if created_by:
-                    #     created_by_name = created_by.get('name', '')
-                    #     group = created_by.get('group')
-                    #     if group:
-                    #         created_by_group = group.get('name', "_não disponível")
-                    
-                    # Format createdAt as dd/MM/yyyy HH:mm if it's not empty
-                    formatted_created_at = ''
-                    if created_at:
-                        try:
-                            dt = datetime.fromisoformat(created_at.replace('Z', '+00:00'))
-                            formatted_created_at = dt.strftime('%d/%m/%Y %H:%M')
-                        except Exception as e:
-                            logger.error(f"Error formatting createdAt date: {str(e)}")
-                            formatted_created_at = created_at  # Fallback to original format
-
-                    # Map fields to the expected column names for the UI, with default values
-                    transformed_appointment = {
-                        'ID agendamento': appointment.get('id', ''),                      # A -> id
-                        'ID cliente': customer.get('id', ''),                             # B -> customer.id
-                        'Nome cliente': customer.get('name', ''),                         # C -> customer.name
-                        'CPF': customer.get('taxvatFormatted', ''),                       # D -> customer.taxvatFormatted
-                        'Email': customer.get('email', ''),                               # E -> customer.email
-                        'Telefone': telephones,                                           # F -> customer.telephones.*.number
-                        'Endereço': customer.get('addressLine', ''),                      # G -> customer.addressLine
-                        'Fonte de cadastro do cliente': customer_source.get('title', ''), # H -> customer.source.title
-                        'Unidade do agendamento': store.get('name', ''),                  # I -> store.name
-                        'Procedimento': procedure.get('name', ''),                        # J -> procedure.name
-                        'Prestador': employee.get('name', ''),                            # K -> employee.name
-                        'Grupo do procedimento': procedure.get('groupLabel', ''),         # L -> procedure.groupLabel
-                        'Data': appointment.get('startDate', ''),                          # M -> startDate
-                        'Hora': '',                                                       # N -> startDate time
-                        'Status': status.get('label', ''),                                # O -> status.label
-                        'Duração': '',                                                    # P -> startDate + endDate
-                        'Máquina': None,                                                  # Q -> NULL
-                        'Data primeira atendente': formatted_created_at,                  # R -> oldestParent.createdAt
-                        'Nome da primeira atendente': created_by_name,                    # S -> oldestParent.createdBy.name
-                        'Grupo da primeira atendente': created_by_group,                  # T -> oldestParent.createdBy.group.name
-                        'Observação (mais recente)': comments,                             # U -> comments.comment
-                        'Última data de alteração do status': appointment.get('updatedAt', ''), # V -> updatedAt
-                        'Último usuário a alterar o status': updatedBy.get('name', ''),   # W -> updatedBy.name
-                        'Possui evolução?': 'Sim' if latestProgressComment.get('comment', '') else 'Não', # X -> latestProgressComment.comment
-                        'Comentário mais recente da evolução': latestProgressComment.get('comment', ''),  # Y -> latestProgressComment.comment
-                        'Data mais recente da evolução': latestProgressComment.get('createdAt', ''), # Z -> latestProgressComment.createdAt
-                        'Usuário mais recente da evolução': latestProgressComment_user.get('name', ''), # AA -> latestProgressComment.user.name
-                        'Tem foto do lote?': 'Sim' if appointment.get('batchPhotoUrl', '') else 'Não',           # AB -> batchPhotoUrl (if exists "Sim", otherwise "Não")
-                        'Tem foto do antes?': 'Sim' if appointment.get('beforePhotoUrl', '') else 'Não',         # AC -> beforePhotoUrl (if exists "Sim", otherwise "Não") 
-                        'Tem foto do depois?': 'Sim' if appointment.get('afterPhotoUrl', '') else 'Não'          # AD -> afterPhotoUrl (if exists "Sim", otherwise "Não")
-                    }
-                    processed_appointments.append(transformed_appointment)
-                except Exception as e:
-                    logger.error(f"Error processing appointment: {str(e)}")
-                    continue
-            return processed_appointments
-            
-        except Exception as e:
-            logger.error(f"Error processing appointment data: {str(e)}")
-            import traceback
-            logger.error(f"Traceback: {traceback.format_exc()}")
-            return all_appointments
-            
-    except Exception as e:
-        logger.error(f"Error making GraphQL request: {str(e)}")
-        import traceback
-        logger.error(f"Traceback: {traceback.format_exc()}")
-        return all_appointments
-
-async def fetch_and_process_appointment_report_created_at(start_date: str, end_date: str) -> List[Dict]:
+    return await fetch_appointmentReport(session, start_date, end_date, date_filter='createdAtRange', columns=columns, output=output)
+
+async def fetch_and_process_appointment_report_created_at(
+    start_date: str,
+    end_date: str,
+    columns: Optional[List[str]] = None,
+    output: str = 'records',
+) -> Union[List[Dict], Dict[str, List], pd.DataFrame]:
     """
-    Creates a session and fetches appointment report data.
+    Fetches appointment report data using the shared CRM client session.
     
     Args:
         start_date: Start date in ISO format (YYYY-MM-DD)
         end_date: End date in ISO format (YYYY-MM-DD)
+        columns: Output columns the caller needs, None for all of them
+        output: 'records' (list of dicts), 'columns' (dict of lists) or 'dataframe'
         
     Returns:
-        List of processed lead report dictionaries ready for database insertion
+        Processed appointment rows in the requested output format
     """
-    import aiohttp
-    
-    async with aiohttp.ClientSession() as session:
-        appointments = await fetch_appointmentReportCreatedAt(session, start_date, end_date)
-    
-    return appointments
\ No newline at end of file
+    return await crm_client.run(lambda session: report_cache.fetch(
+        'appointmentsReportCreatedAt',
+        lambda day_start, day_end: fetch_appointmentReportCreatedAt(session, day_start, day_end, columns=columns, output='columns'),
+        start_date, end_date, id_key='ID agendamento',
+        resolver=appointments_cache_key(columns, 'createdAtRange'), output=output
+    ))
\ No newline at end of file
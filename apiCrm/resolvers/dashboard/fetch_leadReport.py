@@ -5,8 +5,12 @@ python -m apiCrm.tests.fetch_leadReport_test
 
 import asyncio
 import logging
-from typing import List, Dict
-from ..fetch_graphql import fetch_graphql
+from typing import List, Dict, Union
+import pandas as pd
+from ..paginator import _record_failure, fetch_all_pages
+from ..client_session import crm_client
+from ..report_cache import report_cache
+from ..columnar import add_constant_columns
 from dotenv import load_dotenv
 import os
 from datetime import datetime
@@ -25,7 +29,8 @@ async def fetch_leadReport(session, start_date: str, end_date: str) -> List[Dict
         end_date: End date in ISO format (YYYY-MM-DD)
         
     Returns:
-        List of lead report dictionaries
+        List of lead report dictionaries, without the report range columns (see
+        fetch_and_process_lead_report)
     """
     current_page = 1
     all_leads = []
@@ -79,62 +84,20 @@ async def fetch_leadReport(session, start_date: str, end_date: str) -> List[Dict
 
     logger.info(f"Attempting to fetch leads from {start_date} to {end_date}")
     
-    data = await fetch_graphql(session, api_url, query, variables)
-    
-    if data is None or 'errors' in data:
-        error_msg = data.get('errors', [{'message': 'Unknown error'}])[0]['message'] if data else 'No data returned'
-        logger.error(f"Failed initial leads report fetch: {error_msg}")
+    leads_data = await fetch_all_pages(session, api_url, query, variables, 'leadsReport')
+    if leads_data is None:
         return all_leads  # Return empty list on initial failure
     
     try:
-        if 'data' in data and 'leadsReport' in data['data']:
-            # Process first page
-            leads_data = data['data']['leadsReport']['data']
-            meta = data['data']['leadsReport']['meta']
-            
-            # Transform first page of data
-            page_transformed = process_leads_data(leads_data, start_date, end_date)
-            all_leads.extend(page_transformed)
-            
-            last_page = meta.get('lastPage', 1)
-            total_records = meta.get('total', 0)
-            
-            logger.info(f"Successfully fetched page 1/{last_page}, got {len(leads_data)} leads out of approximately {total_records}")
-            
-            # If we have more pages, fetch them
-            if last_page > 1:
-                for page in range(2, last_page + 1):
-                    variables['currentPage'] = page
-                    page_data = await fetch_graphql(session, api_url, query, variables)
-                    
-                    if page_data is None or 'errors' in page_data:
-                        error_msg = page_data.get('errors', [{'message': 'Unknown error'}])[0]['message'] if page_data else 'No data returned'
-                        logger.error(f"Failed to fetch leads on page {page}/{last_page}. Error: {error_msg}")
-                        continue
-                    
-                    if 'data' in page_data and 'leadsReport' in page_data['data']:
-                        page_leads = page_data['data']['leadsReport']['data']
-                        
-                        # Transform data for this page
-                        page_transformed = process_leads_data(page_leads, start_date, end_date)
-                        all_leads.extend(page_transformed)
-                        
-                        logger.info(f"Successfully fetched page {page}/{last_page}, got {len(page_leads)} leads")
-                    else:
-                        logger.error(f"Unexpected API response structure on page {page}: {page_data}")
-                    
-                    # Add a delay between requests to avoid rate limiting
-                    await asyncio.sleep(0.5)
-        else:
-            logger.error(f"Unexpected API response structure: {data}")
-    
+        all_leads.extend(process_leads_data(leads_data))
     except Exception as e:
         logger.error(f"Error processing lead data: {str(e)}")
+        _record_failure('leadsReport', reason=f"processing ({str(e)})")
     
     logger.info(f"Total leads fetched: {len(all_leads)}")
     return all_leads
 
-def process_leads_data(leads_data, start_date, end_date):
+def process_leads_data(leads_data):
     """Helper function to process and transform leads data consistently"""
     transformed_leads = []
     for lead in leads_data:
@@ -154,28 +117,30 @@ def process_leads_data(leads_data, start_date, end_date):
             'utmContent': lead.get('utmContent'),
             'utmCampaign': lead.get('utmCampaign'),
             'searchTerm': lead.get('searchTerm'),
-            'report_start_date': start_date,
-            'report_end_date': end_date,
             'Dia': datetime.fromisoformat(lead.get('createdAt')).day if lead.get('createdAt') else None
         }
         transformed_leads.append(transformed_lead)
     
     return transformed_leads
 
-async def fetch_and_process_lead_report(start_date: str, end_date: str) -> List[Dict]:
+async def fetch_and_process_lead_report(start_date: str, end_date: str, output: str = 'records') -> Union[List[Dict], Dict[str, List], pd.DataFrame]:
     """
-    Creates a session and fetches lead report data.
+    Fetches lead report data using the shared CRM client session.
+
+    The report range columns are stamped after the cached days are merged: a day stored by a
+    previous request would otherwise carry that request's range.
     
     Args:
         start_date: Start date in ISO format (YYYY-MM-DD)
         end_date: End date in ISO format (YYYY-MM-DD)
+        output: 'records' (list of dicts), 'columns' (dict of lists) or 'dataframe'
         
     Returns:
-        List of processed lead report dictionaries ready for database insertion
+        Processed lead report rows in the requested output format
     """
-    import aiohttp
-    
-    async with aiohttp.ClientSession() as session:
-        leads = await fetch_leadReport(session, start_date, end_date)
-    
-    return leads
\ No newline at end of file
+    leads = await crm_client.run(lambda session: report_cache.fetch(
+        'leadsReport',
+        lambda day_start, day_end: fetch_leadReport(session, day_start, day_end),
+        start_date, end_date, id_key='ID do lead', resolver=fetch_leadReport, output=output
+    ))
+    return add_constant_columns(leads, {'report_start_date': start_date, 'report_end_date': end_date})
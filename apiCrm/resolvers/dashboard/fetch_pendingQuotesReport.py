@@ -6,7 +6,9 @@ python -m apiCrm.tests.fetch_pendingQuotesReport_test
 import asyncio
 import logging
 from typing import List, Dict
-from ..fetch_graphql import fetch_graphql
+from ..paginator import _record_failure, fetch_all_pages
+from ..client_session import crm_client
+from ..transformer import Concat, Field, Join, Transformer
 from dotenv import load_dotenv
 import os
 from datetime import datetime
@@ -106,200 +108,61 @@ async def fetch_pendingQuotesReport(session, start_date: str, end_date: str) ->
     
     logger.info(f"Attempting to fetch pending quotes from {start_date} to {end_date}")
     
-    data = await fetch_graphql(session, api_url, query, variables)
-
-    if data is None or 'errors' in data:
-        error_msg = data.get('errors', [{'message': 'Unknown error'}])[0]['message'] if data else 'No data returned'
-        logger.error(f"Failed initial pending quotes fetch: {error_msg}")
+    pending_quotes_data = await fetch_all_pages(session, api_url, query, variables, 'pendingQuotesReport')
+    if pending_quotes_data is None:
         return all_pending_quotes  # Return empty list on initial failure
     
-    # If we got here, the query structure works
     try:
-        if 'data' in data and 'pendingQuotesReport' in data['data']:
-            pending_quotes_data = data['data']['pendingQuotesReport']['data']
-            meta = data['data']['pendingQuotesReport']['meta']
-
-            transformed_quotes = []
-
-            for quote in pending_quotes_data:
-                # Extract nested objects safely
-                customer = quote.get('customer', {}) or {}
-                store = quote.get('store', {}) or {}
-                createdBy = quote.get('createdBy', {}) or {}
-                procedures = quote.get('procedures', []) or []
-                
-                # Extract address data if available
-                address = customer.get('address', {}) or {}
-                state = address.get('state', {}) or {}
-                
-                # Format procedures
-                procedure_names = ', '.join([proc.get('name', '') for proc in procedures if proc.get('name')]) if procedures else None
-                procedure_groups = ', '.join([proc.get('groupLabel', '') for proc in procedures if proc.get('groupLabel')]) if procedures else None
-                
-                # Create complete address string if address data is available
-                full_address = None
-                if address:
-                    address_parts = []
-                    if address.get('street'):
-                        address_parts.append(f"{address.get('street')}")
-                    if address.get('number'):
-                        address_parts.append(f"{address.get('number')}")
-                    if address.get('additional'):
-                        address_parts.append(f"{address.get('additional')}")
-                    if address.get('neighborhood'):
-                        address_parts.append(f"{address.get('neighborhood')}")
-                    if address.get('city'):
-                        address_parts.append(f"{address.get('city')}")
-                    if state.get('name'):
-                        address_parts.append(f"{state.get('name')}")
-                    if address.get('postcode'):
-                        address_parts.append(f"{address.get('postcode')}")
-                    
-                    if address_parts:
-                        full_address = ', '.join(address_parts)
-                
-                # Fallback to addressLine if full address couldn't be constructed
-                if not full_address and customer.get('addressLine'):
-                    full_address = customer.get('addressLine')
-
-                transformed_quote = {
-                    'id': quote.get('id'),
-                    'createdAt': quote.get('createdAt'),
-                    'statusLabel': quote.get('statusLabel'),
-                    'isReseller': quote.get('isReseller'),
-                    'subtotal': quote.get('subtotal'),
-                    'discountAmount': quote.get('discountAmount'),
-                    'total': quote.get('total'),
-                    'comments': quote.get('comments'),
-                    'expirationDate': quote.get('expirationDate'),
-                    
-                    # Store and creator info
-                    'store_name': store.get('name'),
-                    'createdBy': createdBy.get('name'),
-                    
-                    # Customer info
-                    'customer_name': customer.get('name'),
-                    'customer_email': customer.get('email'),
-                    'telephone': customer.get('primaryTelephone'),
-                    'taxvatFormatted': customer.get('taxvatFormatted'),
-                    'address': full_address,
-                    
-                    # Procedures
-                    'procedures': procedure_names,
-                    'procedure_groups': procedure_groups,
-                }
-
-                transformed_quotes.append(transformed_quote)
-        
-            # Add first page to results
-            all_pending_quotes.extend(transformed_quotes)
-                
-            last_page = meta.get('lastPage', 1)
-            total_items = meta.get('total', len(pending_quotes_data))
-                
-            logger.info(f"Successfully fetched page 1/{last_page}, got {len(pending_quotes_data)} quotes")
-                
-            # If we have more pages, fetch them
-            if last_page > 1:
-                for page in range(2, last_page + 1):
-                    variables['currentPage'] = page
-                    page_data = await fetch_graphql(session, api_url, query, variables)
-                    
-                    if not page_data or 'errors' in page_data:
-                        logger.error(f"Error fetching page {page}/{last_page}")
-                        continue
-                    
-                    if 'data' in page_data and 'pendingQuotesReport' in page_data['data']:
-                        page_quotes = page_data['data']['pendingQuotesReport']['data']
-                        
-                        # Transform data for this page
-                        page_transformed = []
-                        for quote in page_quotes:
-                            # Extract nested objects safely
-                            customer = quote.get('customer', {}) or {}
-                            store = quote.get('store', {}) or {}
-                            createdBy = quote.get('createdBy', {}) or {}
-                            procedures = quote.get('procedures', []) or []
-                            
-                            # Extract address data if available
-                            address = customer.get('address', {}) or {}
-                            state = address.get('state', {}) or {}
-                            
-                            # Format procedures
-                            procedure_names = ', '.join([proc.get('name', '') for proc in procedures if proc.get('name')]) if procedures else None
-                            procedure_groups = ', '.join([proc.get('groupLabel', '') for proc in procedures if proc.get('groupLabel')]) if procedures else None
-                            
-                            # Create complete address string if address data is available
-                            full_address = None
-                            if address:
-                                address_parts = []
-                                if address.get('street'):
-                                    address_parts.append(f"{address.get('street')}")
-                                if address.get('number'):
-                                    address_parts.append(f"{address.get('number')}")
-                                if address.get('additional'):
-                                    address_parts.append(f"{address.get('additional')}")
-                                if address.get('neighborhood'):
-                                    address_parts.append(f"{address.get('neighborhood')}")
-                                if address.get('city'):
-                                    address_parts.append(f"{address.get('city')}")
-                                if state.get('name'):
-                                    address_parts.append(f"{state.get('name')}")
-                                if address.get('postcode'):
-                                    address_parts.append(f"{address.get('postcode')}")
-                                
-                                if address_parts:
-                                    full_address = ', '.join(address_parts)
-                            
-                            # Fallback to addressLine if full address couldn't be constructed
-                            if not full_address and customer.get('addressLine'):
-                                full_address = customer.get('addressLine')
-
-                            transformed_quote = {
-                                'id': quote.get('id'),
-                                'createdAt': quote.get('createdAt'),
-                                'statusLabel': quote.get('statusLabel'),
-                                'isReseller': quote.get('isReseller'),
-                                'subtotal': quote.get('subtotal'),
-                                'discountAmount': quote.get('discountAmount'),
-                                'total': quote.get('total'),
-                                'comments': quote.get('comments'),
-                                'expirationDate': quote.get('expirationDate'),
-                                
-                                # Store and creator info
-                                'store_name': store.get('name'),
-                                'createdBy': createdBy.get('name'),
-                                
-                                # Customer info
-                                'customer_name': customer.get('name'),
-                                'customer_email': customer.get('email'),
-                                'telephone': customer.get('primaryTelephone'),
-                                'taxvatFormatted': customer.get('taxvatFormatted'),
-                                'address': full_address,
-                                
-                                # Procedures
-                                'procedures': procedure_names,
-                                'procedure_groups': procedure_groups,
-                            }
-                            page_transformed.append(transformed_quote)
-                        
-                        all_pending_quotes.extend(page_transformed)
-                        logger.info(f"Successfully fetched page {page}/{last_page}, got {len(page_quotes)} quotes")
-                    
-                    # Add a delay between requests to avoid rate limiting
-                    await asyncio.sleep(2)
-        else:
-            logger.error(f"Unexpected API response structure: {data}")
-    
+        all_pending_quotes.extend(process_pending_quotes_data(pending_quotes_data))
     except Exception as e:
         logger.error(f"Error processing pending quotes data: {str(e)}")
+        _record_failure('pendingQuotesReport', reason=f"processing ({str(e)})")
     
     logger.info(f"Total pending quotes fetched: {len(all_pending_quotes)}")
     return all_pending_quotes
 
+PENDING_QUOTES_TRANSFORM = Transformer([
+    Field('id', 'id'),
+    Field('createdAt', 'createdAt'),
+    Field('statusLabel', 'statusLabel'),
+    Field('isReseller', 'isReseller'),
+    Field('subtotal', 'subtotal'),
+    Field('discountAmount', 'discountAmount'),
+    Field('total', 'total'),
+    Field('comments', 'comments'),
+    Field('expirationDate', 'expirationDate'),
+
+    # Store and creator info
+    Field('store_name', 'store.name'),
+    Field('createdBy', 'createdBy.name'),
+
+    # Customer info
+    Field('customer_name', 'customer.name'),
+    Field('customer_email', 'customer.email'),
+    Field('telephone', 'customer.primaryTelephone'),
+    Field('taxvatFormatted', 'customer.taxvatFormatted'),
+    Concat('address', [
+        'customer.address.street',
+        'customer.address.number',
+        'customer.address.additional',
+        'customer.address.neighborhood',
+        'customer.address.city',
+        'customer.address.state.name',
+        'customer.address.postcode',
+    ], fallback='customer.addressLine'),
+
+    # Procedures
+    Join('procedures', 'procedures', item='name', skip_empty=True),
+    Join('procedure_groups', 'procedures', item='groupLabel', skip_empty=True),
+])
+
+def process_pending_quotes_data(pending_quotes_data):
+    """Helper function to process and transform pending quotes data consistently"""
+    return PENDING_QUOTES_TRANSFORM.records(pending_quotes_data)
+
 async def fetch_and_process_pendingQuotes_report(start_date: str, end_date: str) -> List[Dict]:
     """
-    Creates a session and fetches pending quotes report data.
+    Fetches pending quotes report data using the shared CRM client session.
     
     Args:
         start_date: Start date in ISO format (YYYY-MM-DD)
@@ -308,12 +171,7 @@ async def fetch_and_process_pendingQuotes_report(start_date: str, end_date: str)
     Returns:
         List of processed pending quotes report dictionaries ready for database insertion
     """
-    import aiohttp
-    
-    async with aiohttp.ClientSession() as session:
-        quotes = await fetch_pendingQuotesReport(session, start_date, end_date)
-    
-    return quotes
+    return await crm_client.run(lambda session: fetch_pendingQuotesReport(session, start_date, end_date))
 
 # For testing purposes
 if __name__ == "__main__":
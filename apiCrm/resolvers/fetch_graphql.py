@@ -1,10 +1,14 @@
 import os
 import json
+import time
 import aiohttp
 import asyncio
 import logging
+import threading
 from pathlib import Path
+from email.utils import parsedate_to_datetime
 from dotenv import load_dotenv
+from .client_session import crm_client
 
 # Load environment variables with more explicit path
 env_path = Path('/Users/luisfaria/Desktop/sEngineer/dash/.env')
@@ -15,16 +19,220 @@ logger = logging.getLogger(__name__)
 # Fallback token that's known to work
 FALLBACK_TOKEN = 'XXXXXXXXX'
 
-async def fetch_graphql(session, url, query, variables):
+
+class AdaptiveTokenBucket:
+    """
+    Token bucket that paces every request sent to the CRM from this process.
+
+    Tokens refill at `rate` per second up to `capacity`. The rate grows slowly while
+    responses are fast and successful, is halved on 429/5xx and shrinks when latency
+    goes above `latency_target`. A `Retry-After` header pauses every caller until it expires.
+
+    The state is guarded by a threading lock, so one bucket can be shared by all event
+    loops and Streamlit sessions of the process.
+
+    Args:
+        rate: Initial requests per second
+        min_rate: Lowest rate the bucket backs off to
+        max_rate: Highest rate the bucket grows to
+        capacity: Maximum burst of requests
+        latency_target: Seconds above which a response is treated as a sign of overload
+        increase_step: Requests per second added after each healthy response
+    """
+
+    def __init__(self, rate=None, min_rate=None, max_rate=None, capacity=None, latency_target=None, increase_step=0.1):
+        self.rate = rate if rate is not None else float(os.getenv('API_CRM_RATE_LIMIT', 5))
+        self.min_rate = min_rate if min_rate is not None else float(os.getenv('API_CRM_RATE_MIN', 0.5))
+        self.max_rate = max_rate if max_rate is not None else float(os.getenv('API_CRM_RATE_MAX', 20))
+        self.capacity = capacity if capacity is not None else float(os.getenv('API_CRM_RATE_BURST', 5))
+        self.latency_target = latency_target if latency_target is not None else float(os.getenv('API_CRM_LATENCY_TARGET', 10))
+        self.increase_step = increase_step
+
+        self.rate = min(max(self.rate, self.min_rate), self.max_rate)
+        self.tokens = self.capacity
+        self.blocked_until = 0.0
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def _reserve(self):
+        """Take a token if one is available, otherwise return how long to wait for it."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self.blocked_until:
+                return self.blocked_until - now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    async def acquire(self):
+        """Wait until a request may be sent."""
+        while True:
+            wait_time = self._reserve()
+            if wait_time <= 0:
+                return
+            await asyncio.sleep(wait_time)
+
+    def on_success(self, latency):
+        """Grow the rate after a healthy response, or ease off when the CRM is getting slow."""
+        with self._lock:
+            if latency > self.latency_target:
+                self.rate = max(self.min_rate, self.rate * 0.8)
+            else:
+                self.rate = min(self.max_rate, self.rate + self.increase_step)
+
+    def on_throttle(self, retry_after=None):
+        """
+        Back off after a 429/5xx response.
+
+        Args:
+            retry_after: Seconds every caller must wait before the next request, if known
+        """
+        with self._lock:
+            old_rate = self.rate
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, 0.0)
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+        logger.warning(f"Throttling CRM requests from {old_rate:.2f} to {self.rate:.2f} req/s" + (f", pausing {retry_after:.1f}s" if retry_after else ""))
+
+
+def parse_retry_after(value):
+    """Parse a Retry-After header given either in seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+rate_limiter = AdaptiveTokenBucket()
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls into one.
+
+    The first caller for a key runs the call, every caller arriving while it is in flight
+    (on the same event loop) awaits the same future and receives the same result.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def in_flight(self):
+        """Number of calls currently running."""
+        with self._lock:
+            return len(self._calls)
+
+    async def do(self, key, call):
+        """
+        Run `call()` unless an identical call is already in flight, and return its result.
+
+        Args:
+            key: Hashable identity of the call
+            call: Zero-argument callable returning an awaitable
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._lock:
+                future = self._calls.get(key)
+                leader = future is None or future.get_loop() is not loop
+                if leader:
+                    future = loop.create_future()
+                    self._calls[key] = future
+
+            if leader:
+                break
+
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # The leader was cancelled, not us: take over the call
+                if not future.cancelled() or asyncio.current_task().cancelling():
+                    raise
+
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # Mark as retrieved when nobody else was waiting
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                if self._calls.get(key) is future:
+                    del self._calls[key]
+
+
+in_flight_requests = SingleFlight()
+
+# on_response callbacks of the callers waiting on an in-flight query, per event loop and query
+_response_observers = {}
+_response_observers_lock = threading.Lock()
+
+
+def _notify_response(observers_key, status, latency):
+    """Reports an HTTP response of a shared query to the on_response of every caller waiting on it."""
+    with _response_observers_lock:
+        observers = list(_response_observers.get(observers_key, ()))
+    for observer in observers:
+        observer(status, latency)
+
+
+async def fetch_graphql(session, url, query, variables, on_response=None):
     """
     Execute a GraphQL query using aiohttp with authentication from environment variables.
     
     Args:
-        session: aiohttp ClientSession
+        session: aiohttp ClientSession, or None to use the shared CRM client session
         url: GraphQL endpoint URL
         query: GraphQL query string
         variables: Query variables
+        on_response: Optional callback receiving (status, latency_seconds) for every HTTP response,
+            used by callers such as the paginator to adapt to throttling. A caller joining an
+            identical query already in flight receives the responses of that query from then on
     """
+    if session is None:
+        return await crm_client.run(lambda shared_session: fetch_graphql(shared_session, url, query, variables, on_response))
+
+    # Identical concurrent queries (e.g. several sessions opening the same page) share one request
+    key = (url, query, json.dumps(variables, sort_keys=True, default=str))
+    observers_key = (asyncio.get_running_loop(), key)
+    if on_response is not None:
+        with _response_observers_lock:
+            _response_observers.setdefault(observers_key, []).append(on_response)
+    try:
+        return await in_flight_requests.do(key, lambda: _post_graphql(
+            session, url, query, variables,
+            lambda status, latency: _notify_response(observers_key, status, latency)
+        ))
+    finally:
+        if on_response is not None:
+            with _response_observers_lock:
+                observers = _response_observers[observers_key]
+                observers.remove(on_response)
+                if not observers:
+                    del _response_observers[observers_key]
+
+async def _post_graphql(session, url, query, variables, on_response=None):
+    """Send a GraphQL query with rate limiting, retries and the fallback token."""
     # Try to get token from environment, fall back to hardcoded if needed
     token = os.getenv('API_CRM_TOKEN')
 
@@ -43,9 +251,18 @@ async def fetch_graphql(session, url, query, variables):
     
     while attempt < max_attempts:
         
+        retry_after = None
+        await rate_limiter.acquire()
+
         try:
+            started_at = time.monotonic()
             async with session.post(url, json=payload, headers=headers) as response:
+                latency = time.monotonic() - started_at
+                if on_response is not None:
+                    on_response(response.status, latency)
+
                 if response.status == 200:
+                    rate_limiter.on_success(latency)
                     data = await response.json()
                     if 'errors' in data:
                         error_msg = data['errors'][0].get('message', 'Unknown GraphQL error')
@@ -77,8 +294,10 @@ async def fetch_graphql(session, url, query, variables):
                         else:
                             logger.error("Authentication failed with fallback token")
                             return None
-                    elif response.status >= 500:
-                        logger.error("Server error - will retry")
+                    elif response.status == 429 or response.status >= 500:
+                        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                        rate_limiter.on_throttle(retry_after)
+                        logger.warning(f"CRM answered {response.status} - will retry")
                     else:
                         logger.error("Client error - check your request")
                         return None
@@ -86,14 +305,19 @@ async def fetch_graphql(session, url, query, variables):
             logger.error(f"Network error: {e}")
         except asyncio.TimeoutError:
             logger.error("Request timed out")
+            rate_limiter.on_throttle()
         except Exception as e:
             logger.error(f"Unexpected error: {e}")
 
         attempt += 1
         if attempt < max_attempts:
-            wait_time = min(5 * 2 ** attempt, 30)
-            logger.info(f"Retrying in {wait_time} seconds (attempt {attempt}/{max_attempts})...")
-            await asyncio.sleep(wait_time)
+            # Retry-After already pauses the shared bucket; otherwise back off briefly on our own
+            if retry_after is None:
+                wait_time = min(2 ** attempt, 30)
+                logger.info(f"Retrying in {wait_time} seconds (attempt {attempt}/{max_attempts})...")
+                await asyncio.sleep(wait_time)
+            else:
+                logger.info(f"Retrying after the CRM's Retry-After (attempt {attempt}/{max_attempts})...")
         else:
             logger.error("Max retries reached")
     
@@ -0,0 +1,275 @@
+"""
+Incremental sync of CRM reports using `updatedAt` high-water marks.
+
+The snapshot of a report is stored one day at a time, keyed on the report and the resolver
+fingerprint like report_cache (`<report>/<fingerprint>/<YYYY-MM-DD>.parquet`), so a
+month-so-far range finds yesterday's days again instead of starting a new snapshot. Each day
+keeps a watermark: the day before the sync that wrote it, so that a clock or timezone
+difference with the CRM cannot hide an update. A load fetches the days it does not have in
+full, then asks the CRM only for the records whose `updatedAt` is on or after the oldest
+watermark of the days it has and merges them: changed records replace their old version and
+land in the day they now belong to, records moved to a day outside the range are dropped.
+
+Records deleted in the CRM never show up in the delta, so every day is fetched in full again
+once it is older than API_CRM_SNAPSHOT_MAX_AGE seconds (a week by default).
+"""
+
+import os
+import time
+import asyncio
+import logging
+from pathlib import Path
+from datetime import date, timedelta
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+import pandas as pd
+from .paginator import track_fetch_failures
+from .report_cache import resolver_fingerprint
+from .sharding import split_date_range
+from .columnar import concat_tables, rows_to_output, rows_to_table, table_to_output, validate_output
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - pyarrow ships with streamlit
+    pa = pc = pq = None
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_METADATA_KEY = b'crm_watermark'
+FETCHED_AT_METADATA_KEY = b'crm_fetched_at'
+
+
+class SnapshotDay(NamedTuple):
+    """Stored rows of one day, the watermark they are synced to and when the day was last fetched in full."""
+    table: object
+    watermark: str
+    fetched_at: float
+
+
+class SnapshotStore:
+    """
+    Stores the snapshot of a report as one Parquet file per day, with its watermark and full
+    fetch time in the file metadata.
+
+    Args:
+        root: Directory holding the snapshots, defaults to `<API_CRM_CACHE_DIR>/snapshots`
+        max_age: Seconds after which a day is fetched in full again instead of patched with the delta
+    """
+
+    def __init__(self, root=None, max_age=None):
+        self.root = Path(root or Path(os.getenv('API_CRM_CACHE_DIR', '.cache/crm')) / 'snapshots')
+        self.max_age = max_age if max_age is not None else float(os.getenv('API_CRM_SNAPSHOT_MAX_AGE', 7 * 24 * 3600))
+
+    def _path(self, report: str, fingerprint: str, day: str) -> Path:
+        return self.root / report / fingerprint / f"{day}.parquet"
+
+    def load_day(self, report: str, fingerprint: str, day: str) -> Optional[SnapshotDay]:
+        """Return the stored day, or None when there is none or it is due for a full fetch."""
+        path = self._path(report, fingerprint, day)
+        if pq is None or not path.exists():
+            return None
+        try:
+            table = pq.read_table(path)
+            metadata = table.schema.metadata or {}
+            watermark = metadata.get(WATERMARK_METADATA_KEY, b'').decode('utf-8')
+            fetched_at = float(metadata.get(FETCHED_AT_METADATA_KEY, b'0'))
+        except Exception as e:
+            logger.error(f"Error reading {report} snapshot of {day}: {str(e)}")
+            return None
+        if not watermark or time.time() - fetched_at >= self.max_age:
+            return None
+        return SnapshotDay(table, watermark, fetched_at)
+
+    def save_day(self, report: str, fingerprint: str, day: str, snapshot: SnapshotDay):
+        """Replace the stored rows of a day atomically."""
+        if pq is None:
+            return
+        path = self._path(report, fingerprint, day)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            table = snapshot.table.replace_schema_metadata({
+                **(snapshot.table.schema.metadata or {}),
+                WATERMARK_METADATA_KEY: snapshot.watermark.encode('utf-8'),
+                FETCHED_AT_METADATA_KEY: repr(snapshot.fetched_at).encode('utf-8'),
+            })
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            pq.write_table(table, tmp_path, compression='zstd')
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Could not store {report} snapshot of {day}: {str(e)}")
+
+
+def _watermark() -> str:
+    return (date.today() - timedelta(days=1)).isoformat()
+
+
+def _day_runs(days: Sequence[str]) -> List[Tuple[str, str]]:
+    """Consecutive ISO days merged into (first, last) ranges."""
+    runs = []
+    for day in sorted(days):
+        if runs and date.fromisoformat(day) == date.fromisoformat(runs[-1][1]) + timedelta(days=1):
+            runs[-1] = (runs[-1][0], day)
+        else:
+            runs.append((day, day))
+    return runs
+
+
+def split_by_day(table, date_key: str, days: Sequence[str]) -> Dict[str, object]:
+    """
+    Rows of a table per day, the day being the first 10 characters of `date_key`.
+
+    Returns:
+        {day: Arrow table} for every day of `days`, empty when it has no rows. Rows of other
+        days, or without date, are dropped.
+    """
+    if date_key not in table.column_names:
+        empty = table.slice(0, 0)
+        return {day: empty for day in days}
+    row_days = pc.utf8_slice_codeunits(table.column(date_key).cast(pa.string()), 0, 10)
+    positions = {}
+    for position, day in enumerate(row_days.to_pylist()):
+        positions.setdefault(day, []).append(position)
+    return {day: table.take(pa.array(positions.get(day, []), type=pa.int64())) for day in days}
+
+
+def merge_changes(
+    partitions: Dict[str, object],
+    changes,
+    id_key: str,
+    date_key: str,
+    days: Sequence[str],
+) -> Dict[str, object]:
+    """
+    Applies changed records to day partitions.
+
+    Args:
+        partitions: {day: Arrow table} of the stored days
+        changes: Arrow table of the rows updated since the watermark, possibly of other days
+        id_key: Key identifying a row
+        date_key: Key whose first 10 characters are the day of a row
+        days: Days to return, stored or not
+
+    Returns:
+        {day: Arrow table} for every day of `days`: the stored rows without the old version of
+        the changed rows, followed by the changed rows that (now) belong to that day
+    """
+    changed_ids = set(changes.column(id_key).to_pylist()) if id_key in changes.column_names else set()
+    changed_by_day = split_by_day(changes, date_key, days)
+    merged = {}
+    for day in days:
+        table = partitions.get(day)
+        if table is not None and changed_ids and id_key in table.column_names:
+            keep = [row_id not in changed_ids for row_id in table.column(id_key).to_pylist()]
+            if not all(keep):
+                table = table.filter(pa.array(keep, type=pa.bool_()))
+        if table is None:
+            merged[day] = changed_by_day[day]
+        elif changed_by_day[day].num_rows:
+            merged[day] = concat_tables([table, changed_by_day[day]])
+        else:
+            merged[day] = table
+    return merged
+
+
+async def fetch_incremental(
+    report: str,
+    fetch_full: Callable[[str, str], Awaitable[Union[List[Dict], Dict[str, List]]]],
+    fetch_updated: Callable[[str, str], Awaitable[Union[List[Dict], Dict[str, List]]]],
+    start_date: str,
+    end_date: str,
+    id_key: str,
+    date_key: str,
+    resolver=None,
+    store: Optional[SnapshotStore] = None,
+    output: str = 'records',
+) -> Union[List[Dict], Dict[str, List], pd.DataFrame]:
+    """
+    Returns the rows of a range, fetching in full only the days without snapshot and only the
+    records updated since the last sync for the others.
+
+    Falls back to a full fetch of the range when the delta query fails. Days whose full fetch
+    reported a failed page or shard (see track_fetch_failures) are returned but not stored:
+    the next deltas would never bring their missing rows back.
+
+    Args:
+        report: Snapshot namespace, usually the GraphQL report name
+        fetch_full: Coroutine function fetching every row of a (start, end) range, as records or {column: values}
+        fetch_updated: Coroutine function fetching the rows whose updatedAt is within a (start, end) date range
+        start_date: Start date in ISO format (YYYY-MM-DD)
+        end_date: End date in ISO format (YYYY-MM-DD)
+        id_key: Key identifying a row
+        date_key: Key whose first 10 characters (YYYY-MM-DD) are the day a row belongs to
+        resolver: Resolver whose code is fingerprinted into the snapshot key
+        store: Snapshot store, defaults to the module store
+        output: 'records', 'columns' or 'dataframe'
+
+    Returns:
+        Rows for the range in day order, in the requested output format
+    """
+    validate_output(output)
+    store = store or snapshot_store
+    fingerprint = resolver_fingerprint(resolver or fetch_full)
+    days = [day for day, _ in split_date_range(start_date, end_date, 'day')]
+    watermark = _watermark()
+
+    stored = {}
+    for day in days:
+        snapshot = await asyncio.to_thread(store.load_day, report, fingerprint, day)
+        if snapshot is not None:
+            stored[day] = snapshot
+
+    partitions = {}
+    if stored:
+        previous_watermark = min(snapshot.watermark for snapshot in stored.values())
+        with track_fetch_failures() as failures:
+            try:
+                changes = rows_to_table(await fetch_updated(previous_watermark, date.today().isoformat()))
+                if changes is None:
+                    failures.append('delta rows')
+            except Exception as e:
+                logger.error(f"Error fetching {report} changes since {previous_watermark}: {str(e)}")
+                failures.append('delta query')
+        if not failures:
+            try:
+                partitions = merge_changes({day: snapshot.table for day, snapshot in stored.items()}, changes, id_key, date_key, list(stored))
+            except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+                failures.append(f"merge ({str(e)})")
+        if failures:
+            logger.warning(f"Incremental {report} sync failed ({', '.join(failures)}), falling back to a full fetch")
+            stored, partitions = {}, {}
+        else:
+            logger.info(f"Incremental {report} sync: {changes.num_rows} records updated since {previous_watermark}, {len(stored)} days")
+
+    fresh = set()
+    for first, last in _day_runs([day for day in days if day not in stored]):
+        with track_fetch_failures() as failures:
+            rows = await fetch_full(first, last)
+        table = rows_to_table(rows)
+        run_days = [day for day, _ in split_date_range(first, last, 'day')]
+        if table is not None:
+            try:
+                # Fetched rows are the current version of their records, whichever stored day held them
+                partitions = merge_changes(partitions, table, id_key, date_key, [*partitions, *run_days])
+            except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+                logger.warning(f"Could not merge the {report} snapshot: {str(e)}")
+                table = None
+        if table is None:
+            logger.warning(f"Not snapshotting {report}, returning the rows as fetched")
+            if (first, last) != (start_date, end_date):
+                rows = await fetch_full(start_date, end_date)
+            return rows_to_output(rows, output)
+        if failures:
+            logger.warning(f"Not storing the {report} snapshot of {first} to {last}, failed: {', '.join(failures)}")
+        else:
+            fresh.update(run_days)
+
+    now = time.time()
+    for day, table in partitions.items():
+        if day in stored or day in fresh:
+            fetched_at = now if day in fresh else stored[day].fetched_at
+            await asyncio.to_thread(store.save_day, report, fingerprint, day, SnapshotDay(table, watermark, fetched_at))
+    return table_to_output(concat_tables([partitions[day] for day in days if day in partitions]), output)
+
+
+snapshot_store = SnapshotStore()
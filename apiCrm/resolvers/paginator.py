@@ -0,0 +1,185 @@
+"""
+Concurrent page fetching for the paginated CRM reports.
+
+Every report answers `meta { currentPage lastPage total }`, so page 1 tells us how many pages
+exist. The remaining pages are then fired concurrently under an adaptive limit and put back
+in page order before the resolver transforms them.
+"""
+
+import os
+import math
+import asyncio
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Dict, Optional
+from .fetch_graphql import fetch_graphql
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONCURRENCY = int(os.getenv('API_CRM_MAX_CONCURRENT_PAGES', 4))
+
+# Resolvers turn a failed fetch (or a failed transform of the rows) into an empty or partial
+# list, callers that must tell the difference (e.g. the report cache) collect the failures
+# through this context variable
+_fetch_failures: ContextVar[Optional[List[str]]] = ContextVar('crm_fetch_failures', default=None)
+
+
+@contextmanager
+def track_fetch_failures():
+    """
+    Collects the pages that failed to load while the block runs.
+
+    Yields:
+        List that receives a description of every failed page
+    """
+    failures = []
+    token = _fetch_failures.set(failures)
+    try:
+        yield failures
+    finally:
+        _fetch_failures.reset(token)
+
+
+def _record_failure(report_name: str, page: Optional[int] = None, reason: Optional[str] = None):
+    """Reports a page that failed to load, or a `reason` such as a processing error, to track_fetch_failures."""
+    failures = _fetch_failures.get()
+    if failures is not None:
+        failures.append(f"{report_name} page {page}" if reason is None else f"{report_name} {reason}")
+
+
+class AdaptiveConcurrency:
+    """
+    Bounds the number of pages in flight and adapts it to how the CRM is coping.
+
+    The limit is halved whenever the CRM answers 429 or 5xx and grows back by one
+    after `increase_after` consecutive successful responses (AIMD).
+
+    Args:
+        max_concurrency: Upper bound of simultaneous requests
+        min_concurrency: Lower bound the limit can shrink to
+        increase_after: Successful responses needed before the limit grows by one
+    """
+
+    def __init__(self, max_concurrency: int = DEFAULT_MAX_CONCURRENCY, min_concurrency: int = 1, increase_after: int = 5):
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.increase_after = increase_after
+        self.limit = self.max_concurrency
+        self.in_flight = 0
+        self._successes = 0
+        self._condition = None
+
+    def _get_condition(self):
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    async def __aenter__(self):
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        condition = self._get_condition()
+        async with condition:
+            self.in_flight -= 1
+            condition.notify_all()
+
+    def observe(self, status: int, latency: Optional[float] = None):
+        """Feed an HTTP status back into the limiter (compatible with fetch_graphql's on_response)."""
+        if status == 429 or status >= 500:
+            new_limit = max(self.min_concurrency, self.limit // 2)
+            if new_limit != self.limit:
+                logger.warning(f"CRM answered {status}, reducing concurrent pages from {self.limit} to {new_limit}")
+            self.limit = new_limit
+            self._successes = 0
+        elif status == 200:
+            self._successes += 1
+            if self._successes >= self.increase_after and self.limit < self.max_concurrency:
+                self.limit += 1
+                self._successes = 0
+                if self._condition is not None:
+                    asyncio.ensure_future(self._notify())
+
+    async def _notify(self):
+        condition = self._get_condition()
+        async with condition:
+            condition.notify_all()
+
+
+def _error_message(data) -> str:
+    if data is None:
+        return 'No data returned'
+    return (data.get('errors') or [{}])[0].get('message', 'Unknown error')
+
+
+def _resolve_last_page(meta: Dict) -> int:
+    """lastPage from meta, capped by ceil(total / perPage) when the CRM reports both."""
+    last_page = meta.get('lastPage') or 1
+    total, per_page = meta.get('total'), meta.get('perPage')
+    if total is not None and per_page:
+        last_page = min(last_page, max(1, math.ceil(total / per_page)))
+    return last_page
+
+
+async def fetch_all_pages(
+    session,
+    api_url: str,
+    query: str,
+    variables: Dict,
+    report_name: str,
+    max_concurrency: Optional[int] = None,
+) -> Optional[List[Dict]]:
+    """
+    Fetches every page of a paginated CRM report.
+
+    Args:
+        session: The aiohttp ClientSession object
+        api_url: GraphQL endpoint URL
+        query: GraphQL query string accepting a `$currentPage` variable
+        variables: Query variables for page 1 (not mutated)
+        report_name: Root field of the report in the response, e.g. 'leadsReport'
+        max_concurrency: Maximum pages in flight, defaults to API_CRM_MAX_CONCURRENT_PAGES
+
+    Returns:
+        List of raw report rows in page order, or None if page 1 could not be fetched
+    """
+    limiter = AdaptiveConcurrency(max_concurrency or DEFAULT_MAX_CONCURRENCY)
+
+    first_page = await fetch_graphql(session, api_url, query, {**variables, 'currentPage': 1}, on_response=limiter.observe)
+    report = ((first_page or {}).get('data') or {}).get(report_name)
+    if first_page is None or 'errors' in first_page or report is None:
+        logger.error(f"Failed initial {report_name} fetch: {_error_message(first_page)}")
+        _record_failure(report_name, 1)
+        return None
+
+    meta = report.get('meta') or {}
+    last_page = _resolve_last_page(meta)
+    pages = {1: report.get('data') or []}
+
+    logger.info(f"Fetched {report_name} page 1/{last_page}, got {len(pages[1])} rows out of approximately {meta.get('total', len(pages[1]))}")
+
+    async def fetch_page(page: int):
+        async with limiter:
+            page_data = await fetch_graphql(session, api_url, query, {**variables, 'currentPage': page}, on_response=limiter.observe)
+
+        page_report = ((page_data or {}).get('data') or {}).get(report_name)
+        if page_data is None or 'errors' in page_data or page_report is None:
+            logger.error(f"Failed to fetch {report_name} page {page}/{last_page}. Error: {_error_message(page_data)}")
+            _record_failure(report_name, page)
+            return
+        pages[page] = page_report.get('data') or []
+        logger.info(f"Fetched {report_name} page {page}/{last_page}, got {len(pages[page])} rows")
+
+    if last_page > 1:
+        await asyncio.gather(*(fetch_page(page) for page in range(2, last_page + 1)))
+
+    rows = []
+    for page in sorted(pages):
+        rows.extend(row for row in pages[page] if row is not None)
+
+    logger.info(f"Total {report_name} rows fetched: {len(rows)} from {len(pages)}/{last_page} pages")
+    return rows
@@ -0,0 +1,197 @@
+"""
+Persistent per-day cache of processed CRM report rows.
+
+Each report day is stored as one Parquet file under API_CRM_CACHE_DIR
+(`<report>/<fingerprint>/<YYYY-MM-DD>.parquet`). Closed days never change in the CRM, so
+they never expire; today, yesterday and future days are refreshed after API_CRM_CACHE_TTL
+seconds. A range request only goes to the CRM for the days it does not already have.
+
+The fingerprint covers the resolver's query text and constants, so editing a query starts
+a fresh cache instead of serving rows with the old shape.
+"""
+
+import os
+import time
+import asyncio
+import hashlib
+import logging
+from pathlib import Path
+from datetime import date, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Union
+import pandas as pd
+from .paginator import track_fetch_failures
+from .sharding import dedupe_by_id, fetch_sharded, split_date_range
+from .columnar import as_records, concat_tables, dedupe_table, rows_to_output, rows_to_table, table_to_output, validate_output
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - pyarrow ships with streamlit
+    pa = pq = None
+
+logger = logging.getLogger(__name__)
+
+
+def _fingerprint_parts(resolver) -> List[str]:
+    if isinstance(resolver, (tuple, list)):
+        return [part for item in resolver for part in _fingerprint_parts(item)]
+    if isinstance(resolver, str):
+        return [resolver]
+    code = getattr(resolver, '__code__', None)
+    if code is None:
+        return []
+    return [repr(const) for const in code.co_consts if isinstance(const, (str, int, float))]
+
+
+def resolver_fingerprint(resolver) -> str:
+    """
+    Short hash of what shapes a report's rows.
+
+    Args:
+        resolver: A resolver function (its code constants, GraphQL query included, are hashed),
+            a query string, or a tuple mixing both
+    """
+    parts = _fingerprint_parts(resolver)
+    if not parts:
+        return 'default'
+    return hashlib.sha1('\n'.join(parts).encode('utf-8')).hexdigest()[:12]
+
+
+class ReportCache:
+    """
+    Day-partitioned Parquet cache for processed report rows.
+
+    Args:
+        root: Directory holding the cache files
+        recent_ttl: Seconds a cached day stays fresh when it is yesterday, today or later
+        enabled: Whether the cache is used at all
+        max_concurrency: Maximum missing days fetched at the same time
+    """
+
+    def __init__(self, root=None, recent_ttl=None, enabled=None, max_concurrency=None):
+        self.root = Path(root or os.getenv('API_CRM_CACHE_DIR', '.cache/crm'))
+        self.recent_ttl = recent_ttl if recent_ttl is not None else float(os.getenv('API_CRM_CACHE_TTL', 900))
+        if enabled is None:
+            enabled = os.getenv('API_CRM_CACHE', '1').lower() not in ('0', 'false', 'no')
+        self.enabled = enabled and pq is not None
+        self.max_concurrency = max_concurrency or int(os.getenv('API_CRM_MAX_CONCURRENT_SHARDS', 4))
+
+    def _path(self, report: str, fingerprint: str, day: str) -> Path:
+        return self.root / report / fingerprint / f"{day}.parquet"
+
+    def _is_fresh(self, path: Path, day: str) -> bool:
+        if date.fromisoformat(day) < date.today() - timedelta(days=1):
+            return True
+        return time.time() - path.stat().st_mtime < self.recent_ttl
+
+    def read_day(self, report: str, fingerprint: str, day: str):
+        """Return the cached Arrow table of a day, or None when missing or stale."""
+        path = self._path(report, fingerprint, day)
+        try:
+            if not path.exists() or not self._is_fresh(path, day):
+                return None
+            return pq.read_table(path)
+        except Exception as e:
+            logger.error(f"Error reading cached {report} for {day}: {str(e)}")
+            return None
+
+    def write_day(self, report: str, fingerprint: str, day: str, table):
+        """Store the Arrow table of a day, replacing any previous file atomically."""
+        path = self._path(report, fingerprint, day)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            pq.write_table(table, tmp_path, compression='zstd')
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Could not cache {report} for {day}: {str(e)}")
+
+    async def fetch(
+        self,
+        report: str,
+        fetch_range: Callable[[str, str], Awaitable[List[Dict]]],
+        start_date: str,
+        end_date: str,
+        id_key: Optional[str] = 'id',
+        resolver=None,
+        output: str = 'records',
+    ) -> Union[List[Dict], Dict[str, List], pd.DataFrame]:
+        """
+        Fetches a date range, serving the days already cached from disk.
+
+        Missing days are fetched one day at a time so that each can be stored on its own.
+        Days where any page failed to load or the rows failed to process (both reported through
+        paginator._record_failure) are returned but not cached, and days whose resolver raised
+        are skipped: an empty day in the cache would be served forever. Days are merged as
+        Arrow tables and only converted to the output format at the end.
+
+        Args:
+            report: Cache namespace, usually the GraphQL report name
+            fetch_range: Coroutine function fetching the processed rows of one (start, end) range, as
+                records or as {column: values}
+            start_date: Start date in ISO format (YYYY-MM-DD)
+            end_date: End date in ISO format (YYYY-MM-DD)
+            id_key: Key identifying a row, used to de-duplicate the merged days (None keeps every row)
+            resolver: Resolver (or query/tuple, see resolver_fingerprint) fingerprinted into the cache key
+            output: 'records', 'columns' or 'dataframe'
+
+        Returns:
+            Merged rows in day order, in the requested output format
+        """
+        validate_output(output)
+        if not self.enabled:
+            rows = await fetch_sharded(fetch_range, start_date, end_date, id_key=id_key)
+            return rows_to_output(rows, output)
+
+        fingerprint = resolver_fingerprint(resolver or fetch_range)
+        days = [day for day, _ in split_date_range(start_date, end_date, 'day')]
+        tables_by_day = {}
+        for day in days:
+            cached = await asyncio.to_thread(self.read_day, report, fingerprint, day)
+            if cached is not None:
+                tables_by_day[day] = cached
+
+        missing = [day for day in days if day not in tables_by_day]
+        logger.info(f"{report} cache: {len(days) - len(missing)}/{len(days)} days cached, fetching {len(missing)}")
+
+        # Days whose rows Arrow could not type are kept as plain rows and never cached
+        rows_by_day = {}
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def fetch_day(day: str):
+            async with semaphore:
+                with track_fetch_failures() as failures:
+                    try:
+                        rows = await fetch_range(day, day) or []
+                    except Exception as e:
+                        logger.error(f"Error fetching {report} for {day}, not caching it: {str(e)}")
+                        return
+                table = rows_to_table(rows)
+                if table is None:
+                    rows_by_day[day] = rows
+                    return
+                tables_by_day[day] = table
+                if failures:
+                    logger.warning(f"Not caching {report} for {day}, failed: {', '.join(failures)}")
+                    return
+                await asyncio.to_thread(self.write_day, report, fingerprint, day, table)
+
+        await asyncio.gather(*(fetch_day(day) for day in missing))
+
+        if not rows_by_day:
+            try:
+                table = concat_tables([tables_by_day[day] for day in days if day in tables_by_day])
+                return table_to_output(dedupe_table(table, id_key), output)
+            except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+                logger.warning(f"Could not merge {report} days as Arrow tables: {str(e)}")
+
+        merged = []
+        for day in days:
+            if day in tables_by_day:
+                merged.extend(tables_by_day[day].to_pylist())
+            else:
+                merged.extend(as_records(rows_by_day.get(day, [])))
+        return rows_to_output(dedupe_by_id(merged, id_key), output)
+
+
+report_cache = ReportCache()
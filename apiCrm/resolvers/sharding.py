@@ -0,0 +1,135 @@
+"""
+Date-range sharding for the large CRM reports.
+
+A 90-day appointments or gross sales window is a single huge result set that has to be
+paged through end to end. Splitting it into day or week sub-ranges lets the shards run
+concurrently, keeps each one small enough to retry cheaply, and the merged rows are
+de-duplicated by id in case a record shows up on both sides of a shard boundary. Shards
+returned as {column: values} are merged as Arrow tables and stay columns.
+"""
+
+import os
+import asyncio
+import logging
+from datetime import date, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, Union
+from .columnar import as_records, concat_tables, dedupe_table, rows_to_table
+from .paginator import _record_failure
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - pyarrow ships with streamlit
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+SHARD_DAYS = {'day': 1, 'week': 7}
+DEFAULT_SHARD = os.getenv('API_CRM_SHARD', 'week')
+DEFAULT_MAX_CONCURRENT_SHARDS = int(os.getenv('API_CRM_MAX_CONCURRENT_SHARDS', 4))
+
+
+def split_date_range(start_date: str, end_date: str, shard: str = DEFAULT_SHARD) -> List[Tuple[str, str]]:
+    """
+    Splits an inclusive date range into consecutive inclusive sub-ranges.
+
+    Args:
+        start_date: Start date in ISO format (YYYY-MM-DD)
+        end_date: End date in ISO format (YYYY-MM-DD)
+        shard: 'day' or 'week'
+
+    Returns:
+        List of (start, end) tuples in ISO format, in chronological order
+    """
+    if shard not in SHARD_DAYS:
+        raise ValueError(f"Unknown shard size '{shard}', expected one of {list(SHARD_DAYS)}")
+
+    start, end = date.fromisoformat(start_date), date.fromisoformat(end_date)
+    if end < start:
+        return [(start_date, end_date)]
+
+    step = timedelta(days=SHARD_DAYS[shard])
+    shards = []
+    while start <= end:
+        shard_end = min(start + step - timedelta(days=1), end)
+        shards.append((start.isoformat(), shard_end.isoformat()))
+        start = shard_end + timedelta(days=1)
+    return shards
+
+
+def dedupe_by_id(rows: List[Dict], id_key: Optional[str] = 'id') -> List[Dict]:
+    """Keeps the first row for every id, rows without an id (or every row when id_key is None) are kept."""
+    if id_key is None:
+        return list(rows)
+    seen = set()
+    unique_rows = []
+    for row in rows:
+        row_id = row.get(id_key)
+        if row_id not in (None, ''):
+            if row_id in seen:
+                continue
+            seen.add(row_id)
+        unique_rows.append(row)
+    return unique_rows
+
+
+async def fetch_sharded(
+    fetch_range: Callable[[str, str], Awaitable[Union[List[Dict], Dict[str, List]]]],
+    start_date: str,
+    end_date: str,
+    id_key: Optional[str] = 'id',
+    shard: Optional[str] = None,
+    max_concurrency: Optional[int] = None,
+) -> Union[List[Dict], Dict[str, List]]:
+    """
+    Fetches a date range shard by shard and merges the results.
+
+    Ranges that fit in a single shard are fetched directly.
+
+    Args:
+        fetch_range: Coroutine function fetching the rows of one (start, end) range, as records or {column: values}
+        start_date: Start date in ISO format (YYYY-MM-DD)
+        end_date: End date in ISO format (YYYY-MM-DD)
+        id_key: Key identifying a row in the processed output, used for de-duplication (None keeps every row)
+        shard: 'day' or 'week', defaults to API_CRM_SHARD
+        max_concurrency: Maximum shards in flight, defaults to API_CRM_MAX_CONCURRENT_SHARDS
+
+    Returns:
+        Merged and de-duplicated rows in shard order (a failed shard is logged, reported through
+        paginator._record_failure and contributes no rows), as {column: values} when the shards
+        returned columns and a list of rows otherwise
+    """
+    shards = split_date_range(start_date, end_date, shard or DEFAULT_SHARD)
+    if len(shards) <= 1:
+        return await fetch_range(start_date, end_date)
+
+    logger.info(f"Fetching {start_date} to {end_date} in {len(shards)} shards")
+    semaphore = asyncio.Semaphore(max_concurrency or DEFAULT_MAX_CONCURRENT_SHARDS)
+
+    async def fetch_shard(shard_start: str, shard_end: str) -> Union[List[Dict], Dict[str, List]]:
+        async with semaphore:
+            try:
+                return await fetch_range(shard_start, shard_end) or []
+            except Exception as e:
+                logger.error(f"Error fetching shard {shard_start} to {shard_end}: {str(e)}")
+                # The merged rows are incomplete, callers that store them must know (see track_fetch_failures)
+                _record_failure('shard', reason=f"{shard_start} to {shard_end} ({str(e)})")
+                return []
+
+    results = await asyncio.gather(*(fetch_shard(shard_start, shard_end) for shard_start, shard_end in shards))
+
+    if any(isinstance(result, dict) for result in results):
+        tables = [rows_to_table(result) for result in results]
+        if all(table is not None for table in tables):
+            try:
+                merged = concat_tables(tables)
+                unique = dedupe_table(merged, id_key)
+                logger.info(f"Merged {merged.num_rows} rows from {len(shards)} shards into {unique.num_rows} unique rows")
+                return unique.to_pydict()
+            except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+                logger.warning(f"Could not merge shards as Arrow tables: {str(e)}")
+        results = [as_records(result) for result in results]
+
+    rows = [row for shard_rows in results for row in shard_rows]
+    unique_rows = dedupe_by_id(rows, id_key)
+    logger.info(f"Merged {len(rows)} rows from {len(shards)} shards into {len(unique_rows)} unique rows")
+    return unique_rows
@@ -0,0 +1,320 @@
+"""
+Declarative field mapping for the CRM report transforms.
+
+A report's output row is described once as a list of fields (a nested path, a list join, a
+fallback chain...) instead of a hand-written chain of `.get(...) or {}` calls. A page is
+transformed column by column: every nested object is looked up once per row and shared by
+the fields reading it, and each field turns those columns into its output column, so
+'columns' and 'dataframe' output never build a dict per row.
+
+Missing values follow `dict.get`: a missing key or a missing/None parent object gives the
+field's default, while a key that is present with None keeps None.
+"""
+
+import string
+import logging
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+import pandas as pd
+from .columnar import validate_output
+
+logger = logging.getLogger(__name__)
+
+_EMPTY = {}
+
+
+def compile_path(path: str, default=None) -> Callable[[Dict], Any]:
+    """
+    Getter for a dotted path such as 'customer.source.title'.
+
+    Args:
+        path: Keys separated by dots
+        default: Value returned when a key or a parent object is missing
+
+    Returns:
+        Function taking a row dict and returning the value at the path
+    """
+    *parents, last = path.split('.')
+
+    def get(row):
+        value = row
+        for key in parents:
+            value = value.get(key)
+            if not isinstance(value, dict):
+                return default
+        return value.get(last, default)
+    return get
+
+
+def _text(value) -> str:
+    return '' if value is None else str(value)
+
+
+_CONVERSIONS = {'s': str, 'r': repr, 'a': ascii}
+
+
+def compile_template(template: str) -> Callable[[Dict], str]:
+    """
+    Renderer of a str.format template whose fields are dotted paths in a dict.
+
+    Args:
+        template: Template such as '{description} (Q:{quantity})'
+
+    Returns:
+        Function taking a dict and returning the rendered string, missing keys rendering as ''
+    """
+    parts = []
+    for literal, field, spec, conversion in string.Formatter().parse(template):
+        get = compile_path(field, '') if field is not None else None
+        parts.append((literal, get, spec or '', _CONVERSIONS.get(conversion)))
+
+    def render(item):
+        out = []
+        for literal, get, spec, convert in parts:
+            out.append(literal)
+            if get is not None:
+                value = get(item)
+                out.append(format(convert(value) if convert else value, spec))
+        return ''.join(out)
+    return render
+
+
+def _describe(value) -> str:
+    if callable(value):
+        return f"{getattr(value, '__module__', '')}.{getattr(value, '__qualname__', repr(value))}"
+    return repr(value)
+
+
+class _Page:
+    """
+    Rows of a page, read column by column.
+
+    Every nested object is looked up once per row and shared by the fields reading it, e.g.
+    'customer.name' and 'customer.email' both reuse the column of customer objects.
+    """
+
+    def __init__(self, rows: List[Dict]):
+        self.rows = [row for row in rows if row is not None]
+        self._parents = {(): self.rows}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def parents(self, keys: Tuple[str, ...]) -> List[Dict]:
+        """Objects at `keys` in every row, _EMPTY where one is missing or not an object."""
+        if keys not in self._parents:
+            key = keys[-1]
+            values = (parent.get(key) for parent in self.parents(keys[:-1]))
+            self._parents[keys] = [value if isinstance(value, dict) else _EMPTY for value in values]
+        return self._parents[keys]
+
+    def values(self, path: str, default=None) -> List:
+        """Column of the values at a dotted path."""
+        *parents, last = path.split('.')
+        return [parent.get(last, default) for parent in self.parents(tuple(parents))]
+
+
+class _Spec:
+    """Base of the field specs: a stable repr, used to fingerprint cached rows."""
+
+    def __repr__(self):
+        args = ', '.join(f"{key}={_describe(value)}" for key, value in vars(self).items())
+        return f"{type(self).__name__}({args})"
+
+    def _converted(self, values: List) -> List:
+        convert = getattr(self, 'convert', None)
+        return [convert(value) for value in values] if convert is not None else values
+
+
+class Field(_Spec):
+    """
+    Value at a nested path.
+
+    Args:
+        name: Output column
+        path: Dotted path in the raw row
+        default: Value when the path is missing
+        convert: Optional function applied to the value
+    """
+
+    def __init__(self, name: str, path: str, default=None, convert: Optional[Callable] = None):
+        self.name = name
+        self.path = path
+        self.default = default
+        self.convert = convert
+
+    def column(self, page: _Page) -> List:
+        return self._converted(page.values(self.path, self.default))
+
+
+class Const(_Spec):
+    """Same value on every row, for columns the CRM does not provide."""
+
+    def __init__(self, name: str, value=None):
+        self.name = name
+        self.value = value
+
+    def column(self, page: _Page) -> List:
+        return [self.value] * len(page)
+
+
+class Coalesce(_Spec):
+    """
+    First truthy value among several paths.
+
+    Args:
+        name: Output column
+        paths: Dotted paths, tried in order
+        default: Value when none of them is truthy
+        convert: Optional function applied to the value
+    """
+
+    def __init__(self, name: str, paths: Sequence[str], default=None, convert: Optional[Callable] = None):
+        self.name = name
+        self.paths = list(paths)
+        self.default = default
+        self.convert = convert
+
+    def column(self, page: _Page) -> List:
+        candidates = zip(*(page.values(path) for path in self.paths))
+        return self._converted([next(filter(None, values), self.default) for values in candidates])
+
+
+class Join(_Spec):
+    """
+    Joins the items of a list into one string, e.g. the numbers of customer.telephones.
+
+    Args:
+        name: Output column
+        path: Dotted path of the list
+        item: Dotted path of the value inside each item (missing gives '')
+        template: str.format template rendered with each item, instead of `item`
+        sep: Separator between items
+        when: Dotted path that must be truthy for an item to be kept
+        skip_empty: Drop items whose value is empty
+        default: Value when the list is missing or empty
+
+    Empty (None) items are skipped.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        path: str,
+        item: Optional[str] = None,
+        template: Optional[str] = None,
+        sep: str = ', ',
+        when: Optional[str] = None,
+        skip_empty: bool = False,
+        default=None,
+    ):
+        if (item is None) == (template is None):
+            raise ValueError(f"Join '{name}' needs exactly one of item or template")
+        self.name = name
+        self.path = path
+        self.item = item
+        self.template = template
+        self.sep = sep
+        self.when = when
+        self.skip_empty = skip_empty
+        self.default = default
+
+    def join_items(self) -> Callable[[Optional[List]], Any]:
+        """Function turning the list found at `path` into the joined string."""
+        value = compile_template(self.template) if self.template is not None else compile_path(self.item, '')
+        keep = compile_path(self.when) if self.when else None
+        sep, default, skip_empty = self.sep, self.default, self.skip_empty
+
+        def join(items):
+            if not items:
+                return default
+            values = [value(item) for item in items if item and (keep is None or keep(item))]
+            if skip_empty:
+                values = [text for text in values if text]
+            try:
+                return sep.join(values)
+            except TypeError:
+                return sep.join([_text(text) for text in values])
+        return join
+
+    def column(self, page: _Page) -> List:
+        join = self.join_items()
+        return [join(items) for items in page.values(self.path)]
+
+
+class Concat(_Spec):
+    """
+    Joins the truthy values of several paths, e.g. the parts of an address.
+
+    Args:
+        name: Output column
+        paths: Dotted paths, in output order
+        sep: Separator between values
+        fallback: Dotted path used when none of the paths has a value
+    """
+
+    def __init__(self, name: str, paths: Sequence[str], sep: str = ', ', fallback: Optional[str] = None):
+        self.name = name
+        self.paths = list(paths)
+        self.sep = sep
+        self.fallback = fallback
+
+    @staticmethod
+    def _concat(sep: str, values: Sequence, fallback=None):
+        parts = [f"{value}" for value in values if value]
+        if parts:
+            return sep.join(parts)
+        return fallback or None
+
+    def column(self, page: _Page) -> List:
+        fallbacks = page.values(self.fallback) if self.fallback else [None] * len(page)
+        parts = zip(*(page.values(path) for path in self.paths))
+        return [self._concat(self.sep, values, fallback) for values, fallback in zip(parts, fallbacks)]
+
+
+class Transformer:
+    """
+    Report transform, computed column by column.
+
+    Args:
+        spec: Output fields (Field, Const, Coalesce, Join, Concat), in column order
+    """
+
+    def __init__(self, spec: Sequence):
+        self.spec = list(spec)
+        self.names = [field.name for field in self.spec]
+        if len(set(self.names)) != len(self.names):
+            raise ValueError(f"Duplicate output columns in transform spec: {self.names}")
+        self.signature = '\n'.join(repr(field) for field in self.spec)
+        self._selections = {}
+
+    def select(self, columns: Optional[Sequence[str]] = None) -> 'Transformer':
+        """Transformer limited to some output columns, in the given order (None keeps all)."""
+        if columns is None:
+            return self
+        key = tuple(columns)
+        if key not in self._selections:
+            by_name = {field.name: field for field in self.spec}
+            unknown = [column for column in key if column not in by_name]
+            if unknown:
+                raise ValueError(f"Unknown columns {unknown}, expected some of {self.names}")
+            self._selections[key] = Transformer([by_name[column] for column in key])
+        return self._selections[key]
+
+    def columns(self, rows: List[Dict]) -> Dict[str, List]:
+        """Transforms a page into {column: values}, skipping None rows."""
+        page = _Page(rows)
+        return {field.name: field.column(page) for field in self.spec}
+
+    def records(self, rows: List[Dict]) -> List[Dict]:
+        """Transforms a page into one dict per row, skipping None rows."""
+        columns = self.columns(rows)
+        return [dict(zip(self.names, values)) for values in zip(*columns.values())]
+
+    def transform(self, rows: List[Dict], output: str = 'records') -> Union[List[Dict], Dict[str, List], pd.DataFrame]:
+        """Transforms a page into 'records', 'columns' or a 'dataframe'."""
+        validate_output(output)
+        if output == 'records':
+            return self.records(rows)
+        if output == 'dataframe':
+            return pd.DataFrame(self.columns(rows), columns=self.names)
+        return self.columns(rows)
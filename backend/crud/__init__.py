@@ -1,34 +1,38 @@
 from .lead import (
-    get_lead, get_leads, create_lead, update_lead, delete_lead,
+    get_lead, get_leads, get_leads_page, select_leads, create_lead, update_lead, delete_lead,
     get_leads_count, get_leads_by_source, get_leads_by_status
 )
 from .appointment import (
-    get_appointment, get_appointments, create_appointment, update_appointment, delete_appointment,
+    get_appointment, get_appointments, get_appointments_page, select_appointments, create_appointment, update_appointment, delete_appointment,
     get_appointments_count, get_appointments_by_unit
 )
 from .sale import (
-    get_sale, get_sales, create_sale, update_sale, delete_sale,
+    get_sale, get_sales, get_sales_page, select_sales, create_sale, update_sale, delete_sale,
     get_sales_count, get_total_sales_value, get_sales_by_unit, get_sales_by_seller
 )
 from .mkt_lead import (
-    get_mkt_lead, get_mkt_leads, create_mkt_lead, update_mkt_lead, delete_mkt_lead,
+    get_mkt_lead, get_mkt_leads, get_mkt_leads_page, select_mkt_leads, create_mkt_lead, update_mkt_lead, delete_mkt_lead,
     get_mkt_leads_count, get_mkt_leads_by_source, get_mkt_leads_by_status
 )
+from .analytics import aggregate
 
 __all__ = [
     # Lead operations
-    "get_lead", "get_leads", "create_lead", "update_lead", "delete_lead",
+    "get_lead", "get_leads", "get_leads_page", "select_leads", "create_lead", "update_lead", "delete_lead",
     "get_leads_count", "get_leads_by_source", "get_leads_by_status",
     
     # Appointment operations
-    "get_appointment", "get_appointments", "create_appointment", "update_appointment", "delete_appointment",
+    "get_appointment", "get_appointments", "get_appointments_page", "select_appointments", "create_appointment", "update_appointment", "delete_appointment",
     "get_appointments_count", "get_appointments_by_unit",
     
     # Sale operations
-    "get_sale", "get_sales", "create_sale", "update_sale", "delete_sale",
+    "get_sale", "get_sales", "get_sales_page", "select_sales", "create_sale", "update_sale", "delete_sale",
     "get_sales_count", "get_total_sales_value", "get_sales_by_unit", "get_sales_by_seller",
 
     # Marketing Lead operations
-    "get_mkt_lead", "get_mkt_leads", "create_mkt_lead", "update_mkt_lead", "delete_mkt_lead",
-    "get_mkt_leads_count", "get_mkt_leads_by_source", "get_mkt_leads_by_status"
+    "get_mkt_lead", "get_mkt_leads", "get_mkt_leads_page", "select_mkt_leads", "create_mkt_lead", "update_mkt_lead", "delete_mkt_lead",
+    "get_mkt_leads_count", "get_mkt_leads_by_source", "get_mkt_leads_by_status",
+
+    # Analytics
+    "aggregate"
 ]
\ No newline at end of file
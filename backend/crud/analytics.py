@@ -0,0 +1,208 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import Date, cast, distinct, func, literal, literal_column, select, union_all
+from typing import Callable, Dict, List, Optional, Sequence
+from datetime import date, timedelta
+
+from ..models.lead import Lead
+from ..models.appointment import Appointment
+from ..models.sale import Sale
+from ..models.mkt_lead import MktLead
+from ..models.daily_rollup import (
+    DailyLeadsByStoreSource, DailyAppointmentsByStoreStatus, DailySalesByStoreSeller, DailyMktLeadsByStoreSource
+)
+
+TIME_DIMENSIONS = ("day", "week", "month")
+
+class AggregateSource:
+    """
+    What can be grouped and measured on one table.
+
+    Args:
+        model: Model of the table
+        date_column: Column bucketed by the day/week/month dimensions and filtered by the date range
+        dimensions: {dimension name: column}
+        measures: {measure name: function returning a fresh aggregate expression}
+    """
+
+    def __init__(self, model, date_column, dimensions: Dict, measures: Dict[str, Callable]):
+        self.model = model
+        self.date_column = date_column
+        self.dimensions = dimensions
+        self.measures = measures
+
+    def describe(self) -> dict:
+        time_dimensions = list(TIME_DIMENSIONS) if self.date_column is not None else []
+        return {"dimensions": list(self.dimensions) + time_dimensions, "measures": list(self.measures)}
+
+AGGREGATE_SOURCES = {
+    "leads": AggregateSource(
+        Lead, Lead.created_at,
+        {"unit": Lead.unit, "source": Lead.source, "status": Lead.status},
+        {"count": lambda: func.count(Lead.id), "count_distinct_leads": lambda: func.count(distinct(Lead.id))},
+    ),
+    "appointments": AggregateSource(
+        Appointment, Appointment.date,
+        {"unit": Appointment.unit, "status": Appointment.status, "procedure": Appointment.procedure, "attendant": Appointment.attendant},
+        {
+            "count": lambda: func.count(Appointment.id),
+            "count_distinct_leads": lambda: func.count(distinct(Appointment.lead_id)),
+            "sum_value": lambda: func.sum(Appointment.value),
+        },
+    ),
+    "sales": AggregateSource(
+        Sale, Sale.date,
+        {"unit": Sale.unit, "seller": Sale.seller, "status": Sale.status, "procedure": Sale.procedure, "payment_method": Sale.payment_method},
+        {
+            "count": lambda: func.count(Sale.id),
+            "count_distinct_leads": lambda: func.count(distinct(Sale.lead_id)),
+            "sum_final_value": lambda: func.sum(Sale.final_value),
+            "sum_total_value": lambda: func.sum(Sale.total_value),
+            "sum_commission": lambda: func.sum(Sale.commission),
+        },
+    ),
+    "mkt_leads": AggregateSource(
+        MktLead, MktLead.appointment_date,
+        {
+            "unit": MktLead.lead_store, "source": MktLead.lead_source, "status": MktLead.appointment_status,
+            "category": MktLead.lead_category, "campaign": MktLead.lead_mkt_campaign,
+        },
+        {
+            "count": lambda: func.count(MktLead.lead_id),
+            "count_purchased": lambda: func.count(MktLead.lead_id).filter(MktLead.sales_purchased.is_(True)),
+        },
+    ),
+}
+
+# The same sources over their daily rollups (see crud.rollup), read instead of the raw
+# table whenever they have every dimension and measure asked for
+ROLLUP_SOURCES = {
+    "leads": AggregateSource(
+        DailyLeadsByStoreSource, DailyLeadsByStoreSource.day,
+        {"unit": DailyLeadsByStoreSource.unit, "source": DailyLeadsByStoreSource.source, "status": DailyLeadsByStoreSource.status},
+        {"count": lambda: func.coalesce(func.sum(DailyLeadsByStoreSource.lead_count), 0)},
+    ),
+    "appointments": AggregateSource(
+        DailyAppointmentsByStoreStatus, DailyAppointmentsByStoreStatus.day,
+        {"unit": DailyAppointmentsByStoreStatus.unit, "status": DailyAppointmentsByStoreStatus.status},
+        {
+            "count": lambda: func.coalesce(func.sum(DailyAppointmentsByStoreStatus.appointment_count), 0),
+            "sum_value": lambda: func.sum(DailyAppointmentsByStoreStatus.total_value),
+        },
+    ),
+    "sales": AggregateSource(
+        DailySalesByStoreSeller, DailySalesByStoreSeller.day,
+        {"unit": DailySalesByStoreSeller.unit, "seller": DailySalesByStoreSeller.seller, "status": DailySalesByStoreSeller.status},
+        {
+            "count": lambda: func.coalesce(func.sum(DailySalesByStoreSeller.sale_count), 0),
+            "sum_final_value": lambda: func.sum(DailySalesByStoreSeller.total_value),
+            "sum_commission": lambda: func.sum(DailySalesByStoreSeller.total_commission),
+        },
+    ),
+    "mkt_leads": AggregateSource(
+        DailyMktLeadsByStoreSource, DailyMktLeadsByStoreSource.day,
+        {"unit": DailyMktLeadsByStoreSource.unit, "source": DailyMktLeadsByStoreSource.source, "status": DailyMktLeadsByStoreSource.status},
+        {
+            "count": lambda: func.coalesce(func.sum(DailyMktLeadsByStoreSource.lead_count), 0),
+            "count_purchased": lambda: func.coalesce(func.sum(DailyMktLeadsByStoreSource.purchased_count), 0),
+        },
+    ),
+}
+
+def _time_bucket(column, dimension: str, dialect: str):
+    """First day of the day/week (Monday)/month of a timestamp, as a date (ISO string on SQLite)."""
+    if dialect == "postgresql":
+        # Inlined, a bound unit would make the SELECT and GROUP BY expressions differ
+        return cast(func.date_trunc(literal_column(f"'{dimension}'"), column), Date)
+    if dimension == "day":
+        return func.date(column)
+    if dimension == "week":
+        return func.date(column, "weekday 0", "-6 days")
+    return func.strftime("%Y-%m-01", column)
+
+def aggregate(
+    db: Session,
+    source: str,
+    dimensions: Sequence[str],
+    measures: Sequence[str],
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    rollup: bool = False,
+    use_rollups: bool = True
+) -> List[dict]:
+    """
+    Groups a table by some dimensions and computes some measures in one SQL statement.
+
+    With rollup, subtotals are added for every prefix of the dimensions (their rolled-up
+    dimensions are None) plus a grand total, and every row gets a `grouping` bitmask of its
+    rolled-up dimensions, the first dimension being the highest bit (like GROUPING()).
+    PostgreSQL runs a GROUP BY ROLLUP, other databases the equivalent UNION ALL.
+
+    Args:
+        db: Session
+        source: One of AGGREGATE_SOURCES
+        dimensions: Dimension names of the source, or day/week/month
+        measures: Measure names of the source
+        date_from / date_to: Range of the source's date column (date_to included)
+        rollup: Add the subtotal rows
+        use_rollups: Read the daily rollup table when it can answer
+
+    Returns:
+        One dict per group with the dimensions and measures
+    """
+    if source not in AGGREGATE_SOURCES:
+        raise ValueError(f"Unknown source {source}, expected one of {list(AGGREGATE_SOURCES)}")
+    spec = AGGREGATE_SOURCES[source]
+    allowed = spec.describe()
+    unknown = [name for name in dimensions if name not in allowed["dimensions"]]
+    unknown += [name for name in measures if name not in allowed["measures"]]
+    if unknown:
+        raise ValueError(f"Unknown dimensions or measures {unknown} for {source}, expected some of {allowed}")
+    if not measures:
+        raise ValueError("At least one measure is needed")
+    if len(set(dimensions)) != len(dimensions):
+        raise ValueError(f"Repeated dimensions: {list(dimensions)}")
+
+    summary = ROLLUP_SOURCES.get(source) if use_rollups else None
+    if summary is not None and all(name in summary.dimensions or name in TIME_DIMENSIONS for name in dimensions) \
+            and all(name in summary.measures for name in measures):
+        spec = summary
+
+    dialect = db.get_bind().dialect.name
+    columns = [
+        _time_bucket(spec.date_column, name, dialect) if name in TIME_DIMENSIONS else spec.dimensions[name]
+        for name in dimensions
+    ]
+    conditions = []
+    if date_from:
+        conditions.append(spec.date_column >= date_from)
+    if date_to:
+        conditions.append(spec.date_column < date_to + timedelta(days=1))
+
+    def grouped(level: int):
+        """Statement grouped by the first `level` dimensions, the others rolled up."""
+        kept = [column.label(name) for column, name in zip(columns[:level], dimensions)]
+        rolled = [literal(None).label(name) for name in dimensions[level:]]
+        stmt = select(*kept, *rolled, *[spec.measures[name]().label(name) for name in measures])
+        if rollup:
+            stmt = stmt.add_columns(literal((1 << (len(dimensions) - level)) - 1).label("grouping"))
+        stmt = stmt.select_from(spec.model).where(*conditions)
+        return stmt.group_by(*columns[:level]) if level else stmt
+
+    if not rollup or not dimensions:
+        stmt = grouped(len(dimensions))
+    elif dialect == "postgresql":
+        labeled = [column.label(name) for column, name in zip(columns, dimensions)]
+        stmt = (
+            select(*labeled, *[spec.measures[name]().label(name) for name in measures], func.grouping(*columns).label("grouping"))
+            .select_from(spec.model).where(*conditions).group_by(func.rollup(*columns))
+        )
+    else:
+        stmt = select(union_all(*[grouped(level) for level in range(len(dimensions), -1, -1)]).subquery())
+
+    rows = db.execute(stmt).mappings().all()
+    keys = list(dimensions) + list(measures) + (["grouping"] if rollup else [])
+    ordered = sorted(
+        (dict(row) for row in rows),
+        key=lambda row: (row.get("grouping", 0), [(row[name] is None, str(row[name])) for name in dimensions])
+    )
+    return [{key: row[key] for key in keys} for row in ordered]
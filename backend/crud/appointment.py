@@ -1,26 +1,25 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List, Optional
+from sqlalchemy import func, select
+from typing import List, Optional, Tuple
 from datetime import datetime, date
 
 from ..models.appointment import Appointment
+from ..models.daily_rollup import DailyAppointmentsByStoreStatus
 from ..schemas.appointment import AppointmentCreate, AppointmentUpdate
+from .pagination import keyset_page
+from .rollup import refresh_rollups, rollup_days
 
 def get_appointment(db: Session, appointment_id: int) -> Optional[Appointment]:
     return db.query(Appointment).filter(Appointment.id == appointment_id).first()
 
-def get_appointments(
-    db: Session,
-    skip: int = 0,
-    limit: int = 100,
+def _filter_appointments(
+    query,
     lead_id: Optional[int] = None,
     unit: Optional[str] = None,
     status: Optional[str] = None,
     date_from: Optional[date] = None,
     date_to: Optional[date] = None
-) -> List[Appointment]:
-    query = db.query(Appointment)
-    
+):
     if lead_id:
         query = query.filter(Appointment.lead_id == lead_id)
     if unit:
@@ -31,12 +30,72 @@ def get_appointments(
         query = query.filter(Appointment.date >= date_from)
     if date_to:
         query = query.filter(Appointment.date <= date_to)
-        
+    return query
+
+def get_appointments(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    lead_id: Optional[int] = None,
+    unit: Optional[str] = None,
+    status: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None
+) -> List[Appointment]:
+    query = _filter_appointments(
+        db.query(Appointment), lead_id=lead_id, unit=unit, status=status,
+        date_from=date_from, date_to=date_to
+    )
     return query.offset(skip).limit(limit).all()
 
+def get_appointments_page(
+    db: Session,
+    after_id: Optional[int] = None,
+    after_date: Optional[datetime] = None,
+    order_by: str = "id",
+    skip: int = 0,
+    limit: int = 100,
+    lead_id: Optional[int] = None,
+    unit: Optional[str] = None,
+    status: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    total: str = "exact"
+) -> Tuple[List[Appointment], Optional[int], Optional[tuple]]:
+    """
+    Page of appointments ordered by id, or by (date, id) with order_by="date", after the row
+    given by after_id (and after_date when ordered by date), see keyset_page.
+    """
+    query = _filter_appointments(
+        db.query(Appointment), lead_id=lead_id, unit=unit, status=status,
+        date_from=date_from, date_to=date_to
+    )
+    if order_by == "date":
+        if (after_id is None) != (after_date is None):
+            raise ValueError("after_date and after_id go together when ordering by date")
+        after = (after_date, after_id) if after_id is not None else None
+        return keyset_page(query, [Appointment.date, Appointment.id], after, limit=limit, skip=skip, total=total)
+    if order_by != "id":
+        raise ValueError(f"Unknown order: {order_by}")
+    after = (after_id,) if after_id is not None else None
+    return keyset_page(query, [Appointment.id], after, limit=limit, skip=skip, total=total)
+
+def select_appointments(
+    lead_id: Optional[int] = None,
+    unit: Optional[str] = None,
+    status: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None
+):
+    """select() of the appointments matching the filters, for streaming exports."""
+    return _filter_appointments(select(Appointment), lead_id=lead_id, unit=unit, status=status,
+        date_from=date_from, date_to=date_to)
+
 def create_appointment(db: Session, appointment: AppointmentCreate) -> Appointment:
     db_appointment = Appointment(**appointment.dict())
     db.add(db_appointment)
+    db.flush()
+    refresh_rollups(db, Appointment, rollup_days(db, Appointment, [db_appointment.id]))
     db.commit()
     db.refresh(db_appointment)
     return db_appointment
@@ -50,9 +109,12 @@ def update_appointment(
     if not db_appointment:
         return None
         
+    days = rollup_days(db, Appointment, [appointment_id])
     for key, value in appointment.dict(exclude_unset=True).items():
         setattr(db_appointment, key, value)
     
+    db.flush()
+    refresh_rollups(db, Appointment, days | rollup_days(db, Appointment, [appointment_id]))
     db.commit()
     db.refresh(db_appointment)
     return db_appointment
@@ -62,7 +124,10 @@ def delete_appointment(db: Session, appointment_id: int) -> bool:
     if not db_appointment:
         return False
         
+    days = rollup_days(db, Appointment, [appointment_id])
     db.delete(db_appointment)
+    db.flush()
+    refresh_rollups(db, Appointment, days)
     db.commit()
     return True
 
@@ -73,29 +138,25 @@ def get_appointments_count(
     unit: Optional[str] = None,
     status: Optional[str] = None,
     date_from: Optional[date] = None,
-    date_to: Optional[date] = None
+    date_to: Optional[date] = None,
+    lead_id: Optional[int] = None
 ) -> int:
-    query = db.query(func.count(Appointment.id))
-    
-    if unit:
-        query = query.filter(Appointment.unit == unit)
-    if status:
-        query = query.filter(Appointment.status == status)
-    if date_from:
-        query = query.filter(Appointment.date >= date_from)
-    if date_to:
-        query = query.filter(Appointment.date <= date_to)
-        
+    query = _filter_appointments(
+        db.query(func.count(Appointment.id)), lead_id=lead_id, unit=unit, status=status,
+        date_from=date_from, date_to=date_to
+    )
     return query.scalar()
 
+# The grouped counts read the daily rollup (see crud.rollup) instead of scanning the appointments
+
 def get_appointments_by_unit(db: Session) -> List[dict]:
-    return db.query(
-        Appointment.unit,
-        func.count(Appointment.id).label('count')
-    ).group_by(Appointment.unit).all()
+    return [row._asdict() for row in db.query(
+        DailyAppointmentsByStoreStatus.unit,
+        func.sum(DailyAppointmentsByStoreStatus.appointment_count).label('count')
+    ).group_by(DailyAppointmentsByStoreStatus.unit).all()]
 
 def get_appointments_by_status(db: Session) -> List[dict]:
-    return db.query(
-        Appointment.status,
-        func.count(Appointment.id).label('count')
-    ).group_by(Appointment.status).all()
\ No newline at end of file
+    return [row._asdict() for row in db.query(
+        DailyAppointmentsByStoreStatus.status,
+        func.sum(DailyAppointmentsByStoreStatus.appointment_count).label('count')
+    ).group_by(DailyAppointmentsByStoreStatus.status).all()]
\ No newline at end of file
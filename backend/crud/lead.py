@@ -1,14 +1,26 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List, Optional
+from sqlalchemy import func, select
+from typing import List, Optional, Tuple
 from datetime import datetime
 
 from ..models.lead import Lead
+from ..models.daily_rollup import DailyLeadsByStoreSource
 from ..schemas.lead import LeadCreate, LeadUpdate
+from .pagination import keyset_page
+from .rollup import refresh_rollups, rollup_days
 
 def get_lead(db: Session, lead_id: int) -> Optional[Lead]:
     return db.query(Lead).filter(Lead.id == lead_id).first()
 
+def _filter_leads(query, unit: Optional[str] = None, status: Optional[str] = None, source: Optional[str] = None):
+    if unit:
+        query = query.filter(Lead.unit == unit)
+    if status:
+        query = query.filter(Lead.status == status)
+    if source:
+        query = query.filter(Lead.source == source)
+    return query
+
 def get_leads(
     db: Session, 
     skip: int = 0, 
@@ -17,20 +29,37 @@ def get_leads(
     status: Optional[str] = None,
     source: Optional[str] = None
 ) -> List[Lead]:
-    query = db.query(Lead)
-    
-    if unit:
-        query = query.filter(Lead.unit == unit)
-    if status:
-        query = query.filter(Lead.status == status)
-    if source:
-        query = query.filter(Lead.source == source)
-        
+    query = _filter_leads(db.query(Lead), unit=unit, status=status, source=source)
     return query.offset(skip).limit(limit).all()
 
+def get_leads_page(
+    db: Session,
+    after_id: Optional[int] = None,
+    skip: int = 0,
+    limit: int = 100,
+    unit: Optional[str] = None,
+    status: Optional[str] = None,
+    source: Optional[str] = None,
+    total: str = "exact"
+) -> Tuple[List[Lead], Optional[int], Optional[tuple]]:
+    """Page of leads ordered by id, after the lead `after_id` (see keyset_page)."""
+    query = _filter_leads(db.query(Lead), unit=unit, status=status, source=source)
+    after = (after_id,) if after_id is not None else None
+    return keyset_page(query, [Lead.id], after, limit=limit, skip=skip, total=total)
+
+def select_leads(
+    unit: Optional[str] = None,
+    status: Optional[str] = None,
+    source: Optional[str] = None
+):
+    """select() of the leads matching the filters, for streaming exports."""
+    return _filter_leads(select(Lead), unit=unit, status=status, source=source)
+
 def create_lead(db: Session, lead: LeadCreate) -> Lead:
     db_lead = Lead(**lead.dict())
     db.add(db_lead)
+    db.flush()
+    refresh_rollups(db, Lead, rollup_days(db, Lead, [db_lead.id]))
     db.commit()
     db.refresh(db_lead)
     return db_lead
@@ -40,9 +69,12 @@ def update_lead(db: Session, lead_id: int, lead: LeadUpdate) -> Optional[Lead]:
     if not db_lead:
         return None
         
+    days = rollup_days(db, Lead, [lead_id])
     for key, value in lead.dict(exclude_unset=True).items():
         setattr(db_lead, key, value)
     
+    db.flush()
+    refresh_rollups(db, Lead, days | rollup_days(db, Lead, [lead_id]))
     db.commit()
     db.refresh(db_lead)
     return db_lead
@@ -52,7 +84,10 @@ def delete_lead(db: Session, lead_id: int) -> bool:
     if not db_lead:
         return False
         
+    days = rollup_days(db, Lead, [lead_id])
     db.delete(db_lead)
+    db.flush()
+    refresh_rollups(db, Lead, days)
     db.commit()
     return True
 
@@ -64,25 +99,19 @@ def get_leads_count(
     status: Optional[str] = None,
     source: Optional[str] = None
 ) -> int:
-    query = db.query(func.count(Lead.id))
-    
-    if unit:
-        query = query.filter(Lead.unit == unit)
-    if status:
-        query = query.filter(Lead.status == status)
-    if source:
-        query = query.filter(Lead.source == source)
-        
+    query = _filter_leads(db.query(func.count(Lead.id)), unit=unit, status=status, source=source)
     return query.scalar()
 
+# The grouped counts read the daily rollup (see crud.rollup) instead of scanning the leads
+
 def get_leads_by_source(db: Session) -> List[dict]:
-    return db.query(
-        Lead.source,
-        func.count(Lead.id).label('count')
-    ).group_by(Lead.source).all()
+    return [row._asdict() for row in db.query(
+        DailyLeadsByStoreSource.source,
+        func.sum(DailyLeadsByStoreSource.lead_count).label('count')
+    ).group_by(DailyLeadsByStoreSource.source).all()]
 
 def get_leads_by_status(db: Session) -> List[dict]:
-    return db.query(
-        Lead.status,
-        func.count(Lead.id).label('count')
-    ).group_by(Lead.status).all()
\ No newline at end of file
+    return [row._asdict() for row in db.query(
+        DailyLeadsByStoreSource.status,
+        func.sum(DailyLeadsByStoreSource.lead_count).label('count')
+    ).group_by(DailyLeadsByStoreSource.status).all()]
\ No newline at end of file
@@ -1,14 +1,27 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List, Optional
+from sqlalchemy import func, select
+from typing import List, Optional, Tuple
 from datetime import datetime
 
 from ..models.mkt_lead import MktLead
+from ..models.daily_rollup import DailyMktLeadsByStoreSource
 from ..schemas.mkt_lead import MktLeadCreate, MktLeadUpdate
+from .pagination import keyset_page
+from .rollup import refresh_rollups, rollup_days
 
 def get_mkt_lead(db: Session, lead_id: int) -> Optional[MktLead]:
     return db.query(MktLead).filter(MktLead.lead_id == lead_id).first()
 
+def _filter_mkt_leads(query, unit: Optional[str] = None, status: Optional[str] = None, source: Optional[str] = None):
+    # unit, status and source are the lead's store, its appointment status and its source
+    if unit:
+        query = query.filter(MktLead.lead_store == unit)
+    if status:
+        query = query.filter(MktLead.appointment_status == status)
+    if source:
+        query = query.filter(MktLead.lead_source == source)
+    return query
+
 def get_mkt_leads(
     db: Session, 
     skip: int = 0, 
@@ -17,20 +30,37 @@ def get_mkt_leads(
     status: Optional[str] = None,
     source: Optional[str] = None
 ) -> List[MktLead]:
-    query = db.query(MktLead)
-    
-    if unit:
-        query = query.filter(MktLead.unit == unit)
-    if status:
-        query = query.filter(MktLead.status == status)
-    if source:
-        query = query.filter(MktLead.source == source)
-        
+    query = _filter_mkt_leads(db.query(MktLead), unit=unit, status=status, source=source)
     return query.offset(skip).limit(limit).all()
 
+def get_mkt_leads_page(
+    db: Session,
+    after_id: Optional[int] = None,
+    skip: int = 0,
+    limit: int = 100,
+    unit: Optional[str] = None,
+    status: Optional[str] = None,
+    source: Optional[str] = None,
+    total: str = "exact"
+) -> Tuple[List[MktLead], Optional[int], Optional[tuple]]:
+    """Page of mkt leads ordered by lead_id, after the lead `after_id` (see keyset_page)."""
+    query = _filter_mkt_leads(db.query(MktLead), unit=unit, status=status, source=source)
+    after = (after_id,) if after_id is not None else None
+    return keyset_page(query, [MktLead.lead_id], after, limit=limit, skip=skip, total=total)
+
+def select_mkt_leads(
+    unit: Optional[str] = None,
+    status: Optional[str] = None,
+    source: Optional[str] = None
+):
+    """select() of the mkt leads matching the filters, for streaming exports."""
+    return _filter_mkt_leads(select(MktLead), unit=unit, status=status, source=source)
+
 def create_mkt_lead(db: Session, mkt_lead: MktLeadCreate) -> MktLead:
     db_mkt_lead = MktLead(**mkt_lead.dict())
     db.add(db_mkt_lead)
+    db.flush()
+    refresh_rollups(db, MktLead, rollup_days(db, MktLead, [db_mkt_lead.lead_id]))
     db.commit()
     db.refresh(db_mkt_lead)
     return db_mkt_lead
@@ -40,9 +70,12 @@ def update_mkt_lead(db: Session, lead_id: int, mkt_lead: MktLeadUpdate) -> Optio
     if not db_mkt_lead:
         return None
         
+    days = rollup_days(db, MktLead, [lead_id])
     for key, value in mkt_lead.dict(exclude_unset=True).items():
         setattr(db_mkt_lead, key, value)
     
+    db.flush()
+    refresh_rollups(db, MktLead, days | rollup_days(db, MktLead, [lead_id]))
     db.commit()
     db.refresh(db_mkt_lead)
     return db_mkt_lead
@@ -52,7 +85,10 @@ def delete_mkt_lead(db: Session, lead_id: int) -> bool:
     if not db_mkt_lead:
         return False
         
+    days = rollup_days(db, MktLead, [lead_id])
     db.delete(db_mkt_lead)
+    db.flush()
+    refresh_rollups(db, MktLead, days)
     db.commit()
     return True
 
@@ -64,25 +100,19 @@ def get_mkt_leads_count(
     status: Optional[str] = None,
     source: Optional[str] = None
 ) -> int:
-    query = db.query(func.count(MktLead.lead_id))
-    
-    if unit:
-        query = query.filter(MktLead.unit == unit)
-    if status:
-        query = query.filter(MktLead.status == status)
-    if source:
-        query = query.filter(MktLead.source == source)
-        
+    query = _filter_mkt_leads(db.query(func.count(MktLead.lead_id)), unit=unit, status=status, source=source)
     return query.scalar()
 
+# The grouped counts read the daily rollup (see crud.rollup) instead of scanning the mkt leads
+
 def get_mkt_leads_by_source(db: Session) -> List[dict]:
-    return db.query(
-        MktLead.source,
-        func.count(MktLead.lead_id).label('count')
-    ).group_by(MktLead.source).all()
+    return [row._asdict() for row in db.query(
+        DailyMktLeadsByStoreSource.source.label('lead_source'),
+        func.sum(DailyMktLeadsByStoreSource.lead_count).label('count')
+    ).group_by(DailyMktLeadsByStoreSource.source).all()]
 
 def get_mkt_leads_by_status(db: Session) -> List[dict]:
-    return db.query(
-        MktLead.status,
-        func.count(MktLead.lead_id).label('count')
-    ).group_by(MktLead.status).all()
\ No newline at end of file
+    return [row._asdict() for row in db.query(
+        DailyMktLeadsByStoreSource.status.label('appointment_status'),
+        func.sum(DailyMktLeadsByStoreSource.lead_count).label('count')
+    ).group_by(DailyMktLeadsByStoreSource.status).all()]
\ No newline at end of file
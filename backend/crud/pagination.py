@@ -0,0 +1,65 @@
+from sqlalchemy import func, tuple_
+from sqlalchemy.orm import Query
+from typing import Any, List, Optional, Sequence, Tuple
+
+TOTAL_MODES = ("window", "exact", "none")
+
+def keyset_page(
+    query: Query,
+    order_columns: Sequence,
+    after: Optional[Sequence[Any]] = None,
+    limit: int = 100,
+    skip: int = 0,
+    total: str = "exact"
+) -> Tuple[List[Any], Optional[int], Optional[Tuple]]:
+    """
+    Reads one page of a filtered query in the order of `order_columns`.
+
+    Pages are found by keyset: `after` is the sort key of the last row of the previous page,
+    so the database seeks straight to the next rows through the index instead of reading and
+    dropping `skip` rows, and every page costs the same. `skip` still works for the old
+    offset paging.
+
+    Totals are the number of rows matching the filters, counted on the first page only (no
+    `after`): counting means reading every matching row, which a page otherwise never does.
+    Pages read with a cursor always return None, clients keep the first page's total.
+        exact: a separate COUNT(*) before reading the first page (default)
+        window: count(*) OVER () read with the first page, in the same query
+        none: no total, for clients that do not show it
+
+    Args:
+        query: Query of the model, with its filters applied
+        order_columns: Columns of a unique sort key, ending with the primary key
+        after: Values of order_columns of the last row already read
+        limit: Rows per page
+        skip: Rows skipped after the cursor
+        total: One of TOTAL_MODES
+
+    Returns:
+        (rows, total or None, cursor of the last row or None when the page is the last one)
+    """
+    if total not in TOTAL_MODES:
+        raise ValueError(f"Unknown total mode: {total}")
+    if after is not None:
+        total = "none"
+
+    exact_total = query.order_by(None).count() if total == "exact" else None
+    if after is not None:
+        if len(order_columns) == 1:
+            query = query.filter(order_columns[0] > after[0])
+        else:
+            query = query.filter(tuple_(*order_columns) > tuple_(*after))
+    query = query.order_by(*order_columns)
+
+    if total == "window":
+        rows = query.add_columns(func.count().over().label("total")).offset(skip).limit(limit).all()
+        items = [row[0] for row in rows]
+        page_total = rows[0][-1] if rows else (query.order_by(None).count() if skip else 0)
+    else:
+        items = query.offset(skip).limit(limit).all()
+        page_total = exact_total
+
+    cursor = None
+    if len(items) == limit and items:
+        cursor = tuple(getattr(items[-1], column.key) for column in order_columns)
+    return items, page_total, cursor
@@ -0,0 +1,180 @@
+from sqlalchemy import Date, cast, delete, func, insert, select, text, true
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from datetime import date, timedelta
+import logging
+import zlib
+
+from ..models.lead import Lead
+from ..models.appointment import Appointment
+from ..models.sale import Sale
+from ..models.mkt_lead import MktLead
+from ..models.daily_rollup import (
+    DailyLeadsByStoreSource, DailyAppointmentsByStoreStatus, DailySalesByStoreSeller, DailyMktLeadsByStoreSource
+)
+
+logger = logging.getLogger(__name__)
+
+class DailyRollup:
+    """
+    How a rollup table is computed from its raw table.
+
+    Args:
+        model: Rollup model, with a `day` column
+        date_column: Raw column whose day keys the rollup rows
+        dimensions: {rollup column: raw column}
+        measures: {rollup column: function returning a fresh aggregate expression}
+    """
+
+    def __init__(self, model, date_column, dimensions: Dict, measures: Dict[str, Callable]):
+        self.model = model
+        self.date_column = date_column
+        self.dimensions = dimensions
+        self.measures = measures
+
+ROLLUPS = {
+    Lead: DailyRollup(
+        DailyLeadsByStoreSource, Lead.created_at,
+        {"unit": Lead.unit, "source": Lead.source, "status": Lead.status},
+        {"lead_count": lambda: func.count(Lead.id)},
+    ),
+    Appointment: DailyRollup(
+        DailyAppointmentsByStoreStatus, Appointment.date,
+        {"unit": Appointment.unit, "status": Appointment.status},
+        {"appointment_count": lambda: func.count(Appointment.id), "total_value": lambda: func.sum(Appointment.value)},
+    ),
+    Sale: DailyRollup(
+        DailySalesByStoreSeller, Sale.date,
+        {"unit": Sale.unit, "seller": Sale.seller, "status": Sale.status},
+        {
+            "sale_count": lambda: func.count(Sale.id),
+            "total_value": lambda: func.sum(Sale.final_value),
+            "total_commission": lambda: func.sum(Sale.commission),
+        },
+    ),
+    MktLead: DailyRollup(
+        DailyMktLeadsByStoreSource, MktLead.appointment_date,
+        {"unit": MktLead.lead_store, "source": MktLead.lead_source, "status": MktLead.appointment_status},
+        {
+            "lead_count": lambda: func.count(MktLead.lead_id),
+            "purchased_count": lambda: func.count(MktLead.lead_id).filter(MktLead.sales_purchased.is_(True)),
+        },
+    ),
+}
+
+def _dialect_name(db) -> str:
+    """Dialect of a Session or a Connection."""
+    bind = db if hasattr(db, "dialect") else db.get_bind()
+    return bind.dialect.name
+
+def _day(column, dialect: str):
+    if dialect == "postgresql":
+        return cast(column, Date)
+    return func.date(column, type_=Date)
+
+def rollup_days(db, model, keys) -> Set[Optional[date]]:
+    """
+    Days of the rollup rows that some raw rows count in.
+
+    Read before a write for the days the rows leave, and after it for the days they enter.
+
+    Args:
+        db: Session or Connection, in the transaction of the write
+        model: Raw model (Lead, Appointment, Sale or MktLead)
+        keys: Primary keys of the rows, or a select() of them
+
+    Returns:
+        Set of days, None for rows without date
+    """
+    spec = ROLLUPS.get(model)
+    if spec is None:
+        return set()
+    primary_key = model.__table__.primary_key.columns[0]
+    day = _day(spec.date_column, _dialect_name(db))
+    return set(db.execute(select(day).where(primary_key.in_(keys)).distinct()).scalars())
+
+def _day_runs(days: Iterable[date]) -> List[Tuple[date, date]]:
+    """Consecutive days merged into (first, last) ranges."""
+    runs = []
+    for day in sorted(days):
+        if runs and day == runs[-1][1] + timedelta(days=1):
+            runs[-1] = (runs[-1][0], day)
+        else:
+            runs.append((day, day))
+    return runs
+
+def _lock_days(db, spec: DailyRollup, days: Set[Optional[date]]):
+    """
+    Serializes the refreshes of the same rollup days until the end of the transaction.
+
+    Without it, two writers under READ COMMITTED could both DELETE the day's rows before
+    either INSERTs, and the day would be counted twice. Locks are taken in day order so
+    writers touching several days cannot deadlock. SQLite already serializes writers.
+    """
+    if _dialect_name(db) != "postgresql" or not days:
+        return
+    table_key = zlib.crc32(spec.model.__tablename__.encode()) - 2 ** 31
+    day_keys = sorted(day.toordinal() if day is not None else 0 for day in days)
+    db.execute(
+        text("SELECT pg_advisory_xact_lock(:table_key, day_key) FROM unnest(CAST(:day_keys AS integer[])) AS day_key ORDER BY day_key"),
+        {"table_key": table_key, "day_keys": day_keys},
+    )
+
+def _rebuild(db, spec: DailyRollup, raw_condition, rollup_condition):
+    dialect = _dialect_name(db)
+    day = _day(spec.date_column, dialect)
+    names = ["day", *spec.dimensions, *spec.measures]
+    if not spec.model.day.nullable:
+        raw_condition = raw_condition & spec.date_column.is_not(None)
+    stmt = (
+        select(day, *spec.dimensions.values(), *[measure() for measure in spec.measures.values()])
+        .where(raw_condition)
+        .group_by(day, *spec.dimensions.values())
+    )
+    table = spec.model.__table__
+    db.execute(delete(table).where(rollup_condition))
+    db.execute(insert(table).from_select(names, stmt))
+
+def refresh_rollups(db, model, days: Iterable[Optional[date]]):
+    """
+    Recomputes the rollup rows of some days from the raw rows, in the caller's transaction.
+
+    Every run of consecutive days is one DELETE and one INSERT ... SELECT ... GROUP BY over a
+    range of the raw date column, so a write costs a scan of the days it touched only. The
+    days are locked first (see _lock_days), so concurrent writers refresh them one at a time.
+
+    Args:
+        db: Session or Connection
+        model: Raw model (Lead, Appointment, Sale or MktLead)
+        days: Days to recompute, None for the rows without date. That bucket is rebuilt from
+            every undated raw row of the table, so bulk writers refresh it once per push
+            rather than once per batch (see helpers.data_wrestler.upsert_mkt_leads)
+    """
+    spec = ROLLUPS.get(model)
+    if spec is None:
+        return
+    days = set(days)
+    _lock_days(db, spec, days)
+    for first, last in _day_runs(day for day in days if day is not None):
+        _rebuild(
+            db, spec,
+            (spec.date_column >= first) & (spec.date_column < last + timedelta(days=1)),
+            spec.model.day.between(first, last),
+        )
+    if None in days:
+        _rebuild(db, spec, spec.date_column.is_(None), spec.model.day.is_(None))
+
+def rebuild_rollups(db, model=None):
+    """Recomputes whole rollup tables (every rollup by default), for backfills run without concurrent writers."""
+    for raw_model, spec in ROLLUPS.items():
+        if model is None or raw_model is model:
+            _rebuild(db, spec, true(), true())
+
+def backfill_rollups(bind):
+    """Builds the empty rollup tables of raw tables that already have rows, e.g. after adding a rollup."""
+    with bind.begin() as conn:
+        for raw_model, spec in ROLLUPS.items():
+            rollup_empty = conn.execute(select(spec.model.id).limit(1)).first() is None
+            raw_filled = conn.execute(select(raw_model.__table__.primary_key.columns[0]).limit(1)).first() is not None
+            if rollup_empty and raw_filled:
+                logger.info(f"Backfilling {spec.model.__tablename__}")
+                rebuild_rollups(conn, raw_model)
@@ -1,28 +1,27 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import List, Optional
+from sqlalchemy import func, select
+from typing import List, Optional, Tuple
 from datetime import datetime, date
 from decimal import Decimal
 
 from ..models.sale import Sale
+from ..models.daily_rollup import DailySalesByStoreSeller
 from ..schemas.sale import SaleCreate, SaleUpdate
+from .pagination import keyset_page
+from .rollup import refresh_rollups, rollup_days
 
 def get_sale(db: Session, sale_id: int) -> Optional[Sale]:
     return db.query(Sale).filter(Sale.id == sale_id).first()
 
-def get_sales(
-    db: Session,
-    skip: int = 0,
-    limit: int = 100,
+def _filter_sales(
+    query,
     lead_id: Optional[int] = None,
     unit: Optional[str] = None,
     status: Optional[str] = None,
     seller: Optional[str] = None,
     date_from: Optional[date] = None,
     date_to: Optional[date] = None
-) -> List[Sale]:
-    query = db.query(Sale)
-    
+):
     if lead_id:
         query = query.filter(Sale.lead_id == lead_id)
     if unit:
@@ -35,12 +34,75 @@ def get_sales(
         query = query.filter(Sale.date >= date_from)
     if date_to:
         query = query.filter(Sale.date <= date_to)
-        
+    return query
+
+def get_sales(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    lead_id: Optional[int] = None,
+    unit: Optional[str] = None,
+    status: Optional[str] = None,
+    seller: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None
+) -> List[Sale]:
+    query = _filter_sales(
+        db.query(Sale), lead_id=lead_id, unit=unit, status=status,
+        seller=seller, date_from=date_from, date_to=date_to
+    )
     return query.offset(skip).limit(limit).all()
 
+def get_sales_page(
+    db: Session,
+    after_id: Optional[int] = None,
+    after_date: Optional[datetime] = None,
+    order_by: str = "id",
+    skip: int = 0,
+    limit: int = 100,
+    lead_id: Optional[int] = None,
+    unit: Optional[str] = None,
+    status: Optional[str] = None,
+    seller: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    total: str = "exact"
+) -> Tuple[List[Sale], Optional[int], Optional[tuple]]:
+    """
+    Page of sales ordered by id, or by (date, id) with order_by="date", after the row
+    given by after_id (and after_date when ordered by date), see keyset_page.
+    """
+    query = _filter_sales(
+        db.query(Sale), lead_id=lead_id, unit=unit, status=status,
+        seller=seller, date_from=date_from, date_to=date_to
+    )
+    if order_by == "date":
+        if (after_id is None) != (after_date is None):
+            raise ValueError("after_date and after_id go together when ordering by date")
+        after = (after_date, after_id) if after_id is not None else None
+        return keyset_page(query, [Sale.date, Sale.id], after, limit=limit, skip=skip, total=total)
+    if order_by != "id":
+        raise ValueError(f"Unknown order: {order_by}")
+    after = (after_id,) if after_id is not None else None
+    return keyset_page(query, [Sale.id], after, limit=limit, skip=skip, total=total)
+
+def select_sales(
+    lead_id: Optional[int] = None,
+    unit: Optional[str] = None,
+    status: Optional[str] = None,
+    seller: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None
+):
+    """select() of the sales matching the filters, for streaming exports."""
+    return _filter_sales(select(Sale), lead_id=lead_id, unit=unit, status=status,
+        seller=seller, date_from=date_from, date_to=date_to)
+
 def create_sale(db: Session, sale: SaleCreate) -> Sale:
     db_sale = Sale(**sale.dict())
     db.add(db_sale)
+    db.flush()
+    refresh_rollups(db, Sale, rollup_days(db, Sale, [db_sale.id]))
     db.commit()
     db.refresh(db_sale)
     return db_sale
@@ -50,9 +112,12 @@ def update_sale(db: Session, sale_id: int, sale: SaleUpdate) -> Optional[Sale]:
     if not db_sale:
         return None
         
+    days = rollup_days(db, Sale, [sale_id])
     for key, value in sale.dict(exclude_unset=True).items():
         setattr(db_sale, key, value)
     
+    db.flush()
+    refresh_rollups(db, Sale, days | rollup_days(db, Sale, [sale_id]))
     db.commit()
     db.refresh(db_sale)
     return db_sale
@@ -62,7 +127,10 @@ def delete_sale(db: Session, sale_id: int) -> bool:
     if not db_sale:
         return False
         
+    days = rollup_days(db, Sale, [sale_id])
     db.delete(db_sale)
+    db.flush()
+    refresh_rollups(db, Sale, days)
     db.commit()
     return True
 
@@ -74,21 +142,13 @@ def get_sales_count(
     status: Optional[str] = None,
     seller: Optional[str] = None,
     date_from: Optional[date] = None,
-    date_to: Optional[date] = None
+    date_to: Optional[date] = None,
+    lead_id: Optional[int] = None
 ) -> int:
-    query = db.query(func.count(Sale.id))
-    
-    if unit:
-        query = query.filter(Sale.unit == unit)
-    if status:
-        query = query.filter(Sale.status == status)
-    if seller:
-        query = query.filter(Sale.seller == seller)
-    if date_from:
-        query = query.filter(Sale.date >= date_from)
-    if date_to:
-        query = query.filter(Sale.date <= date_to)
-        
+    query = _filter_sales(
+        db.query(func.count(Sale.id)), lead_id=lead_id, unit=unit, status=status,
+        seller=seller, date_from=date_from, date_to=date_to
+    )
     return query.scalar()
 
 def get_total_sales_value(
@@ -111,17 +171,19 @@ def get_total_sales_value(
         
     return query.scalar() or Decimal('0.0')
 
+# The grouped totals read the daily rollup (see crud.rollup) instead of scanning the sales
+
 def get_sales_by_unit(db: Session) -> List[dict]:
-    return db.query(
-        Sale.unit,
-        func.count(Sale.id).label('count'),
-        func.sum(Sale.final_value).label('total_value')
-    ).group_by(Sale.unit).all()
+    return [row._asdict() for row in db.query(
+        DailySalesByStoreSeller.unit,
+        func.sum(DailySalesByStoreSeller.sale_count).label('count'),
+        func.sum(DailySalesByStoreSeller.total_value).label('total_value')
+    ).group_by(DailySalesByStoreSeller.unit).all()]
 
 def get_sales_by_seller(db: Session) -> List[dict]:
-    return db.query(
-        Sale.seller,
-        func.count(Sale.id).label('count'),
-        func.sum(Sale.final_value).label('total_value'),
-        func.sum(Sale.commission).label('total_commission')
-    ).group_by(Sale.seller).all()
\ No newline at end of file
+    return [row._asdict() for row in db.query(
+        DailySalesByStoreSeller.seller,
+        func.sum(DailySalesByStoreSeller.sale_count).label('count'),
+        func.sum(DailySalesByStoreSeller.total_value).label('total_value'),
+        func.sum(DailySalesByStoreSeller.total_commission).label('total_commission')
+    ).group_by(DailySalesByStoreSeller.seller).all()]
\ No newline at end of file
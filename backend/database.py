@@ -69,8 +69,17 @@ def create_tables():
         from .models.appointment import Appointment
         from .models.sale import Sale
         from .models.mkt_lead import MktLead
+        from .models.push_checkpoint import PushCheckpoint
+        from .models.daily_rollup import DailyLeadsByStoreSource, DailyAppointmentsByStoreStatus, DailySalesByStoreSeller, DailyMktLeadsByStoreSource
+        from .crud.rollup import backfill_rollups
+        from .migrations import missing_indexes
         
         Base.metadata.create_all(bind=engine)
+        backfill_rollups(engine)
+        # Indexes of tables that already existed are built by the migration step, not at startup
+        missing = missing_indexes(engine)
+        if missing:
+            logger.warning(f"{len(missing)} indexes are missing or invalid, run: python -m backend.migrations")
         logger.info("Database tables created successfully")
     except Exception as e:
         logger.error(f"Error creating database tables: {str(e)}")
@@ -0,0 +1,118 @@
+"""
+Streaming bulk exports of the backend tables.
+
+Rows are read through a server-side cursor (stream_results) a chunk at a time and every
+chunk is encoded and sent before the next one is read, so an export of any size keeps the
+API process at one chunk of memory and costs a single request.
+"""
+
+import io
+import csv
+import json
+import logging
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Iterator
+from sqlalchemy import Boolean, Date, DateTime, Integer, Numeric, select
+
+from .database import engine
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - pyarrow ships with streamlit
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ("ndjson", "csv", "arrow")
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+def _arrow_type(column):
+    """Arrow type of a table column, strings for anything without a closer match."""
+    if isinstance(column.type, Boolean):
+        return pa.bool_()
+    if isinstance(column.type, Integer):
+        return pa.int64()
+    if isinstance(column.type, Numeric):
+        return pa.decimal128(column.type.precision or 18, column.type.scale or 0)
+    if isinstance(column.type, DateTime):
+        return pa.timestamp("us", tz="UTC" if column.type.timezone else None)
+    if isinstance(column.type, Date):
+        return pa.date32()
+    return pa.string()
+
+def arrow_schema(table):
+    """Arrow schema of a table, so every chunk of an export has the same schema."""
+    return pa.schema([pa.field(column.name, _arrow_type(column)) for column in table.columns])
+
+def _encode_ndjson(names, rows):
+    return "".join(json.dumps(dict(zip(names, row)), default=_json_default, ensure_ascii=False) + "\n" for row in rows).encode()
+
+def _encode_csv(rows):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue().encode()
+
+def stream_table(query, export_format: str = "ndjson", chunk_size: int = 5000, bind=None) -> Iterator[bytes]:
+    """
+    Encoded chunks of every row of a query.
+
+    Args:
+        query: select() of one model, with its filters applied
+        export_format: One of EXPORT_FORMATS
+        chunk_size: Rows read from the cursor and encoded at a time
+        bind: Engine to read from (the app engine by default)
+
+    Returns:
+        Generator of bytes. CSV starts with a header line, Arrow is an IPC stream whose
+        schema follows the table columns
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {export_format}")
+    if export_format == "arrow" and pa is None:
+        raise ValueError("Arrow exports need pyarrow")
+
+    table = query.get_final_froms()[0]
+    names = [column.name for column in table.columns]
+    stmt = query.with_only_columns(*table.columns).order_by(*table.primary_key.columns)
+    bind = bind if bind is not None else engine
+
+    def chunks():
+        sink = writer = None
+        if export_format == "csv":
+            yield _encode_csv([names])
+        if export_format == "arrow":
+            schema = arrow_schema(table)
+            sink = io.BytesIO()
+            writer = pa.ipc.new_stream(sink, schema)
+        exported = 0
+        with bind.connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(stmt)
+            for rows in result.partitions(chunk_size):
+                exported += len(rows)
+                if export_format == "ndjson":
+                    yield _encode_ndjson(names, rows)
+                elif export_format == "csv":
+                    yield _encode_csv(rows)
+                else:
+                    writer.write_batch(pa.RecordBatch.from_pylist([dict(zip(names, row)) for row in rows], schema=schema))
+                    yield sink.getvalue()
+                    sink.seek(0)
+                    sink.truncate()
+        if writer is not None:
+            writer.close()
+            yield sink.getvalue()
+        logger.info(f"Exported {exported} rows of {table.name} as {export_format}")
+    return chunks()
@@ -1,8 +1,9 @@
 from fastapi import FastAPI, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
-from typing import Optional, List
-from datetime import date
+from typing import Optional, List, Literal
+from datetime import date, datetime
 
 from .database import engine, get_db, create_tables
 from .schemas.lead import Lead as LeadSchema, LeadCreate, LeadUpdate, LeadList
@@ -13,6 +14,8 @@ from .crud import lead as lead_crud
 from .crud import appointment as appointment_crud
 from .crud import sale as sale_crud
 from .crud import mkt_lead as mkt_lead_crud
+from .crud import analytics as analytics_crud
+from .export import MEDIA_TYPES, stream_table
 
 # Create FastAPI app
 app = FastAPI(
@@ -33,6 +36,34 @@ app.add_middleware(
 # Create database tables
 create_tables()
 
+# Total of the list endpoints, counted on the first page only, see crud.pagination.keyset_page.
+# Defaults to exact, the count the endpoints always returned; none skips it for clients that page without it
+TotalMode = Literal["window", "exact", "none"]
+
+ExportFormat = Literal["ndjson", "csv", "arrow"]
+
+AggregateSource = Literal["leads", "appointments", "sales", "mkt_leads"]
+
+def _export_response(query, name: str, export_format: str, chunk_size: int):
+    """Streams a table export as an attachment, see backend.export."""
+    try:
+        chunks = stream_table(query, export_format=export_format, chunk_size=chunk_size)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    extension = {"ndjson": "ndjson", "csv": "csv", "arrow": "arrows"}[export_format]
+    return StreamingResponse(
+        chunks,
+        media_type=MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{extension}"'}
+    )
+
+def _page_or_400(read_page, **kwargs):
+    """Runs a crud page read, turning a bad cursor or order into a 400."""
+    try:
+        return read_page(**kwargs)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 # Mkt Lead endpoints
 @app.post("/mkt-leads/", response_model=MktLeadSchema, tags=["Mkt Leads"])
 def create_mkt_lead(mkt_lead: MktLeadCreate, db: Session = Depends(get_db)):
@@ -43,20 +74,24 @@ def create_mkt_lead(mkt_lead: MktLeadCreate, db: Session = Depends(get_db)):
 def read_mkt_leads(
     skip: int = 0,
     limit: int = 100,
+    after_id: Optional[int] = None,
     unit: Optional[str] = None,
     status: Optional[str] = None,
     source: Optional[str] = None,
+    total: TotalMode = "exact",
     db: Session = Depends(get_db)
 ):
-    """Get all mkt leads with optional filtering"""
-    mkt_leads = mkt_lead_crud.get_mkt_leads(db, skip=skip, limit=limit, unit=unit, status=status, source=source)
-    total = mkt_lead_crud.get_mkt_leads_count(db, unit=unit, status=status, source=source)
-    return {"total": total, "mkt_leads": mkt_leads}
+    """Get mkt leads with optional filtering, ordered by lead_id. Pass next_after_id back as after_id for the next page"""
+    mkt_leads, count, cursor = _page_or_400(
+        mkt_lead_crud.get_mkt_leads_page, db=db, after_id=after_id, skip=skip, limit=limit,
+        unit=unit, status=status, source=source, total=total
+    )
+    return {"total": count, "next_after_id": cursor[-1] if cursor else None, "mkt_leads": mkt_leads}
 
 @app.get("/mkt-leads/{mkt_lead_id}", response_model=MktLeadSchema, tags=["Mkt Leads"])
 def read_mkt_lead(mkt_lead_id: int, db: Session = Depends(get_db)):
     """Get a specific mkt lead by ID"""
-    db_mkt_lead = mkt_lead_crud.get_mkt_lead(db, mkt_lead_id=mkt_lead_id)
+    db_mkt_lead = mkt_lead_crud.get_mkt_lead(db, lead_id=mkt_lead_id)
     if db_mkt_lead is None:
         raise HTTPException(status_code=404, detail="Mkt lead not found")
     return db_mkt_lead
@@ -64,7 +99,7 @@ def read_mkt_lead(mkt_lead_id: int, db: Session = Depends(get_db)):
 @app.put("/mkt-leads/{mkt_lead_id}", response_model=MktLeadSchema, tags=["Mkt Leads"])
 def update_mkt_lead(mkt_lead_id: int, mkt_lead: MktLeadUpdate, db: Session = Depends(get_db)):
     """Update a mkt lead"""
-    db_mkt_lead = mkt_lead_crud.update_mkt_lead(db, mkt_lead_id=mkt_lead_id, mkt_lead=mkt_lead)
+    db_mkt_lead = mkt_lead_crud.update_mkt_lead(db, lead_id=mkt_lead_id, mkt_lead=mkt_lead)
     if db_mkt_lead is None:
         raise HTTPException(status_code=404, detail="Mkt lead not found")
     return db_mkt_lead
@@ -72,7 +107,7 @@ def update_mkt_lead(mkt_lead_id: int, mkt_lead: MktLeadUpdate, db: Session = Dep
 @app.delete("/mkt-leads/{mkt_lead_id}", tags=["Mkt Leads"])
 def delete_mkt_lead(mkt_lead_id: int, db: Session = Depends(get_db)):
     """Delete a mkt lead"""
-    success = mkt_lead_crud.delete_mkt_lead(db, mkt_lead_id=mkt_lead_id)
+    success = mkt_lead_crud.delete_mkt_lead(db, lead_id=mkt_lead_id)
     if not success:
         raise HTTPException(status_code=404, detail="Mkt lead not found")
     return {"detail": "Mkt lead deleted successfully"}
@@ -87,15 +122,19 @@ def create_lead(lead: LeadCreate, db: Session = Depends(get_db)):
 def read_leads(
     skip: int = 0,
     limit: int = 100,
+    after_id: Optional[int] = None,
     unit: Optional[str] = None,
     status: Optional[str] = None,
     source: Optional[str] = None,
+    total: TotalMode = "exact",
     db: Session = Depends(get_db)
 ):
-    """Get all leads with optional filtering"""
-    leads = lead_crud.get_leads(db, skip=skip, limit=limit, unit=unit, status=status, source=source)
-    total = lead_crud.get_leads_count(db, unit=unit, status=status, source=source)
-    return {"total": total, "leads": leads}
+    """Get leads with optional filtering, ordered by id. Pass next_after_id back as after_id for the next page"""
+    leads, count, cursor = _page_or_400(
+        lead_crud.get_leads_page, db=db, after_id=after_id, skip=skip, limit=limit,
+        unit=unit, status=status, source=source, total=total
+    )
+    return {"total": count, "next_after_id": cursor[-1] if cursor else None, "leads": leads}
 
 @app.get("/leads/{lead_id}", response_model=LeadSchema, tags=["Leads"])
 def read_lead(lead_id: int, db: Session = Depends(get_db)):
@@ -131,22 +170,32 @@ def create_appointment(appointment: AppointmentCreate, db: Session = Depends(get
 def read_appointments(
     skip: int = 0,
     limit: int = 100,
+    after_id: Optional[int] = None,
+    after_date: Optional[datetime] = None,
+    order_by: Literal["id", "date"] = "id",
     lead_id: Optional[int] = None,
     unit: Optional[str] = None,
     status: Optional[str] = None,
     date_from: Optional[date] = None,
     date_to: Optional[date] = None,
+    total: TotalMode = "exact",
     db: Session = Depends(get_db)
 ):
-    """Get all appointments with optional filtering"""
-    appointments = appointment_crud.get_appointments(
-        db, skip=skip, limit=limit, lead_id=lead_id,
-        unit=unit, status=status, date_from=date_from, date_to=date_to
-    )
-    total = appointment_crud.get_appointments_count(
-        db, unit=unit, status=status, date_from=date_from, date_to=date_to
+    """
+    Get appointments with optional filtering, ordered by id or by (date, id).
+    Pass next_after_id (and next_after_date when ordered by date) back for the next page
+    """
+    appointments, count, cursor = _page_or_400(
+        appointment_crud.get_appointments_page, db=db, after_id=after_id, after_date=after_date,
+        order_by=order_by, skip=skip, limit=limit, lead_id=lead_id,
+        unit=unit, status=status, date_from=date_from, date_to=date_to, total=total
     )
-    return {"total": total, "appointments": appointments}
+    return {
+        "total": count,
+        "next_after_id": cursor[-1] if cursor else None,
+        "next_after_date": cursor[0] if cursor and order_by == "date" else None,
+        "appointments": appointments,
+    }
 
 @app.get("/appointments/{appointment_id}", response_model=AppointmentSchema, tags=["Appointments"])
 def read_appointment(appointment_id: int, db: Session = Depends(get_db)):
@@ -188,25 +237,34 @@ def create_sale(sale: SaleCreate, db: Session = Depends(get_db)):
 def read_sales(
     skip: int = 0,
     limit: int = 100,
+    after_id: Optional[int] = None,
+    after_date: Optional[datetime] = None,
+    order_by: Literal["id", "date"] = "id",
     lead_id: Optional[int] = None,
     unit: Optional[str] = None,
     status: Optional[str] = None,
     seller: Optional[str] = None,
     date_from: Optional[date] = None,
     date_to: Optional[date] = None,
+    total: TotalMode = "exact",
     db: Session = Depends(get_db)
 ):
-    """Get all sales with optional filtering"""
-    sales = sale_crud.get_sales(
-        db, skip=skip, limit=limit, lead_id=lead_id,
+    """
+    Get sales with optional filtering, ordered by id or by (date, id).
+    Pass next_after_id (and next_after_date when ordered by date) back for the next page
+    """
+    sales, count, cursor = _page_or_400(
+        sale_crud.get_sales_page, db=db, after_id=after_id, after_date=after_date,
+        order_by=order_by, skip=skip, limit=limit, lead_id=lead_id,
         unit=unit, status=status, seller=seller,
-        date_from=date_from, date_to=date_to
+        date_from=date_from, date_to=date_to, total=total
     )
-    total = sale_crud.get_sales_count(
-        db, unit=unit, status=status, seller=seller,
-        date_from=date_from, date_to=date_to
-    )
-    return {"total": total, "sales": sales}
+    return {
+        "total": count,
+        "next_after_id": cursor[-1] if cursor else None,
+        "next_after_date": cursor[0] if cursor and order_by == "date" else None,
+        "sales": sales,
+    }
 
 @app.get("/sales/{sale_id}", response_model=SaleSchema, tags=["Sales"])
 def read_sale(sale_id: int, db: Session = Depends(get_db)):
@@ -256,4 +314,87 @@ def get_sales_by_unit(db: Session = Depends(get_db)):
 @app.get("/analytics/sales/by-seller", tags=["Analytics"])
 def get_sales_by_seller(db: Session = Depends(get_db)):
     """Get sales statistics grouped by seller"""
-    return sale_crud.get_sales_by_seller(db)
\ No newline at end of file
+    return sale_crud.get_sales_by_seller(db)
+
+@app.get("/analytics/aggregate", tags=["Analytics"])
+def aggregate(
+    source: AggregateSource,
+    dimensions: List[str] = Query([]),
+    measures: List[str] = Query(["count"]),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    rollup: bool = False,
+    db: Session = Depends(get_db)
+):
+    """
+    Group a table by any of its dimensions (unit, source, seller, status... and day/week/month)
+    and compute measures (count, count_distinct_leads, sum_final_value...) in one GROUP BY,
+    with ROLLUP subtotals on request
+    """
+    try:
+        rows = analytics_crud.aggregate(
+            db, source, dimensions, measures,
+            date_from=date_from, date_to=date_to, rollup=rollup
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"dimensions": dimensions, "measures": measures, "rows": rows}
+
+# Export endpoints
+@app.get("/export/mkt-leads", tags=["Export"])
+def export_mkt_leads(
+    format: ExportFormat = "ndjson",
+    chunk_size: int = Query(5000, ge=1, le=100000),
+    unit: Optional[str] = None,
+    status: Optional[str] = None,
+    source: Optional[str] = None
+):
+    """Stream every mkt lead matching the filters as NDJSON, CSV or an Arrow IPC stream"""
+    query = mkt_lead_crud.select_mkt_leads(unit=unit, status=status, source=source)
+    return _export_response(query, "mkt_leads", format, chunk_size)
+
+@app.get("/export/leads", tags=["Export"])
+def export_leads(
+    format: ExportFormat = "ndjson",
+    chunk_size: int = Query(5000, ge=1, le=100000),
+    unit: Optional[str] = None,
+    status: Optional[str] = None,
+    source: Optional[str] = None
+):
+    """Stream every lead matching the filters as NDJSON, CSV or an Arrow IPC stream"""
+    query = lead_crud.select_leads(unit=unit, status=status, source=source)
+    return _export_response(query, "leads", format, chunk_size)
+
+@app.get("/export/appointments", tags=["Export"])
+def export_appointments(
+    format: ExportFormat = "ndjson",
+    chunk_size: int = Query(5000, ge=1, le=100000),
+    lead_id: Optional[int] = None,
+    unit: Optional[str] = None,
+    status: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None
+):
+    """Stream every appointment matching the filters as NDJSON, CSV or an Arrow IPC stream"""
+    query = appointment_crud.select_appointments(
+        lead_id=lead_id, unit=unit, status=status, date_from=date_from, date_to=date_to
+    )
+    return _export_response(query, "appointments", format, chunk_size)
+
+@app.get("/export/sales", tags=["Export"])
+def export_sales(
+    format: ExportFormat = "ndjson",
+    chunk_size: int = Query(5000, ge=1, le=100000),
+    lead_id: Optional[int] = None,
+    unit: Optional[str] = None,
+    status: Optional[str] = None,
+    seller: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None
+):
+    """Stream every sale matching the filters as NDJSON, CSV or an Arrow IPC stream"""
+    query = sale_crud.select_sales(
+        lead_id=lead_id, unit=unit, status=status, seller=seller,
+        date_from=date_from, date_to=date_to
+    )
+    return _export_response(query, "sales", format, chunk_size)
@@ -0,0 +1,92 @@
+"""
+Schema upgrades that create_all does not do on existing databases.
+
+create_all only creates missing tables, so an index added to a model later never reaches a
+database whose table already exists. ensure_indexes compares the indexes declared on the
+models with the ones in the database and creates the missing ones, and on PostgreSQL it also
+rebuilds the ones an interrupted CREATE INDEX CONCURRENTLY left invalid. Building an index on
+a large table takes a while, so this is a deploy step rather than part of the app startup:
+
+    python -m backend.migrations
+"""
+
+import logging
+from typing import List
+from sqlalchemy import inspect, text
+
+from .database import Base, engine, create_tables
+
+logger = logging.getLogger(__name__)
+
+def invalid_indexes(bind=None) -> List[str]:
+    """Names of the model indexes PostgreSQL marks invalid (pg_index.indisvalid), none on other databases."""
+    bind = bind if bind is not None else engine
+    if bind.dialect.name != "postgresql":
+        return []
+    names = [index.name for table in Base.metadata.sorted_tables for index in table.indexes]
+    with bind.connect() as conn:
+        return list(conn.execute(
+            text(
+                "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                "WHERE NOT i.indisvalid AND c.relname = ANY(:names) AND pg_table_is_visible(c.oid)"
+            ),
+            {"names": names},
+        ).scalars())
+
+def missing_indexes(bind=None) -> List:
+    """Indexes declared on the models whose table exists in the database without them, or with an invalid one."""
+    bind = bind if bind is not None else engine
+    inspector = inspect(bind)
+    tables = set(inspector.get_table_names())
+    invalid = set(invalid_indexes(bind))
+    missing = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in tables:
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)} - invalid
+        missing += [index for index in sorted(table.indexes, key=lambda index: index.name) if index.name not in existing]
+    return missing
+
+def ensure_indexes(bind=None) -> List[str]:
+    """
+    Creates the model indexes the database lacks.
+
+    On PostgreSQL the indexes are built with CREATE INDEX CONCURRENTLY, outside a
+    transaction, so a large table keeps taking writes while its index is built. An invalid
+    index left by an earlier build is dropped (concurrently too) and built again.
+
+    Args:
+        bind: Engine to upgrade (the app engine by default)
+
+    Returns:
+        Names of the created indexes
+    """
+    bind = bind if bind is not None else engine
+    invalid = set(invalid_indexes(bind))
+    created = []
+    for index in missing_indexes(bind):
+        logger.info(f"Creating index {index.name} on {index.table.name}")
+        if bind.dialect.name == "postgresql":
+            index.dialect_options["postgresql"]["concurrently"] = True
+            try:
+                with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                    if index.name in invalid:
+                        logger.warning(f"Dropping invalid index {index.name}")
+                        conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{index.name}"'))
+                    index.create(conn)
+            finally:
+                index.dialect_options["postgresql"]["concurrently"] = False
+        else:
+            with bind.begin() as conn:
+                index.create(conn)
+        created.append(index.name)
+    return created
+
+def main():
+    """Creates the missing tables, then the missing or invalid indexes of the existing ones."""
+    create_tables()
+    created = ensure_indexes(engine)
+    logger.info(f"Created {len(created)} indexes{': ' + ', '.join(created) if created else ''}")
+
+if __name__ == "__main__":
+    main()
@@ -2,5 +2,8 @@ from .lead import Lead
 from .appointment import Appointment
 from .sale import Sale
 from .mkt_lead import MktLead
+from .push_checkpoint import PushCheckpoint
+from .daily_rollup import DailyLeadsByStoreSource, DailyAppointmentsByStoreStatus, DailySalesByStoreSeller, DailyMktLeadsByStoreSource
 
-__all__ = ["Lead", "Appointment", "Sale", "MktLead"]
\ No newline at end of file
+__all__ = ["Lead", "Appointment", "Sale", "MktLead", "PushCheckpoint",
+           "DailyLeadsByStoreSource", "DailyAppointmentsByStoreStatus", "DailySalesByStoreSeller", "DailyMktLeadsByStoreSource"]
\ No newline at end of file
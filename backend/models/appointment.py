@@ -1,10 +1,17 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Numeric, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Numeric, Text, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..database import Base
 
 class Appointment(Base):
     __tablename__ = "appointments"
+    # Equality filters of crud.appointment first, then the range/sort column (see backend.migrations)
+    __table_args__ = (
+        Index("ix_appointments_lead_id", "lead_id"),
+        Index("ix_appointments_unit_status_date", "unit", "status", "date"),
+        Index("ix_appointments_status_date", "status", "date"),
+        Index("ix_appointments_date_id", "date", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     lead_id = Column(Integer, ForeignKey("leads.id"), nullable=False)
@@ -0,0 +1,60 @@
+from sqlalchemy import Column, Integer, String, Date, Numeric
+from ..database import Base
+
+# Daily totals of the raw tables, rebuilt for the days touched by every write (see
+# crud.rollup). Rows are grouped by every dimension column, NULL included.
+
+class DailyLeadsByStoreSource(Base):
+    __tablename__ = "daily_leads_by_store_source"
+
+    id = Column(Integer, primary_key=True)
+    day = Column(Date, nullable=False, index=True)  # created_at
+    unit = Column(String(50), nullable=True)
+    source = Column(String(100), nullable=True)
+    status = Column(String(50), nullable=True)
+    lead_count = Column(Integer, nullable=False)
+
+    def __repr__(self):
+        return f"<DailyLeadsByStoreSource {self.day} {self.unit} {self.source}: {self.lead_count}>"
+
+class DailyAppointmentsByStoreStatus(Base):
+    __tablename__ = "daily_appointments_by_store_status"
+
+    id = Column(Integer, primary_key=True)
+    day = Column(Date, nullable=False, index=True)
+    unit = Column(String(50), nullable=True)
+    status = Column(String(50), nullable=True)
+    appointment_count = Column(Integer, nullable=False)
+    total_value = Column(Numeric(14, 2), nullable=True)
+
+    def __repr__(self):
+        return f"<DailyAppointmentsByStoreStatus {self.day} {self.unit} {self.status}: {self.appointment_count}>"
+
+class DailySalesByStoreSeller(Base):
+    __tablename__ = "daily_sales_by_store_seller"
+
+    id = Column(Integer, primary_key=True)
+    day = Column(Date, nullable=False, index=True)
+    unit = Column(String(50), nullable=True)
+    seller = Column(String(100), nullable=True)
+    status = Column(String(50), nullable=True)
+    sale_count = Column(Integer, nullable=False)
+    total_value = Column(Numeric(14, 2), nullable=True)  # final_value
+    total_commission = Column(Numeric(14, 2), nullable=True)
+
+    def __repr__(self):
+        return f"<DailySalesByStoreSeller {self.day} {self.unit} {self.seller}: {self.sale_count}>"
+
+class DailyMktLeadsByStoreSource(Base):
+    __tablename__ = "daily_mkt_leads_by_store_source"
+
+    id = Column(Integer, primary_key=True)
+    day = Column(Date, nullable=True, index=True)  # appointment_date, NULL for leads without appointment
+    unit = Column(String(50), nullable=True)
+    source = Column(String(100), nullable=True)
+    status = Column(String(100), nullable=True)
+    lead_count = Column(Integer, nullable=False)
+    purchased_count = Column(Integer, nullable=False)
+
+    def __repr__(self):
+        return f"<DailyMktLeadsByStoreSource {self.day} {self.unit} {self.source}: {self.lead_count}>"
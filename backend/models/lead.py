@@ -1,10 +1,17 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text
+from sqlalchemy import Column, Integer, String, DateTime, Text, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..database import Base
 
 class Lead(Base):
     __tablename__ = "leads"
+    # Equality filters of crud.lead first, then the range/sort column (see backend.migrations)
+    __table_args__ = (
+        Index("ix_leads_unit_status_source", "unit", "status", "source"),
+        Index("ix_leads_status_source", "status", "source"),
+        Index("ix_leads_source", "source"),
+        Index("ix_leads_created_at", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100), nullable=True)
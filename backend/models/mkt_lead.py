@@ -1,10 +1,17 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Text, Boolean, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..database import Base
 
 class MktLead(Base):
     __tablename__ = "mkt_leads"
+    # Equality filters of crud.mkt_lead first, then the range/sort column (see backend.migrations)
+    __table_args__ = (
+        Index("ix_mkt_leads_store_status_source", "lead_store", "appointment_status", "lead_source"),
+        Index("ix_mkt_leads_status_source", "appointment_status", "lead_source"),
+        Index("ix_mkt_leads_source", "lead_source"),
+        Index("ix_mkt_leads_appointment_date", "appointment_date"),
+    )
     
     lead_id = Column(Integer, nullable=False, primary_key=True)
     lead_email = Column(String(100), nullable=True)
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy.sql import func
+from ..database import Base
+
+class PushCheckpoint(Base):
+    __tablename__ = "push_checkpoints"
+
+    # sha256 of the pushed rows and the batch size, see helpers.data_wrestler.upload_hash
+    upload_hash = Column(String(64), primary_key=True)
+    table_name = Column(String(50), nullable=False)
+    total_batches = Column(Integer, nullable=False)
+    committed_batches = Column(Integer, nullable=False, default=0)
+    committed_rows = Column(Integer, nullable=False, default=0)
+
+    # Metadata
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<PushCheckpoint {self.table_name} {self.committed_batches}/{self.total_batches}>"
@@ -1,10 +1,18 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Numeric, Text, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Numeric, Text, Boolean, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..database import Base
 
 class Sale(Base):
     __tablename__ = "sales"
+    # Equality filters of crud.sale first, then the range/sort column (see backend.migrations)
+    __table_args__ = (
+        Index("ix_sales_lead_id", "lead_id"),
+        Index("ix_sales_unit_status_seller_date", "unit", "status", "seller", "date"),
+        Index("ix_sales_seller_date", "seller", "date"),
+        Index("ix_sales_status_date", "status", "date"),
+        Index("ix_sales_date_id", "date", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     lead_id = Column(Integer, ForeignKey("leads.id"), nullable=False)
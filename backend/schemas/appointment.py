@@ -34,6 +34,9 @@ class Appointment(AppointmentBase):
 
 # Schema for Appointment list response
 class AppointmentList(BaseModel):
-    total: int
+    # Rows matching the filters, on the first page (no cursor) unless total=none
+    total: Optional[int] = None
+    next_after_id: Optional[int] = None
+    next_after_date: Optional[datetime] = None
     appointments: list[Appointment]
     model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
@@ -49,6 +49,8 @@ class Lead(LeadBase):
 
 # Schema for Lead list response
 class LeadList(BaseModel):
-    total: int
+    # Rows matching the filters, on the first page (no cursor) unless total=none
+    total: Optional[int] = None
+    next_after_id: Optional[int] = None
     leads: list[Lead]
     model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
@@ -50,17 +50,20 @@ class MktLeadUpdate(MktLeadBase):
     pass
 
 # Schema for MktLead in response
-class MktLead(BaseModel):
+class MktLead(MktLeadBase):
     lead_id: int
-    appointment_count: int
-    last_appointment: Optional[datetime]
-    created_at: datetime
-    updated_at: Optional[datetime]
+    # Stored as pushed from the funnel, so not validated again on the way out
+    lead_email: Optional[str] = None
+    lead_phone: Optional[str] = None
+    sale_cleaned_phone: Optional[str] = None
+    sales_phone: Optional[str] = None
     model_config = ConfigDict(from_attributes=True)
 
 # Schema for MktLead list response
 
 class MktLeadList(BaseModel):
-    total: int
+    # Rows matching the filters, on the first page (no cursor) unless total=none
+    total: Optional[int] = None
+    next_after_id: Optional[int] = None
     mkt_leads: list[MktLead]
     model_config = ConfigDict(from_attributes=True)
@@ -44,6 +44,9 @@ class Sale(SaleBase):
 
 # Schema for Sale list response
 class SaleList(BaseModel):
-    total: int
+    # Rows matching the filters, on the first page (no cursor) unless total=none
+    total: Optional[int] = None
+    next_after_id: Optional[int] = None
+    next_after_date: Optional[datetime] = None
     sales: list[Sale]
     model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+"""
+Benchmark of the backend's filtered list and count queries without and with the model indexes.
+
+Seeds a scratch database (SQLite in a temporary directory, or the --url database, whose
+tables must not exist yet), drops the indexes declared on the models, times every query
+shape of the crud filters and prints its plan, then creates the indexes with
+backend.migrations.ensure_indexes and measures again.
+
+    python db_index_benchmark.py --rows 200000
+"""
+
+import argparse
+import logging
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.orm import Session
+
+from backend.database import Base
+from backend.migrations import ensure_indexes
+from backend.models import Lead, Appointment, Sale, MktLead
+from backend.crud import lead as lead_crud
+from backend.crud import appointment as appointment_crud
+from backend.crud import sale as sale_crud
+from backend.crud import mkt_lead as mkt_lead_crud
+
+# Configure logging
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+UNITS = [f"UNIDADE {i}" for i in range(20)]
+SOURCES = ["Google", "Facebook", "Instagram", "Indicação", "Site", "Outros"]
+STATUSES = ["Agendado", "Atendido", "Falta", "Cancelado", "Pago", "Pendente"]
+SELLERS = [f"Consultora {i}" for i in range(40)]
+START = datetime(2024, 1, 1)
+
+# Query shapes of the list and count endpoints, with the filters the dashboards send
+QUERIES = [
+    ("sales count unit+status+month", lambda db: sale_crud.get_sales_count(
+        db, unit="UNIDADE 3", status="Pago", date_from=datetime(2024, 6, 1), date_to=datetime(2024, 6, 30))),
+    ("sales page seller by date", lambda db: sale_crud.get_sales_page(
+        db, seller="Consultora 7", order_by="date", limit=100, total="none")),
+    ("sales total unit+seller+month", lambda db: sale_crud.get_total_sales_value(
+        db, unit="UNIDADE 3", seller="Consultora 7", date_from=datetime(2024, 6, 1), date_to=datetime(2024, 6, 30))),
+    ("appointments page unit+status", lambda db: appointment_crud.get_appointments_page(
+        db, unit="UNIDADE 5", status="Falta", limit=100, total="window")),
+    ("leads count status+source", lambda db: lead_crud.get_leads_count(db, status="Atendido", source="Google")),
+    ("leads page source", lambda db: lead_crud.get_leads_page(db, source="Indicação", limit=100, total="none")),
+    ("mkt leads count store+status", lambda db: mkt_lead_crud.get_mkt_leads_count(db, unit="UNIDADE 8", status="Atendido")),
+    ("mkt leads page source", lambda db: mkt_lead_crud.get_mkt_leads_page(db, source="Instagram", limit=100, total="none")),
+]
+
+def seed(engine, rows, chunk=20000):
+    """Inserts `rows` random leads, appointments, sales and mkt leads."""
+    rng = random.Random(42)
+
+    def moment():
+        return START + timedelta(minutes=rng.randrange(2 * 365 * 24 * 60))
+
+    generators = [
+        (Lead, lambda i: {"id": i, "unit": rng.choice(UNITS), "source": rng.choice(SOURCES), "status": rng.choice(STATUSES), "created_at": moment()}),
+        (Appointment, lambda i: {"id": i, "lead_id": rng.randint(1, rows), "date": moment(), "status": rng.choice(STATUSES), "unit": rng.choice(UNITS)}),
+        (Sale, lambda i: {
+            "id": i, "lead_id": rng.randint(1, rows), "date": moment(), "procedure": "BOTOX", "unit": rng.choice(UNITS),
+            "total_value": 100, "final_value": rng.randint(50, 5000), "payment_method": "Pix", "status": rng.choice(STATUSES),
+            "seller": rng.choice(SELLERS),
+        }),
+        (MktLead, lambda i: {
+            "lead_id": i, "lead_store": rng.choice(UNITS), "lead_source": rng.choice(SOURCES),
+            "appointment_status": rng.choice(STATUSES), "appointment_date": moment(),
+        }),
+    ]
+    with engine.begin() as conn:
+        for model, make in generators:
+            for start in range(1, rows + 1, chunk):
+                conn.execute(model.__table__.insert(), [make(i) for i in range(start, min(start + chunk, rows + 1))])
+            logger.info(f"Seeded {rows} {model.__tablename__}")
+
+def drop_model_indexes(engine):
+    for model in (Lead, Appointment, Sale, MktLead):
+        for index in model.__table__.indexes:
+            index.drop(engine, checkfirst=True)
+
+def explain(engine, statement, parameters):
+    """Plan of one statement, as the database prints it."""
+    prefix = "EXPLAIN QUERY PLAN " if engine.dialect.name == "sqlite" else "EXPLAIN "
+    with engine.connect() as conn:
+        cursor = conn.connection.cursor()
+        cursor.execute(prefix + statement, parameters)
+        rows = cursor.fetchall()
+    return "\n".join(" | ".join(str(value) for value in row[-1:]) for row in rows)
+
+def measure(engine, repeat):
+    """{query label: (median ms, plan of its last statement)}"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    results = {}
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        for label, run in QUERIES:
+            timings = []
+            for _ in range(repeat):
+                statements.clear()
+                with Session(engine) as db:
+                    started = time.perf_counter()
+                    run(db)
+                    timings.append((time.perf_counter() - started) * 1000)
+            results[label] = (statistics.median(timings), statements[-1])
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    return {label: (ms, explain(engine, *statement)) for label, (ms, statement) in results.items()}
+
+def main():
+    """Seed, measure without indexes, create them, measure again"""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=100000, help="Rows per table")
+    parser.add_argument("--repeat", type=int, default=15, help="Runs per query, the median is reported")
+    parser.add_argument("--url", help="Database URL (a temporary SQLite file by default)")
+    args = parser.parse_args()
+
+    scratch = tempfile.TemporaryDirectory()
+    engine = create_engine(args.url or f"sqlite:///{Path(scratch.name) / 'benchmark.db'}")
+    try:
+        existing = set(inspect(engine).get_table_names()) & set(Base.metadata.tables)
+        if existing:
+            logger.error(f"Refusing to benchmark on a database that has {', '.join(sorted(existing))}")
+            return 1
+        Base.metadata.create_all(engine)
+        drop_model_indexes(engine)
+        seed(engine, args.rows)
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+
+        before = measure(engine, args.repeat)
+        created = ensure_indexes(engine)
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+        logger.info(f"Created {len(created)} indexes: {', '.join(created)}")
+        after = measure(engine, args.repeat)
+
+        print(f"\n{'query':<34}{'before ms':>12}{'after ms':>12}{'speedup':>10}")
+        for label, _ in QUERIES:
+            print(f"{label:<34}{before[label][0]:>12.2f}{after[label][0]:>12.2f}{before[label][0] / after[label][0]:>9.1f}x")
+        for label, _ in QUERIES:
+            print(f"\n== {label}\n-- before\n{before[label][1]}\n-- after\n{after[label][1]}")
+        return 0
+    except Exception as e:
+        logger.error(f"Benchmark failed: {str(e)}")
+        return 1
+    finally:
+        engine.dispose()
+        scratch.cleanup()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,6 @@
 import pandas as pd
 from .appointment_columns import avaliacao_procedures, appointments_clean_columns
-from helpers.cleaner import clean_telephone
+from helpers.cleaner import clean_telephone_series
 
 def filter_relevant_appointments_to_mkt(df_agd):
     """
@@ -21,7 +21,7 @@ def filter_relevant_appointments_to_mkt(df_agd):
 
     df_agd['Telefone'] = df_agd['Telefone'].fillna('Cliente sem telefone')
     df_agd['Telefone'] = df_agd['Telefone'].astype(str)
-    df_agd['Telefones Limpos'] = df_agd['Telefone'].apply(clean_telephone)
+    df_agd['Telefones Limpos'] = clean_telephone_series(df_agd['Telefone'])
 
     return df_agd
 
@@ -60,7 +60,7 @@ def clean_phone_numbers(df_agd):
     """
     df_agd['Telefone'] = df_agd['Telefone'].fillna('Cliente sem telefone')
     df_agd['Telefone'] = df_agd['Telefone'].astype(str)
-    df_agd['Telefones Limpos'] = df_agd['Telefone'].apply(clean_telephone)
+    df_agd['Telefones Limpos'] = clean_telephone_series(df_agd['Telefone'])
 
     return df_agd
 
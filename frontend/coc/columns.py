@@ -10,6 +10,12 @@ agendamento_por_lead_column = [
                             'agd', 'jag'
 ] 
 
+# Appointment columns the leads by user/store pages read, fetched with a projected query
+leadsByUser_appointment_columns = [
+                                'ID agendamento', 'Status', 'Procedimento',
+                                'Data primeira atendente', 'Nome da primeira atendente'
+]
+
 leadsByUser_display_columns = [
                                 'Atendente', 'Unidade', 'Turno', 'Tam',
                                 'Leads Puxados', 'Leads Puxados (únicos)',
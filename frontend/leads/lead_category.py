@@ -1,4 +1,6 @@
 import re
+import numpy as np
+import pandas as pd
 
 # Key, Category
 category_mapping = {
@@ -38,15 +40,97 @@ category_mapping = {
     'Silicone': 'Prótese de Mama',
 }
 
+class KeywordCategorizer:
+    """
+    Multi-pattern keyword matcher compiled once from a {keyword: category} mapping.
+
+    A text gets the category of the first keyword of the mapping found anywhere in it
+    (case-insensitive), like checking the keywords one by one. All keywords are matched in a
+    single regex scan: the alternation sits in a lookahead, so every position reports the
+    highest-priority keyword starting there, overlapping matches included, and the text keeps
+    the best of those.
+
+    Categories are memoized per text, so a column is factorized into its distinct values and
+    only values never seen before are scanned. The memo lives as long as the categorizer, see
+    get_categorizer.
+
+    Args:
+        mapping: Keywords and their categories, in priority order
+        default: Category for texts without any keyword
+        max_memo_size: The memo is cleared once it holds more texts than this
+    """
+
+    def __init__(self, mapping, default='Indefinido', max_memo_size=200_000):
+        self.default = default
+        self.max_memo_size = max_memo_size
+        self.memo = {}
+        self.priority = {}
+        self.categories = []
+        for keyword, category in mapping.items():
+            keyword = keyword.lower()
+            if keyword and keyword not in self.priority:
+                self.priority[keyword] = len(self.categories)
+                self.categories.append(category)
+        keywords = sorted(self.priority, key=self.priority.get)
+        self.pattern = re.compile('(?=(' + '|'.join(re.escape(keyword) for keyword in keywords) + '))') if keywords else None
+
+    def _scan(self, text):
+        if self.pattern is None:
+            return self.default
+        found = [self.priority[keyword] for keyword in self.pattern.findall(text.lower())]
+        return self.categories[min(found)] if found else self.default
+
+    def categorize(self, text):
+        """Category of one text."""
+        if not isinstance(text, str):
+            text = str(text)
+        category = self.memo.get(text)
+        if category is None:
+            if len(self.memo) >= self.max_memo_size:
+                self.memo.clear()
+            category = self.memo[text] = self._scan(text)
+        return category
+
+    def categorize_series(self, texts):
+        """Categories of a whole column, indexed like it."""
+        codes, uniques = pd.factorize(texts.astype(str), use_na_sentinel=False)
+        categories = np.array([self.categorize(text) for text in uniques], dtype=object)
+        return pd.Series(categories[codes], index=texts.index, dtype=object)
+
+_categorizers = {}
+
+def get_categorizer(mapping=None):
+    """
+    Categorizer of a mapping, shared across calls (and Streamlit reruns) while the mapping
+    is unchanged.
+
+    Args:
+        mapping: {keyword: category}, category_mapping by default
+
+    Returns:
+        KeywordCategorizer for the current content of the mapping. Editing the mapping gives
+        a new categorizer, so memoized categories of the old keywords are never reused.
+    """
+    mapping = category_mapping if mapping is None else mapping
+    fingerprint = tuple(mapping.items())
+    categorizer = _categorizers.get(fingerprint)
+    if categorizer is None:
+        _categorizers.clear()
+        categorizer = _categorizers[fingerprint] = KeywordCategorizer(mapping)
+    return categorizer
+
+# Courtesy leads left without a procedure category: (column, value, category)
+courtesy_rules = [
+    ('Fonte', 'Indique e Multiplique', 'Cortesia Indique'),
+    ('Fonte', 'CRM BÔNUS', 'Cortesia CRM Bônus'),
+    ('Mensagem', 'Lead Pop Up de Saída. Ganhou Peeling Diamante.', 'Cortesia PopUpSaida Peeling_D'),
+    ('Mensagem', 'Lead Pop Up de Saída. Ganhou Massagem Modeladora.', 'Cortesia PopUpSaida Mass_Mod'),
+    ('Mensagem', 'Lead salvo pelo modal de WhatsApp da Isa', 'Quer Falar no Whatsapp'),
+]
+
 def categorize(text):
     """Categorize text based on keywords."""
-    if not isinstance(text, str):
-        text = str(text)
-    
-    for keyword, category in category_mapping.items():
-        if keyword.lower() in text.lower():
-            return category
-    return 'Indefinido'
+    return get_categorizer().categorize(text)
 
 def process_lead_categories(df_leads):
     """Process and categorize leads in the DataFrame."""
@@ -54,20 +138,18 @@ def process_lead_categories(df_leads):
     df_leads['Content'] = df_leads['Content'].astype(str)
     df_leads['Mensagem'] = df_leads['Mensagem'].astype(str)
     
-    # Categorize based on Content
-    df_leads['Categoria'] = df_leads['Content'].apply(categorize)
-    
-    # Categorize based on Mensagem for Indefinido cases
-    df_leads.loc[df_leads['Categoria'] == 'Indefinido', 'Categoria'] = \
-        df_leads.loc[df_leads['Categoria'] == 'Indefinido', 'Mensagem'].apply(categorize)
+    # Categorize based on Content, then on Mensagem for Indefinido cases
+    category_matcher = get_categorizer()
+    categories = category_matcher.categorize_series(df_leads['Content'])
+    undefined = (categories == 'Indefinido').to_numpy()
+    if undefined.any():
+        categories[undefined] = category_matcher.categorize_series(df_leads['Mensagem'][undefined]).to_numpy()
     
     # Extra categories
-    df_leads.loc[(df_leads['Fonte'] == 'Indique e Multiplique') & (df_leads['Categoria'] == 'Indefinido'), 'Categoria'] = 'Cortesia Indique'
-    df_leads.loc[(df_leads['Fonte'] == 'CRM BÔNUS') & (df_leads['Categoria'] == 'Indefinido'), 'Categoria'] = 'Cortesia CRM Bônus'
-    df_leads.loc[(df_leads['Mensagem'] == 'Lead Pop Up de Saída. Ganhou Peeling Diamante.') & (df_leads['Categoria'] == 'Indefinido'), 'Categoria'] = 'Cortesia PopUpSaida Peeling_D'
-    df_leads.loc[(df_leads['Mensagem'] == 'Lead Pop Up de Saída. Ganhou Massagem Modeladora.') & (df_leads['Categoria'] == 'Indefinido'), 'Categoria'] = 'Cortesia PopUpSaida Mass_Mod'
-    df_leads.loc[(df_leads['Mensagem'] == 'Lead salvo pelo modal de WhatsApp da Isa') & (df_leads['Categoria'] == 'Indefinido'), 'Categoria'] = 'Quer Falar no Whatsapp'
+    for column, value, category in courtesy_rules:
+        categories[((categories == 'Indefinido') & (df_leads[column] == value)).to_numpy()] = category
 
-    df_leads.loc[(df_leads['Content'].str.contains('preenchimentocorporal')) & (df_leads['Categoria'] == 'Preenchimento'), 'Categoria'] = 'Preenchimento Corporal'
+    categories[((categories == 'Preenchimento') & df_leads['Content'].str.contains('preenchimentocorporal')).to_numpy()] = 'Preenchimento Corporal'
+    df_leads['Categoria'] = categories.to_numpy()
     
     return df_leads
@@ -1,7 +1,8 @@
 import pandas as pd
 import re
 from datetime import datetime
-from helpers.cleaner import clean_telephone
+from helpers.cleaner import clean_telephone_series, split_telephones
+from frontend.marketing.matcher import match_first_appointment
 
 status_agendamentos_dash = ['Atendido', 'Falta']
 status_comparecimentos_dash = ['Atendido', 'Agendado']
@@ -89,48 +90,19 @@ def check_if_lead_has_atendido_status(df_leads, df_appointments_comparecimentos)
     df_comparecimentos_aval['Telefone'] = df_comparecimentos_aval['Telefone'].astype(str)
 
     # Create clean phone numbers list
-    df_comparecimentos_aval['Telefones Limpos'] = df_comparecimentos_aval['Telefone'].apply(
-        lambda x: [clean_telephone(num) for num in str(x).split('/')]
-    )
-
-    # Convert phone and email lists to sets for fast lookup
-    telefones_agendados = set(num for sublist in df_comparecimentos_aval['Telefones Limpos'] for num in sublist)
-    emails_agendados = set(df_comparecimentos_aval['Email'])
-
-    # Function to check if a lead has an appointment
-    def eh_comparecimento(row):
-        telefone = row['Telefone do lead']
-        email = row['Email do lead']
-
-        # Find matches in df_comparecimentos_aval
-        match = df_comparecimentos_aval[
-            (df_comparecimentos_aval['Telefones Limpos'].apply(lambda x: telefone in x)) |
-            (df_comparecimentos_aval['Email'] == email)
-        ]
-
-        if not match.empty:
-            data = match.iloc[0]['Data']
-            proced_avaliação = match.iloc[0]['proced_avaliação']
-            agendamento = match.iloc[0]['agendamento']
-            comparecimento = match.iloc[0]['comparecimento']
-            procedimento = match.iloc[0]['Procedimento']
-            status = match.iloc[0]['Status']
-            unidade = match.iloc[0]['Unidade do agendamento']
-
-            return pd.Series({
-                'data_agenda': data,
-                'proced_avaliação': proced_avaliação,
-                'agendamento': agendamento,
-                'comparecimento': comparecimento,
-                'procedimento': procedimento,
-                'status': status,
-                'unidade': unidade
-            })
-
-        return pd.Series({'data_agenda': None, 'proced_avaliação': None, 'agendamento': None, 'comparecimento': None, 'procedimento': None, 'status': None, 'unidade': None})
-
-    # Apply function to leads
-    leads[['data_agenda', 'proced_avaliação', 'agendamento', 'comparecimento', 'procedimento', 'status', 'unidade']] = leads.apply(eh_comparecimento, axis=1)
+    df_comparecimentos_aval['Telefones Limpos'] = split_telephones(df_comparecimentos_aval['Telefone'])
+
+    # Bring the first matching comparecimento into each lead
+    fields = {
+        'data_agenda': 'Data',
+        'proced_avaliação': 'proced_avaliação',
+        'agendamento': 'agendamento',
+        'comparecimento': 'comparecimento',
+        'procedimento': 'Procedimento',
+        'status': 'Status',
+        'unidade': 'Unidade do agendamento',
+    }
+    leads[list(fields)] = match_first_appointment(leads, df_comparecimentos_aval, fields)
 
     return leads
 
@@ -146,7 +118,7 @@ def check_if_lead_has_other_status(df_leads_que_nao_compareceram, df_appointment
     # Limpar telefones no df_agd, incluindo separar múltiplos telefones
     agendamentos['Telefone'] = agendamentos['Telefone'].fillna('Cliente sem telefone')
     agendamentos['Telefone'] = agendamentos['Telefone'].astype(str)
-    agendamentos['Telefones Limpos'] = agendamentos['Telefone'].apply(lambda x: [clean_telephone(num) for num in str(x).split('/')])
+    agendamentos['Telefones Limpos'] = split_telephones(agendamentos['Telefone'])
 
     # Verificação de status
     agendamentos["proced_avaliação"] = agendamentos['Procedimento'].str.contains(r'.*AVALIAÇÃO.*', case=False)
@@ -157,43 +129,17 @@ def check_if_lead_has_other_status(df_leads_que_nao_compareceram, df_appointment
     df_agd_filtrado = agendamentos[(agendamentos["esta agendado?"] == True) | (agendamentos["falta ou cancelado?"] == True)]
     df_agd_filtrado = df_agd_filtrado.loc[df_agd_filtrado['Procedimento'].isin(procedimentos_que_vamos_olhar)]
 
-    # Função para verificar se o lead está no df_agd_filtrado e trazer as informações adicionais
-    def verificar_status(row):
-        telefone = row['Telefone do lead']
-        email = row['Email do lead']
-        match = df_agd_filtrado[(df_agd_filtrado['Telefones Limpos'].apply(lambda x: telefone in x)) | (df_agd_filtrado['Email'] == email)]
-
-        if not match.empty:
-            data = match.iloc[0]['Data']
-            proced_avaliação = match.iloc[0]['proced_avaliação']
-            agendamento = match.iloc[0]['esta agendado?']
-            comparecimento = match.iloc[0]['falta ou cancelado?']
-            status = match.iloc[0]['Status']
-            procedimento = match.iloc[0]['Procedimento']
-            unidade = match.iloc[0]['Unidade do agendamento']
-
-            return pd.Series({
-                'data_agenda_novo': data,
-                'proced_avaliação_novo': proced_avaliação,
-                'agendamento_novo': agendamento,
-                'comparecimento_novo': comparecimento,
-                'status_novo': status,
-                'procedimento_novo': procedimento,
-                'unidade_novo': unidade
-            })
-
-        return pd.Series({
-            'data_agenda_novo': None,
-            'proced_avaliação_novo': None,
-            'agendamento_novo': None,
-            'comparecimento_novo': None,
-            'status_novo': None,
-            'procedimento_novo': None,
-            'unidade_novo': None
-        })
-
-    # Aplicar a função aos leads
-    leads[['data_agenda_novo', 'proced_avaliação_novo', 'agendamento_novo', 'comparecimento_novo', 'status_novo', 'procedimento_novo', 'unidade_novo']] = leads.apply(verificar_status, axis=1)
+    # Trazer as informações do primeiro agendamento de cada lead
+    fields = {
+        'data_agenda_novo': 'Data',
+        'proced_avaliação_novo': 'proced_avaliação',
+        'agendamento_novo': 'esta agendado?',
+        'comparecimento_novo': 'falta ou cancelado?',
+        'status_novo': 'Status',
+        'procedimento_novo': 'Procedimento',
+        'unidade_novo': 'Unidade do agendamento',
+    }
+    leads[list(fields)] = match_first_appointment(leads, df_agd_filtrado, fields)
     
     return leads
 
@@ -208,7 +154,7 @@ def check_appointments_status(df_leads, df_appointments_comparecimentos, df_appo
     leads['Telefone do lead'] = leads['Telefone do lead'].fillna('Cliente sem telefone')
     leads['Email do lead'] = leads['Email do lead'].fillna('None')
     leads['Telefone do lead'] = leads['Telefone do lead'].astype(str)
-    leads['Telefone do lead'] = leads['Telefone do lead'].apply(clean_telephone)
+    leads['Telefone do lead'] = clean_telephone_series(leads['Telefone do lead'])
     
     # Phase 1: Check for 'Atendido' status
     leads = check_if_lead_has_atendido_status(leads, df_appointments_comparecimentos)
@@ -0,0 +1,58 @@
+"""
+matcher.py
+finds, for every lead, the first appointment sharing one of its telephones or its email.
+
+Leads and appointments are turned into the normalized identity keys of helpers.identity,
+the appointments are indexed once (key -> first row) and every lead is resolved with one
+vectorized lookup. Only direct matches count: a lead gets the earliest appointment row that
+has one of its own keys, not the appointments of other records linked to it (see
+helpers.identity.resolve_customers for that).
+"""
+
+import numpy as np
+import pandas as pd
+from helpers.identity import record_keys
+
+def _first_positions(keys):
+    """Series key -> position of the first row having that key, from a record_keys result."""
+    return pd.Series(keys.index, dtype=np.int64).groupby(keys.to_numpy()).min()
+
+def match_first_appointment(
+        df_leads,
+        df_appointments,
+        fields,
+        lead_phone_col='Telefone do lead',
+        lead_email_col='Email do lead',
+        phone_col='Telefone',
+        email_col='Email'):
+    """
+    Brings the fields of the first matching appointment into each lead.
+
+    Args:
+        df_leads: Leads
+        df_appointments: Appointments, in the order matches are preferred
+        fields: {output column: appointment column} to copy from the matched appointment
+        lead_phone_col / lead_email_col: Lead columns used for matching
+        phone_col: Appointment column with the raw telephone(s)
+        email_col: Appointment column with the email
+
+    Returns:
+        DataFrame indexed like df_leads with the output columns, None where there is no match
+    """
+    positions = df_appointments.reset_index(drop=True)
+    lead_keys = record_keys(df_leads, phones=lead_phone_col, emails=lead_email_col)
+    appointment_keys = record_keys(positions, phones=phone_col, emails=email_col)
+
+    # Earliest appointment of any of the lead's keys, NaN without a match
+    matches = lead_keys.map(_first_positions(appointment_keys)).dropna()
+    first_match = matches.groupby(level=0).min().reindex(range(len(df_leads))).to_numpy(dtype=float)
+
+    matched = ~np.isnan(first_match)
+    rows = first_match[matched].astype(int)
+
+    result = pd.DataFrame(index=df_leads.index, columns=list(fields), dtype=object)
+    for output_col, appointment_col in fields.items():
+        values = np.full(len(df_leads), None, dtype=object)
+        values[matched] = positions[appointment_col].to_numpy(dtype=object)[rows]
+        result[output_col] = values
+    return result
@@ -1,7 +1,8 @@
 import pandas as pd
 import re
 from datetime import datetime
-from helpers.cleaner import clean_telephone
+from helpers.cleaner import clean_telephone_series
+from helpers.identity import MAX_KEY_RECORDS, resolve_customers
 
 def check_if_lead_has_purchased(df_leads_cleaned_final, df_sales):
     """
@@ -25,28 +26,33 @@ def check_if_lead_has_purchased(df_leads_cleaned_final, df_sales):
     leads = df_leads_cleaned_final.copy()
     sales = df_sales.copy()
     
-    leads['Telefone do lead'] = leads['Telefone do lead'].fillna('Cliente sem telefone')
-    leads['Telefone do lead'] = leads['Telefone do lead'].astype(str)
-    leads['Telefone do lead'] = leads['Telefone do lead'].apply(clean_telephone)
-    
-    sales['Telefones Limpos'] = sales['Telefones Limpos'].fillna('Cliente sem telefone')
-    sales['Telefones Limpos'] = sales['Telefones Limpos'].astype(str)
-    sales['Telefones Limpos'] = sales['Telefones Limpos'].apply(clean_telephone)
-    
-    # Merge the exploded DataFrame with df_leads
+    leads['Telefone do lead'] = clean_telephone_series(leads['Telefone do lead'])
+
+    # Group leads and sales into customers (telephones, emails and CPF)
+    sale_identity = {
+        'phones': 'Telefones Limpos',
+        'emails': [column for column in ['Email do cliente'] if column in sales.columns],
+        'taxvats': [column for column in ['CPF', 'CPF do cliente'] if column in sales.columns],
+    }
+    leads['_customer_key'], sales['_customer_key'] = resolve_customers([
+        (leads, {'phones': 'Telefone do lead', 'emails': 'Email do lead'}),
+        (sales, sale_identity),
+    ], max_key_records=MAX_KEY_RECORDS)
+    sales = sales[sales['_customer_key'].notna()]
+
+    # Hash join leads and sales on the customer key, every sale of the customer matches its leads
     df_leads_compras = pd.merge(
         leads,
         sales,
-        left_on='Telefone do lead',
-        right_on='Telefones Limpos',
+        on='_customer_key',
         how='left'
-    )
+    ).drop(columns='_customer_key')
 
     # Fill NaNs with 'Não é lead' for cases where no match is found
     df_leads_compras['Unidade_y'] = df_leads_compras['Unidade_y'].fillna('Não comprou')
     df_leads_compras['comprou'] = df_leads_compras['Unidade_y'] != 'Não comprou'
 
-    # Droping duplicated ID do lead
+    # Droping duplicated ID do lead, one row per lead with its customer's first sale
     df_leads_compras = df_leads_compras.drop_duplicates(subset='ID do lead', keep='first')
     # df_leads_compras = df_leads_compras.drop_duplicates(subset='Email do lead', keep='first')
     # df_leads_compras['Valor líquido'].sum()
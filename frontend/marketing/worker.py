@@ -15,6 +15,7 @@ from frontend.appointments.appointment_cleaner import (
 from frontend.sales.sale_columns import colunas_reduzido
 from frontend.sales.sales_cleaner import filter_relevant_sales_to_mkt
 from frontend.leads.leads_cleaner import filter_relevant_leads_to_mkt
+from frontend.marketing.matcher import match_first_appointment
 
 def clean_lead_df(df_leads):
 
@@ -34,6 +35,13 @@ def clean_sales_df(df_sales):
 
     return df_sales
 
+appointment_match_fields = {
+    'data_agenda': 'Data',
+    'procedimento': 'Procedimento',
+    'status': 'Status',
+    'unidade': 'Unidade do agendamento',
+}
+
 def check_if_lead_has_atendido_status(df_leads_cleaned, df_appointments_comparecimentos):
     """
     Function to check if a lead has an appointment with a status of 'Atendido'
@@ -41,36 +49,10 @@ def check_if_lead_has_atendido_status(df_leads_cleaned, df_appointments_comparec
     """
     # Create copies to avoid modifying original dataframes
     df_leads_cleaned = df_leads_cleaned.copy()
-    df_appointments_comparecimentos = df_appointments_comparecimentos.copy()
 
     # Since Leads and Appointments are cleaned, we can check which leads are appointments_comparecimentos
-    def eh_comparecimento(row):
-        telefone = row['Telefone do lead']
-        email = row['Email do lead']
-
-        # Find matches in df_appointments_comparecimentos
-        match = df_appointments_comparecimentos[
-            (df_appointments_comparecimentos['Telefones Limpos'].apply(lambda x: telefone in x)) |
-            (df_appointments_comparecimentos['Email'] == email)
-        ]
-
-        if not match.empty:
-            data = match.iloc[0]['Data']
-            procedimento = match.iloc[0]['Procedimento']
-            status = match.iloc[0]['Status']
-            unidade = match.iloc[0]['Unidade do agendamento']
-
-            return pd.Series({
-                'data_agenda': data,
-                'procedimento': procedimento,
-                'status': status,
-                'unidade': unidade
-            })
-
-        return pd.Series({'data_agenda': None, 'procedimento': None, 'status': None, 'unidade': None})
-
-    # Apply function to df_leads_cleaned
-    df_leads_cleaned[['data_agenda', 'procedimento', 'status', 'unidade']] = df_leads_cleaned.apply(eh_comparecimento, axis=1)
+    matches = match_first_appointment(df_leads_cleaned, df_appointments_comparecimentos, appointment_match_fields)
+    df_leads_cleaned[list(appointment_match_fields)] = matches
 
     return df_leads_cleaned
     
@@ -80,35 +62,9 @@ def check_if_lead_has_other_status(df_leads_nao_atendidos, df_appointments_agend
     """
     # Create copies to avoid modifying original dataframes
     df_leads_nao_atendidos = df_leads_nao_atendidos.copy()
-    df_appointments_agendamentos = df_appointments_agendamentos.copy()
-
-    def eh_agendamento(row):
-        telefone = row['Telefone do lead']
-        email = row['Email do lead']
-
-        # Find matches in df_appointments_agendamentos
-        match = df_appointments_agendamentos[
-            (df_appointments_agendamentos['Telefones Limpos'].apply(lambda x: telefone in x)) |
-            (df_appointments_agendamentos['Email'] == email)
-        ]
-
-        if not match.empty:
-            data = match.iloc[0]['Data']
-            procedimento = match.iloc[0]['Procedimento']
-            status = match.iloc[0]['Status']
-            unidade = match.iloc[0]['Unidade do agendamento']
-
-            return pd.Series({
-                'data_agenda': data,
-                'procedimento': procedimento,
-                'status': status,
-                'unidade': unidade
-            })
-
-        return pd.Series({'data_agenda': None, 'procedimento': None, 'status': None, 'unidade': None})
-
-    # Apply function to df_leads_nao_atendidos
-    df_leads_nao_atendidos[['data_agenda', 'procedimento', 'status', 'unidade']] = df_leads_nao_atendidos.apply(eh_agendamento, axis=1)
+
+    matches = match_first_appointment(df_leads_nao_atendidos, df_appointments_agendamentos, appointment_match_fields)
+    df_leads_nao_atendidos[list(appointment_match_fields)] = matches
 
     return df_leads_nao_atendidos
 
@@ -1,5 +1,5 @@
 import pandas as pd
-from helpers.cleaner import clean_telephone
+from helpers.cleaner import split_telephones
 from .sale_columns import colunas_reduzido
 
 def filter_relevant_sales_to_mkt(df_sales):
@@ -17,7 +17,7 @@ def filter_relevant_sales_to_mkt(df_sales):
     df_sales['Telefone(s) do cliente'] = df_sales['Telefone(s) do cliente'].fillna('Cliente sem telefone')
     df_sales['Email do cliente'] = df_sales['Email do cliente'].fillna('Cliente sem e-mail')
     df_sales['Telefone(s) do cliente'] = df_sales['Telefone(s) do cliente'].astype(str)
-    df_sales['Telefones Limpos'] = df_sales['Telefone(s) do cliente'].apply(lambda x: [clean_telephone(num) for num in str(x).split('/')])
+    df_sales['Telefones Limpos'] = split_telephones(df_sales['Telefone(s) do cliente'])
 
     df_sales['Total comprado pelo cliente'] = df_sales.groupby('ID cliente')['Valor líquido'].transform('sum')
     df_sales['Número de orçamentos do cliente'] = df_sales.groupby('ID cliente')['ID orçamento'].transform('nunique')
@@ -12,7 +12,7 @@ from helpers.data_wrestler import (
     extract_agendamentos,
     append_total_rows_leadsByStore,
 )
-from frontend.coc.columns import leadsByUserColumns, leadsByUser_display_columns
+from frontend.coc.columns import leadsByUserColumns, leadsByUser_display_columns, leadsByUser_appointment_columns
 from frontend.appointments.appointment_types import procedimento_avaliacao, agendamento_status_por_atendente
 from helpers.discord import send_discord_message
 
@@ -30,7 +30,7 @@ async def fetch_leads_and_appointments(start_date, end_date):
     month_start_date, month_end_date = extract_start_date_and_end_date_of_month(start_date)
 
     leads_data_task = asyncio.create_task(fetch_and_process_leadsByUserReport(start_date, end_date))
-    appointments_data_task = asyncio.create_task(fetch_and_process_appointment_report_created_at(start_date, end_date))
+    appointments_data_task = asyncio.create_task(fetch_and_process_appointment_report_created_at(start_date, end_date, columns=leadsByUser_appointment_columns))
     leads_data_complete_month_task = asyncio.create_task(fetch_and_process_leadsByUserReport(month_start_date, month_end_date))
 
     leads_data, appointments_data, leads_data_complete_month = await asyncio.gather(
@@ -12,7 +12,7 @@ from helpers.data_wrestler import (
     append_total_rows_leadsByUser,
     highlight_total_row_leadsByUser
 )
-from frontend.coc.columns import leadsByUserColumns, leadsByUser_display_columns
+from frontend.coc.columns import leadsByUserColumns, leadsByUser_display_columns, leadsByUser_appointment_columns
 from frontend.appointments.appointment_types import procedimento_avaliacao, agendamento_status_por_atendente
 from helpers.discord import send_discord_message
 
@@ -21,7 +21,7 @@ async def fetch_leads_and_appointments(start_date, end_date):
     Run both API calls concurrently to improve performance.
     """
     leads_data_task = asyncio.create_task(fetch_and_process_leadsByUserReport(start_date, end_date))
-    appointments_data_task = asyncio.create_task(fetch_and_process_appointment_report_created_at(start_date, end_date))
+    appointments_data_task = asyncio.create_task(fetch_and_process_appointment_report_created_at(start_date, end_date, columns=leadsByUser_appointment_columns))
 
     leads_data, appointments_data = await asyncio.gather(leads_data_task, appointments_data_task)
     return leads_data, appointments_data
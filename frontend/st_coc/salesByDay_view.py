@@ -29,14 +29,12 @@ def load_data(start_date=None, end_date=None, use_api=False):
     if start_date and end_date:
         try:
             # Run the async function using asyncio
-            sales_data = asyncio.run(fetch_and_process_grossSales_report(start_date, end_date))
+            df = asyncio.run(fetch_and_process_grossSales_report(start_date, end_date, output='dataframe'))
 
-            if not sales_data:
+            if df.empty:
                 st.error("Não foi possível obter dados da API. Usando dados locais.")
                 return load_data(use_api=False)
             
-            df = pd.DataFrame(sales_data)
-            
             # Map API field names to match the excel structure
             df = df.rename(columns={
                 'id': 'ID orçamento',
@@ -39,14 +39,12 @@ def load_data(start_date=None, end_date=None, use_api=False):
     if start_date and end_date:
         try:
             # Run the async function using asyncio
-            appointments_data = asyncio.run(fetch_and_process_appointment_report(start_date, end_date))
+            df = asyncio.run(fetch_and_process_appointment_report(start_date, end_date, incremental=True, output='dataframe'))
 
-            if not appointments_data:
+            if df.empty:
                 st.error("Não foi possível obter dados da API. Usando dados locais.")
                 return load_data(use_api=False)
             
-            df = pd.DataFrame(appointments_data)
-            
             # Format the date for 'Dia' column (single step)
             df['Dia'] = pd.to_datetime(df['Data']).dt.strftime('%d-%m-%Y')
             
@@ -18,7 +18,7 @@ from frontend.sales.sale_columns import sales_clean_columns
 from frontend.marketing.marketing_columns import marketing_clean_columns
 from frontend.leads.lead_columns import lead_clean_columns
 from frontend.leads.lead_category import process_lead_categories
-from helpers.cleaner import clean_telephone, rename_columns_df_leads_with_purchases
+from helpers.cleaner import clean_telephone_series, rename_columns_df_leads_with_purchases
 from helpers.date import (transform_date_from_sales,
                          transform_date_from_leads,
                          transform_date_from_appointments)
@@ -151,7 +151,7 @@ def load_page_marketing():
                 # df_leads_cleaned = df_leads_google_and_facebook[lead_clean_columns]
                 df_leads_cleaned = df_leads[lead_clean_columns]
                 df_leads_cleaned['Telefone do lead'] = df_leads_cleaned['Telefone do lead'].astype(str)
-                df_leads_cleaned['Telefone do lead'] = df_leads_cleaned['Telefone do lead'].apply(clean_telephone)
+                df_leads_cleaned['Telefone do lead'] = clean_telephone_series(df_leads_cleaned['Telefone do lead'])
                 
                 st.markdown("---")
                 st.write("Leads que vamos conferir:")
@@ -376,6 +376,8 @@ def load_page_marketing():
                     icon="✅"
                 )
 
+            show_db_pushes()
+
     except Exception as e:
         st.error(f"An error occurred: {str(e)}")
 
@@ -383,20 +385,41 @@ def load_page_marketing():
 def save_data():
     """
     Save the processed leads data to the database when the 'Salvar Dados' button is clicked.
-    This function acts as a bridge between the UI and the data_wrestler module.
+    The push runs on the background writer (helpers/db_writer.py) and its job id is kept in
+    st.session_state, so the page stays usable while the data is written.
     """
     try:
         # Check if data exists in session state
         if 'leads_data' in st.session_state and not st.session_state['leads_data'].empty:
-            from helpers.data_wrestler import save_data_to_db, save_data_to_db_batch
-            
-            success, message = save_data_to_db_batch(st.session_state['leads_data'])
+            from helpers.db_writer import get_writer
             
-            if success:
-                st.success(message)
-            else:
-                st.error(message)
+            df_leads = st.session_state['leads_data']
+            job_id = get_writer().submit(df_leads, label=f"{len(df_leads)} leads ({datetime.now():%H:%M:%S})")
+            st.session_state.setdefault('db_push_jobs', []).append(job_id)
+            st.toast("Salvando os dados no banco em segundo plano...", icon="⏳")
         else:
             st.warning("Não há dados para salvar. Processe os dados primeiro.")
     except Exception as e:
-        st.error(f"Erro ao salvar dados: {str(e)}")
\ No newline at end of file
+        st.error(f"Erro ao salvar dados: {str(e)}")
+
+@st.fragment(run_every=2)
+def show_db_pushes():
+    """Progress of this session's background database pushes, refreshed without rerunning the page."""
+    job_ids = st.session_state.get('db_push_jobs', [])
+    if not job_ids:
+        return
+    from helpers.db_writer import get_writer
+
+    writer = get_writer()
+    for job_id in job_ids:
+        job = writer.job_status(job_id)
+        if job is None:
+            continue
+        if job['status'] == 'queued':
+            st.progress(0.0, text=f"{job['label']}: aguardando na fila")
+        elif job['status'] == 'running':
+            st.progress(job['progress'], text=f"{job['label']}: lote {job['finished_batches']} de {job['total_batches'] or '?'}")
+        elif job['status'] == 'done':
+            st.success(job['message'])
+        else:
+            st.error(job['message'])
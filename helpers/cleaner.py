@@ -1,4 +1,14 @@
 import re
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401 - enables the Arrow-backed string kernels below
+    _PHONE_DTYPE = 'string[pyarrow]'
+except ImportError:  # pragma: no cover - pyarrow ships with streamlit
+    _PHONE_DTYPE = 'string'
+
+# Separators between numbers in multi-number fields such as 'Telefone(s) do cliente'
+TELEPHONE_SEPARATORS = r'[/,;]'
 
 # Função para limpar telefones
 def clean_telephone(telefone):
@@ -9,6 +19,53 @@ def clean_telephone(telefone):
         telefone = telefone[2:]
     return telefone
 
+def canonicalize_br_mobile(telefones):
+    """
+    Brings Brazilian numbers to one format: a leading trunk 0 is dropped and 8-digit mobile
+    numbers (DDD + 6..9xxx-xxxx) get the 9th digit, so both formats of a mobile match.
+    """
+    telefones = telefones.where(~(telefones.str.startswith('0') & telefones.str.len().isin([11, 12])), telefones.str[1:])
+    old_mobile = (telefones.str.len() == 10) & telefones.str[2].isin(['6', '7', '8', '9'])
+    return telefones.where(~old_mobile, telefones.str[:2] + '9' + telefones.str[2:])
+
+def clean_telephone_series(telefones, canonical=False):
+    """
+    Vectorized clean_telephone over a whole column.
+
+    Args:
+        telefones: Series of raw telephones (missing values give '')
+        canonical: Also apply canonicalize_br_mobile
+
+    Returns:
+        Series of str with the same index
+    """
+    telefones = telefones.astype(object).where(telefones.notna(), '').astype(str).astype(_PHONE_DTYPE)
+    telefones = telefones.str.replace(r'\D', '', regex=True).str.replace(r'^55', '', regex=True)
+    if canonical:
+        telefones = canonicalize_br_mobile(telefones)
+    return telefones.astype(object)
+
+def explode_telephones(telefones, canonical=False):
+    """
+    One cleaned number per row from a column of multi-number fields.
+
+    Fields can hold several numbers separated by '/', ',' or ';' (or already be lists).
+    Empty numbers are dropped and the index of the input is repeated for every number.
+    """
+    telefones = telefones.dropna()
+    if len(telefones) and telefones.map(lambda value: isinstance(value, list)).all():
+        numbers = telefones.explode()
+    else:
+        numbers = telefones.astype(str).str.split(TELEPHONE_SEPARATORS).explode()
+    numbers = clean_telephone_series(numbers.dropna(), canonical)
+    return numbers[numbers != '']
+
+def split_telephones(telefones, canonical=False):
+    """Cleaned numbers of every multi-number field as a list per row ([] when there are none)."""
+    numbers = explode_telephones(telefones.reset_index(drop=True), canonical)
+    by_row = numbers.groupby(level=0, sort=False).agg(list).to_dict() if len(numbers) else {}
+    return pd.Series([by_row.get(position, []) for position in range(len(telefones))], index=telefones.index, dtype=object)
+
 columns_to_hide_from_final_df_leads_appointments_sales = [
                     "Telefones Limpos", 
                     "Telefone(s) do cliente",
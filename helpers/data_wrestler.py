@@ -4,12 +4,19 @@ Responsible for getting the data from views/marketing_view.py
 and push it to the database when click on the button is clicked.
 """
 
+import io
+import time
+import hashlib
 import pandas as pd
+import numpy as np
 import logging
 from datetime import datetime
+from sqlalchemy import func, select, text
 from sqlalchemy.exc import SQLAlchemyError
 from backend.database import SessionLocal, engine
 from backend.models.mkt_lead import MktLead
+from backend.models.push_checkpoint import PushCheckpoint
+from backend.crud.rollup import refresh_rollups, rollup_days
 from sqlalchemy.orm import Session
 from frontend.coc.columns import agendamento_por_lead_column
 
@@ -36,6 +43,352 @@ def clean_datetime(value):
     
     return value
 
+# MktLead column -> funnel column, for the columns stored as text
+MKT_LEAD_TEXT_COLUMNS = {
+    "lead_email": "Email do lead",
+    "lead_phone": "Telefone do lead",
+    "lead_message": "Mensagem",
+    "lead_store": "Unidade do lead",
+    "lead_source": "Fonte",
+    "lead_mkt_source": "Source",
+    "lead_mkt_medium": "Medium",
+    "lead_mkt_term": "Term",
+    "lead_mkt_content": "Content",
+    "lead_mkt_campaign": "Campaign",
+    "lead_month": "Mês do lead",
+    "lead_category": "Categoria",
+    "appointment_procedure": "Procedimento",
+    "appointment_status": "Status Agenda",
+    "appointment_store": "Unidade da Agenda",
+    "sale_cleaned_phone": "Telefones Limpos",
+    "sales_phone": "Telefone(s) do cliente",
+    "sales_quote_id": "ID orçamento",
+    "sales_store": "Unidade da Venda",
+    "sales_first_quote": "Valor primeiro orçamento",
+    "sales_total_bought": "Total comprado pelo cliente",
+    "sales_number_of_quotes": "Número de orçamentos do cliente",
+    "sales_month": "Mês da Venda",
+    "sales_day_of_week": "Dia da Semana",
+}
+
+MKT_LEAD_DATETIME_COLUMNS = {
+    "appointment_date": "Data Na Agenda",
+    "sales_date": "Data Venda",
+}
+
+def _column(df, name):
+    """Funnel column, or an all-missing one when the frame does not have it."""
+    if name in df.columns:
+        return df[name]
+    return pd.Series(None, index=df.index, dtype=object)
+
+def _nullable(values, missing):
+    """Object array of the values with None where `missing` is set."""
+    values = np.asarray(values, dtype=object)
+    values[np.asarray(missing, dtype=bool)] = None
+    return values
+
+def _text_values(series):
+    missing = series.isna()
+    if missing.all():
+        return np.full(len(series), None, dtype=object)
+    return _nullable(series.astype(str), missing)
+
+def _int_values(series, truthy=False):
+    numbers = pd.to_numeric(series, errors="coerce")
+    missing = numbers.isna() | (numbers != numbers.round())
+    if truthy:
+        missing |= numbers == 0
+    return _nullable(numbers.fillna(0).astype("int64").tolist(), missing)
+
+def _datetime_values(series):
+    dates = pd.to_datetime(series, errors="coerce")
+    if dates.dt.tz is not None:
+        dates = dates.dt.tz_localize(None)
+    return _nullable(pd.DatetimeIndex(dates).to_pydatetime(), dates.isna())
+
+def mkt_lead_frame(df_leads_with_purchases):
+    """
+    Converts the funnel frame into MktLead columns with whole-column operations.
+
+    Text columns keep their string value (None when missing), dates become Python
+    datetimes, 'Dia da entrada' gives the entry day and 'comprou' a bool. Rows without a
+    numeric lead ID are dropped, and a lead ID seen twice keeps its last row.
+
+    Args:
+        df_leads_with_purchases (pd.DataFrame): DataFrame containing leads, appointments, and sales data
+
+    Returns:
+        tuple: (DataFrame of object columns named like MktLead, number of rows without lead ID)
+    """
+    df = df_leads_with_purchases
+    columns = {"lead_id": _int_values(_column(df, "ID lead"))}
+    for column, source in MKT_LEAD_TEXT_COLUMNS.items():
+        columns[column] = _text_values(_column(df, source))
+    for column, source in MKT_LEAD_DATETIME_COLUMNS.items():
+        columns[column] = _datetime_values(_column(df, source))
+
+    entry_dates = pd.to_datetime(_column(df, "Dia da entrada"), errors="coerce")
+    columns["lead_entry_day"] = _nullable(entry_dates.dt.day.fillna(0).astype("int64").tolist(), entry_dates.isna())
+    columns["sales_day"] = _int_values(_column(df, "Dia"))
+    purchased = _column(df, "comprou")
+    columns["sales_purchased"] = np.array((purchased.notna() & purchased.astype(bool)).tolist(), dtype=object)
+    columns["sales_interval"] = _int_values(_column(df, "intervalo da compra"), truthy=True)
+
+    frame = pd.DataFrame(columns, index=range(len(df)), dtype=object)
+    has_id = frame["lead_id"].notna()
+    frame = frame[has_id].drop_duplicates("lead_id", keep="last")
+    return frame, int((~has_id).sum())
+
+def mkt_lead_rows(frame):
+    """Row dicts of a mkt_lead_frame result, built column-wise instead of through DataFrame.to_dict."""
+    names = list(frame.columns)
+    return [dict(zip(names, values)) for values in zip(*(frame[name].to_numpy() for name in names))]
+
+def _dialect_insert(bind):
+    """INSERT construct of the bind's dialect, which knows ON CONFLICT."""
+    if bind.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif bind.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise ValueError(f"Upsert is not supported on {bind.dialect.name}")
+    return insert
+
+def upload_hash(frame, batch_size):
+    """
+    Content hash of an upload: the same rows pushed with the same batch size always get the
+    same checkpoint, and any change in the data gives a new one.
+
+    Args:
+        frame (pd.DataFrame): Result of mkt_lead_frame
+        batch_size (int): Rows per batch of the push
+
+    Returns:
+        str: sha256 hex digest
+    """
+    digest = hashlib.sha256(f"{MktLead.__tablename__}|{batch_size}|{','.join(frame.columns)}".encode())
+    digest.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+def _committed_batches(bind, checkpoint):
+    """
+    Batches of an upload already committed by an earlier push, 0 for a new upload.
+
+    push_checkpoints is created with the other tables by backend.database.create_tables.
+    """
+    table = PushCheckpoint.__table__
+    with bind.connect() as conn:
+        committed = conn.execute(select(table.c.committed_batches).where(table.c.upload_hash == checkpoint)).scalar()
+    return committed or 0
+
+def _save_checkpoint(conn, checkpoint, total_batches, committed_batches, committed_rows):
+    """Records the progress of an upload in the transaction of the batch it follows."""
+    table = PushCheckpoint.__table__
+    values = {"total_batches": total_batches, "committed_batches": committed_batches, "committed_rows": committed_rows}
+    stmt = _dialect_insert(conn)(table).values(upload_hash=checkpoint, table_name=MktLead.__tablename__, **values)
+    conn.execute(stmt.on_conflict_do_update(index_elements=[table.c.upload_hash], set_=values))
+
+def upsert_mkt_leads(rows, bind=None, batch_size=5000, checkpoint=None, on_batch=None):
+    """
+    Writes MktLead rows with INSERT ... ON CONFLICT (lead_id) DO UPDATE, one transaction
+    per batch. Each batch also recomputes the mkt_leads daily rollup of the days its rows
+    leave and enter, in the same transaction. The bucket of the leads without appointment
+    date is not a day but every such lead of the table, so it is recomputed once, after the
+    last batch, when any committed batch touched it.
+
+    With a checkpoint, every batch records the upload's progress in push_checkpoints in its
+    own transaction, and the push stops at the first failed batch. Pushing the same upload
+    again resumes from the first uncommitted batch, and the checkpoint is removed once
+    every batch is committed.
+
+    Args:
+        rows (list): Row dicts keyed by MktLead column, see mkt_lead_rows
+        bind: Engine to write to (the app engine by default)
+        batch_size (int): Rows per statement and transaction
+        checkpoint (str): Upload hash to resume from and record progress under, see upload_hash
+        on_batch (callable): Called with (finished batches, total batches) after every batch
+
+    Returns:
+        tuple: (stats, error_messages)
+            - stats (dict): processed, inserted, updated, errors and batches, plus the
+              resumed_rows skipped from an earlier push and the rows_per_second of each batch
+            - error_messages (list): One message per failed batch
+    """
+    bind = bind if bind is not None else engine
+    table = MktLead.__table__
+    stmt = _dialect_insert(bind)(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.lead_id],
+        set_={column.name: stmt.excluded[column.name] for column in table.columns if column.name != "lead_id"},
+    )
+
+    stats = {"processed": 0, "inserted": 0, "updated": 0, "errors": 0, "batches": 0, "resumed_rows": 0, "rows_per_second": []}
+    error_messages = []
+    total_batches = (len(rows) + batch_size - 1) // batch_size
+    first_batch = _committed_batches(bind, checkpoint) if checkpoint is not None else 0
+    if first_batch:
+        stats["resumed_rows"] = min(first_batch * batch_size, len(rows))
+        logging.info(f"Resuming upload {checkpoint[:12]} from batch {first_batch + 1}/{total_batches}")
+
+    # A resumed upload may have stopped before refreshing the undated bucket of its earlier batches
+    undated_touched = first_batch > 0
+    for batch_num in range(first_batch, total_batches):
+        start = batch_num * batch_size
+        batch = rows[start:start + batch_size]
+        ids = [row["lead_id"] for row in batch]
+        stats["processed"] += len(batch)
+        stats["batches"] += 1
+        started = time.perf_counter()
+        try:
+            with bind.begin() as conn:
+                days = rollup_days(conn, MktLead, ids)
+                existing = conn.execute(select(func.count()).select_from(table).where(table.c.lead_id.in_(ids))).scalar()
+                conn.execute(stmt, batch)
+                days |= rollup_days(conn, MktLead, ids)
+                refresh_rollups(conn, MktLead, days - {None})
+                if checkpoint is not None:
+                    _save_checkpoint(conn, checkpoint, total_batches, batch_num + 1, start + len(batch))
+            undated_touched = undated_touched or None in days
+            rows_per_second = len(batch) / max(time.perf_counter() - started, 1e-9)
+            stats["inserted"] += len(batch) - existing
+            stats["updated"] += existing
+            stats["rows_per_second"].append(round(rows_per_second))
+            logging.info(f"Upserted batch {batch_num + 1}/{total_batches}: {len(batch) - existing} inserted, {existing} updated, {rows_per_second:.0f} rows/s")
+            if on_batch is not None:
+                on_batch(batch_num + 1, total_batches)
+        except SQLAlchemyError as e:
+            stats["errors"] += len(batch)
+            error_message = f"Database error in batch {batch_num + 1}: {str(e)}"
+            error_messages.append(error_message)
+            logging.error(error_message)
+            if checkpoint is not None:
+                # Later batches are left for the retry, which resumes from this one
+                break
+
+    if undated_touched:
+        try:
+            with bind.begin() as conn:
+                refresh_rollups(conn, MktLead, {None})
+        except SQLAlchemyError as e:
+            error_message = f"Database error refreshing the rollup of leads without appointment: {str(e)}"
+            error_messages.append(error_message)
+            logging.error(error_message)
+
+    if checkpoint is not None and not error_messages:
+        with bind.begin() as conn:
+            conn.execute(PushCheckpoint.__table__.delete().where(PushCheckpoint.__table__.c.upload_hash == checkpoint))
+    return stats, error_messages
+
+
+def _copy_text(values):
+    """Column in COPY text format: backslash escapes and \\N for NULL."""
+    series = pd.Series(values, dtype=object)
+    missing = series.isna().to_numpy()
+    text = series.astype(str)
+    for char, escaped in (("\\", "\\\\"), ("\t", "\\t"), ("\n", "\\n"), ("\r", "\\r")):
+        text = text.str.replace(char, escaped, regex=False)
+    return np.where(missing, "\\N", text.to_numpy(dtype=object))
+
+def _copy_chunks(frame, chunk_rows):
+    """COPY text payloads of a mkt_lead_frame, chunk_rows lines at a time."""
+    for start in range(0, len(frame), chunk_rows):
+        chunk = frame.iloc[start:start + chunk_rows]
+        lines = pd.Series(_copy_text(chunk[chunk.columns[0]].to_numpy()), dtype=object)
+        for name in chunk.columns[1:]:
+            lines = lines + "\t" + _copy_text(chunk[name].to_numpy())
+        yield "\n".join(lines.tolist()) + "\n"
+
+def copy_mkt_leads(frame, bind=None, chunk_rows=50000, on_batch=None):
+    """
+    Loads a mkt_lead_frame with COPY into a staging table and merges it into mkt_leads with a
+    single INSERT ... SELECT ... ON CONFLICT (lead_id) DO UPDATE, all in one transaction
+    with the refresh of the mkt_leads daily rollup for the days the merged rows leave and enter.
+
+    The frame is streamed to the server chunk by chunk, so a backfill of many months costs
+    one round trip per chunk instead of one statement per batch of rows. On any other
+    database than PostgreSQL (SQLite in development) it falls back to upsert_mkt_leads.
+
+    Args:
+        frame (pd.DataFrame): Result of mkt_lead_frame
+        bind: Engine to write to (the app engine by default)
+        chunk_rows (int): Rows sent per COPY payload
+        on_batch (callable): Called with (finished steps, total steps) after every chunk and
+            after the merge
+
+    Returns:
+        tuple: (stats, error_messages), see upsert_mkt_leads
+    """
+    bind = bind if bind is not None else engine
+    if bind.dialect.name != "postgresql":
+        logging.info(f"COPY is not available on {bind.dialect.name}, falling back to batched upserts")
+        return upsert_mkt_leads(mkt_lead_rows(frame), bind=bind, on_batch=on_batch)
+
+    table = MktLead.__tablename__
+    columns = ", ".join(f'"{name}"' for name in frame.columns)
+    updates = ", ".join(f'"{name}" = EXCLUDED."{name}"' for name in frame.columns if name != "lead_id")
+    stats = {"processed": len(frame), "inserted": 0, "updated": 0, "errors": 0, "batches": 0}
+    total_steps = (len(frame) + chunk_rows - 1) // chunk_rows + 1
+
+    try:
+        with bind.begin() as conn:
+            # COPY goes through the DBAPI cursor, in the transaction of the connection
+            cursor = conn.connection.cursor()
+            cursor.execute(f"CREATE TEMP TABLE {table}_staging (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DROP")
+            for payload in _copy_chunks(frame, chunk_rows):
+                cursor.copy_expert(f"COPY {table}_staging ({columns}) FROM STDIN", io.StringIO(payload))
+                stats["batches"] += 1
+                logging.info(f"Copied chunk {stats['batches']} into {table}_staging")
+                if on_batch is not None:
+                    on_batch(stats["batches"], total_steps)
+            staged_ids = select(text("lead_id")).select_from(text(f"{table}_staging"))
+            days = rollup_days(conn, MktLead, staged_ids)
+            cursor.execute(
+                f"WITH merged AS ("
+                f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {table}_staging "
+                f"ON CONFLICT (lead_id) DO UPDATE SET {updates} RETURNING (xmax = 0) AS inserted"
+                f") SELECT count(*) FILTER (WHERE inserted), count(*) FROM merged"
+            )
+            inserted, merged = cursor.fetchone()
+            refresh_rollups(conn, MktLead, days | rollup_days(conn, MktLead, staged_ids))
+        stats["inserted"], stats["updated"] = inserted, merged - inserted
+        if on_batch is not None:
+            on_batch(total_steps, total_steps)
+        logging.info(f"Merged {merged} records into {table}: {inserted} inserted, {merged - inserted} updated")
+        return stats, []
+    except (SQLAlchemyError, bind.dialect.dbapi.Error) as e:
+        # COPY and the merge run on the DBAPI cursor, whose errors SQLAlchemy does not wrap
+        stats["errors"] = len(frame)
+        error_message = f"COPY load failed: {str(e)}"
+        logging.error(error_message)
+        return stats, [error_message]
+
+
+def _write_mkt_leads_orm(session, rows):
+    """
+    Inserts or updates MktLead rows through the session's bulk mappings, and recomputes the
+    mkt_leads daily rollup of the days the rows leave and enter.
+
+    Args:
+        session (Session): Open session, committed by the caller
+        rows (list): Row dicts keyed by MktLead column, see mkt_lead_rows
+
+    Returns:
+        tuple: (inserted, updated)
+    """
+    ids = [row["lead_id"] for row in rows]
+    days = rollup_days(session, MktLead, ids)
+    existing = {lead_id for (lead_id,) in session.query(MktLead.lead_id).filter(MktLead.lead_id.in_(ids))}
+    to_insert = [row for row in rows if row["lead_id"] not in existing]
+    to_update = [row for row in rows if row["lead_id"] in existing]
+    if to_insert:
+        session.bulk_insert_mappings(MktLead, to_insert)
+    if to_update:
+        session.bulk_update_mappings(MktLead, to_update)
+    session.flush()
+    refresh_rollups(session, MktLead, days | rollup_days(session, MktLead, ids))
+    return len(to_insert), len(to_update)
+
 def push_data_to_db(df_leads_with_purchases):
     """
     Process and push leads data to the database.
@@ -55,107 +408,18 @@ def push_data_to_db(df_leads_with_purchases):
     try:
         logging.info(f"Starting database push operation for {len(df_leads_with_purchases)} records")
         
-        # Begin a transaction
-        for _, row in df_leads_with_purchases.iterrows():
-            stats["processed"] += 1
-            
-            try:
-                # Check if lead already exists in database
-                lead_id = str(row.get("ID lead", ""))
-                if not lead_id:
-                    logging.warning(f"Skipping record with missing lead ID")
-                    stats["errors"] += 1
-                    continue
-                    
-                existing_lead = session.query(MktLead).filter_by(lead_id=lead_id).first()
-                
-                if existing_lead:
-                    logging.info(f"Updating existing lead with ID: {lead_id}")
-                    # Update existing lead
-                    existing_lead.lead_email = str(row.get("Email do lead", ""))
-                    existing_lead.lead_phone = str(row.get("Telefone do lead", ""))
-                    existing_lead.lead_message = str(row.get("Mensagem", ""))
-                    existing_lead.lead_store = str(row.get("Unidade do lead", ""))
-                    existing_lead.lead_source = str(row.get("Fonte", ""))
-                    existing_lead.lead_entry_day = row.get("Dia da entrada").day if row.get("Dia da entrada") else None
-                    existing_lead.lead_mkt_source = str(row.get("Source", ""))
-                    existing_lead.lead_mkt_medium = str(row.get("Medium", ""))
-                    existing_lead.lead_mkt_term = str(row.get("Term", ""))
-                    existing_lead.lead_mkt_content = str(row.get("Content", ""))
-                    existing_lead.lead_mkt_campaign = str(row.get("Campaign", ""))
-                    existing_lead.lead_month = str(row.get("Mês do lead", ""))
-                    existing_lead.lead_category = str(row.get("Categoria", ""))
-                    
-                    # Appointment data
-                    existing_lead.appointment_date = clean_datetime(row.get("Data Na Agenda"))
-                    existing_lead.appointment_procedure = str(row.get("Procedimento", ""))
-                    existing_lead.appointment_status = str(row.get("Status Agenda", ""))
-                    existing_lead.appointment_store = str(row.get("Unidade da Agenda", ""))
-                    
-                    # Sales data
-                    existing_lead.sale_cleaned_phone = str(row.get("Telefones Limpos", ""))
-                    existing_lead.sales_phone = str(row.get("Telefone(s) do cliente", ""))
-                    existing_lead.sales_quote_id = str(row.get("ID orçamento", ""))
-                    existing_lead.sales_date = clean_datetime(row.get("Data Venda"))
-                    existing_lead.sales_store = str(row.get("Unidade da Venda", ""))
-                    existing_lead.sales_first_quote = str(row.get("Valor primeiro orçamento", ""))
-                    existing_lead.sales_total_bought = str(row.get("Total comprado pelo cliente", ""))
-                    existing_lead.sales_number_of_quotes = str(row.get("Número de orçamentos do cliente", ""))
-                    existing_lead.sales_day = row.get("Dia") if isinstance(row.get("Dia"), int) else None
-                    existing_lead.sales_month = str(row.get("Mês da Venda", ""))
-                    existing_lead.sales_day_of_week = str(row.get("Dia da Semana", ""))
-                    existing_lead.sales_purchased = bool(row.get("comprou", False))
-                    existing_lead.sales_interval = row.get("intervalo da compra") if row.get("intervalo da compra") else None
-                    
-                    stats["updated"] += 1
-                else:
-                    logging.info(f"Creating new lead with ID: {lead_id}")
-                    # Create new lead record
-                    new_lead = MktLead(
-                        lead_id=lead_id,
-                        lead_email=str(row.get("Email do lead", "")),
-                        lead_phone=str(row.get("Telefone do lead", "")),
-                        lead_message=str(row.get("Mensagem", "")),
-                        lead_store=str(row.get("Unidade do lead", "")),
-                        lead_source=str(row.get("Fonte", "")),
-                        lead_entry_day=row.get("Dia da entrada").day if row.get("Dia da entrada") else None,
-                        lead_mkt_source=str(row.get("Source", "")),
-                        lead_mkt_medium=str(row.get("Medium", "")),
-                        lead_mkt_term=str(row.get("Term", "")),
-                        lead_mkt_content=str(row.get("Content", "")),
-                        lead_mkt_campaign=str(row.get("Campaign", "")),
-                        lead_month=str(row.get("Mês do lead", "")),
-                        lead_category=str(row.get("Categoria", "")),
-                        
-                        # Appointment data
-                        appointment_date=clean_datetime(row.get("Data Na Agenda")),
-                        appointment_procedure=str(row.get("Procedimento", "")),
-                        appointment_status=str(row.get("Status Agenda", "")),
-                        appointment_store=str(row.get("Unidade da Agenda", "")),
-                        
-                        # Sales data
-                        sale_cleaned_phone=str(row.get("Telefones Limpos", "")),
-                        sales_phone=str(row.get("Telefone(s) do cliente", "")),
-                        sales_quote_id=str(row.get("ID orçamento", "")),
-                        sales_date=clean_datetime(row.get("Data Venda")),
-                        sales_store=str(row.get("Unidade da Venda", "")),
-                        sales_first_quote=str(row.get("Valor primeiro orçamento", "")),
-                        sales_total_bought=str(row.get("Total comprado pelo cliente", "")),
-                        sales_number_of_quotes=str(row.get("Número de orçamentos do cliente", "")),
-                        sales_day=row.get("Dia") if isinstance(row.get("Dia"), int) else None,
-                        sales_month=str(row.get("Mês da Venda", "")),
-                        sales_day_of_week=str(row.get("Dia da Semana", "")),
-                        sales_purchased=bool(row.get("comprou", False)),
-                        sales_interval=row.get("intervalo da compra") if row.get("intervalo da compra") else None
-                    )
-                    session.add(new_lead)
-                    stats["inserted"] += 1
-                    logging.info(f"Count updated: {stats['processed']}")
-                    
-            except Exception as e:
-                logging.error(f"Error processing record {stats['processed']}: {str(e)}")
-                stats["errors"] += 1
-                continue
+        frame, missing_ids = mkt_lead_frame(df_leads_with_purchases)
+        if missing_ids:
+            logging.warning(f"Skipping {missing_ids} records with missing lead ID")
+        rows = mkt_lead_rows(frame)
+        stats["processed"] = len(rows) + missing_ids
+        stats["errors"] = missing_ids
+
+        # One transaction, existing leads looked up 2000 IDs at a time
+        for start in range(0, len(rows), 2000):
+            inserted, updated = _write_mkt_leads_orm(session, rows[start:start + 2000])
+            stats["inserted"] += inserted
+            stats["updated"] += updated
                 
         # Commit the transaction
         session.commit()
@@ -220,28 +484,41 @@ def save_data_to_db(df_leads_with_purchases):
     
     return success, user_message
 
-def save_data_to_db_batch(df_leads_with_purchases):
+def save_data_to_db_batch(df_leads_with_purchases, mode="upsert", on_batch=None):
     """
     Batch processing version that handles large datasets more efficiently.
     Processes records in chunks rather than one by one, significantly improving performance.
     
     Args:
         df_leads_with_purchases (pd.DataFrame): DataFrame containing leads, appointments, and sales data
+        mode (str): "upsert" sends INSERT ... ON CONFLICT batches (see upsert_mkt_leads),
+            "copy" streams the data through COPY and merges it on the server (see
+            copy_mkt_leads, meant for backfills), "orm" goes through MktLead objects
+        on_batch (callable): Progress callback, called with (finished batches, total batches)
         
     Returns:
         tuple: (success_flag, user_message)
     """
     if df_leads_with_purchases is None or df_leads_with_purchases.empty:
         return False, "No data to save. Please process the data first."
+
+    if mode in ("upsert", "copy"):
+        return _save_data_to_db_bulk(df_leads_with_purchases, mode, on_batch=on_batch)
+    if mode != "orm":
+        raise ValueError(f"Unknown save mode: {mode}")
     
     batch_size = 2000
-    total_records = len(df_leads_with_purchases)
+    frame, missing_ids = mkt_lead_frame(df_leads_with_purchases)
+    rows = mkt_lead_rows(frame)
+    total_records = len(rows)
     total_batches = (total_records + batch_size - 1) // batch_size
 
-    stats = {"processed": 0, "inserted": 0, "updated": 0, "errors": 0}
+    stats = {"processed": missing_ids, "inserted": 0, "updated": 0, "errors": missing_ids}
     overall_success = True
     error_messages = []
 
+    if missing_ids:
+        logging.warning(f"Skipping {missing_ids} records with missing lead ID")
     logging.info(f"Start batch processing: {total_records} records, {total_batches} batches with {batch_size} records per batch")
 
     session = SessionLocal()
@@ -249,144 +526,24 @@ def save_data_to_db_batch(df_leads_with_purchases):
     try:
         # Process data in batches
         for batch_num in range(total_batches):
-            start_idx = batch_num * batch_size
-            end_idx = min(start_idx + batch_size, total_records)
-            current_batch = df_leads_with_purchases.iloc[start_idx:end_idx]
-
-            logging.info(f"Processing batch {batch_num + 1} of {total_batches}")
-
-            to_insert = []
-            to_update = []
-            
-            lead_ids = [str(row.get("ID lead", "")) for _, row in current_batch.iterrows() if row.get("ID lead", "")]
-            existing_leads = {lead.lead_id: lead for lead in session.query(MktLead).filter(MktLead.lead_id.in_(lead_ids)).all()}
-
-            for _, row in current_batch.iterrows():
-                stats["processed"] += 1
-
-                try:
-                    lead_id = str(row.get("ID lead", ""))
-                    if not lead_id:
-                        logging.warning(f"Skipping record with missing lead ID")
-                        stats["errors"] += 1
-                        continue
-
-                     # Check if lead exists
-                    if lead_id in existing_leads:
-                        # Update existing lead
-                        existing_lead = existing_leads[lead_id]
-                        logging.info(f"Updating existing lead with ID: {lead_id}")
-                        
-                        # Update fields
-                        existing_lead.lead_email = str(row.get("Email do lead", ""))
-                        existing_lead.lead_phone = str(row.get("Telefone do lead", ""))
-                        existing_lead.lead_message = str(row.get("Mensagem", ""))
-                        existing_lead.lead_store = str(row.get("Unidade do lead", ""))
-                        existing_lead.lead_source = str(row.get("Fonte", ""))
-                        existing_lead.lead_entry_day = row.get("Dia da entrada").day if row.get("Dia da entrada") else None
-                        existing_lead.lead_mkt_source = str(row.get("Source", ""))
-                        existing_lead.lead_mkt_medium = str(row.get("Medium", ""))
-                        existing_lead.lead_mkt_term = str(row.get("Term", ""))
-                        existing_lead.lead_mkt_content = str(row.get("Content", ""))
-                        existing_lead.lead_mkt_campaign = str(row.get("Campaign", ""))
-                        existing_lead.lead_month = str(row.get("Mês do lead", ""))
-                        existing_lead.lead_category = str(row.get("Categoria", ""))
-                        
-                        # Appointment data
-                        existing_lead.appointment_date = clean_datetime(row.get("Data Na Agenda"))
-                        existing_lead.appointment_procedure = str(row.get("Procedimento", ""))
-                        existing_lead.appointment_status = str(row.get("Status Agenda", ""))
-                        existing_lead.appointment_store = str(row.get("Unidade da Agenda", ""))
-                        
-                        # Sales data
-                        existing_lead.sale_cleaned_phone = str(row.get("Telefones Limpos", ""))
-                        existing_lead.sales_phone = str(row.get("Telefone(s) do cliente", ""))
-                        existing_lead.sales_quote_id = str(row.get("ID orçamento", ""))
-                        existing_lead.sales_date = clean_datetime(row.get("Data Venda"))
-                        existing_lead.sales_store = str(row.get("Unidade da Venda", ""))
-                        existing_lead.sales_first_quote = str(row.get("Valor primeiro orçamento", ""))
-                        existing_lead.sales_total_bought = str(row.get("Total comprado pelo cliente", ""))
-                        existing_lead.sales_number_of_quotes = str(row.get("Número de orçamentos do cliente", ""))
-                        existing_lead.sales_day = row.get("Dia") if isinstance(row.get("Dia"), int) else None
-                        existing_lead.sales_month = str(row.get("Mês da Venda", ""))
-                        existing_lead.sales_day_of_week = str(row.get("Dia da Semana", ""))
-                        existing_lead.sales_purchased = bool(row.get("comprou", False))
-                        existing_lead.sales_interval = row.get("intervalo da compra") if row.get("intervalo da compra") else None
-                        
-                        to_update.append(existing_lead)
-                        stats["updated"] += 1
-                    else:
-                        # Create new lead
-                        logging.info(f"Creating new lead with ID: {lead_id}")
-                        new_lead = MktLead(
-                            lead_id=lead_id,
-                            lead_email=str(row.get("Email do lead", "")),
-                            lead_phone=str(row.get("Telefone do lead", "")),
-                            lead_message=str(row.get("Mensagem", "")),
-                            lead_store=str(row.get("Unidade do lead", "")),
-                            lead_source=str(row.get("Fonte", "")),
-                            lead_entry_day=row.get("Dia da entrada").day if row.get("Dia da entrada") else None,
-                            lead_mkt_source=str(row.get("Source", "")),
-                            lead_mkt_medium=str(row.get("Medium", "")),
-                            lead_mkt_term=str(row.get("Term", "")),
-                            lead_mkt_content=str(row.get("Content", "")),
-                            lead_mkt_campaign=str(row.get("Campaign", "")),
-                            lead_month=str(row.get("Mês do lead", "")),
-                            lead_category=str(row.get("Categoria", "")),
-                            
-                            # Appointment data
-                            appointment_date=clean_datetime(row.get("Data Na Agenda")),
-                            appointment_procedure=str(row.get("Procedimento", "")),
-                            appointment_status=str(row.get("Status Agenda", "")),
-                            appointment_store=str(row.get("Unidade da Agenda", "")),
-                            
-                            # Sales data
-                            sale_cleaned_phone=str(row.get("Telefones Limpos", "")),
-                            sales_phone=str(row.get("Telefone(s) do cliente", "")),
-                            sales_quote_id=str(row.get("ID orçamento", "")),
-                            sales_date=clean_datetime(row.get("Data Venda")),
-                            sales_store=str(row.get("Unidade da Venda", "")),
-                            sales_first_quote=str(row.get("Valor primeiro orçamento", "")),
-                            sales_total_bought=str(row.get("Total comprado pelo cliente", "")),
-                            sales_number_of_quotes=str(row.get("Número de orçamentos do cliente", "")),
-                            sales_day=row.get("Dia") if isinstance(row.get("Dia"), int) else None,
-                            sales_month=str(row.get("Mês da Venda", "")),
-                            sales_day_of_week=str(row.get("Dia da Semana", "")),
-                            sales_purchased=bool(row.get("comprou", False)),
-                            sales_interval=row.get("intervalo da compra") if row.get("intervalo da compra") else None
-                        )
-                        to_insert.append(new_lead)
-                        stats["inserted"] += 1
-                        logging.info(f"Count updated: {stats['processed']}")
-                
-                except Exception as e:
-                    logging.error(f"Error processing record {stats['processed']} in batch {batch_num+1}: {str(e)}")
-                    stats["errors"] += 1
-                    continue
+            current_batch = rows[batch_num * batch_size:(batch_num + 1) * batch_size]
+            stats["processed"] += len(current_batch)
+
             try:
-                # Bulk insert new records
-                if to_insert:
-                    logging.info(f"Preparing {len(to_insert)} records for bulk insert in batch {batch_num+1}")
-                    # Clean all datetime fields before bulk insert
-                    for obj in to_insert:
-                        obj.appointment_date = clean_datetime(obj.appointment_date)
-                        obj.sales_date = clean_datetime(obj.sales_date)
-                    
-                    # Now perform the bulk insert with clean datetime values
-                    session.bulk_save_objects(to_insert)
-                    logging.info(f"Bulk inserted {len(to_insert)} new records in batch {batch_num+1}")
-                
-                # For updates, we've already modified the objects in the session
-                if to_update:
-                    logging.info(f"Updated {len(to_update)} existing records in batch {batch_num+1}")
+                inserted, updated = _write_mkt_leads_orm(session, current_batch)
                 
                 # Commit batch
                 session.commit()
-                logging.info(f"Committed batch {batch_num+1}/{total_batches}")
+                stats["inserted"] += inserted
+                stats["updated"] += updated
+                logging.info(f"Committed batch {batch_num+1}/{total_batches}: {inserted} inserted, {updated} updated")
+                if on_batch is not None:
+                    on_batch(batch_num + 1, total_batches)
                 
             except SQLAlchemyError as e:
                 session.rollback()
                 overall_success = False
+                stats["errors"] += len(current_batch)
                 error_message = f"Database error in batch {batch_num+1}: {str(e)}"
                 error_messages.append(error_message)
                 logging.error(error_message)
@@ -394,6 +551,7 @@ def save_data_to_db_batch(df_leads_with_purchases):
             except Exception as e:
                 session.rollback()
                 overall_success = False
+                stats["errors"] += len(current_batch)
                 error_message = f"Unexpected error in batch {batch_num+1}: {str(e)}"
                 error_messages.append(error_message)
                 logging.error(error_message)
@@ -408,6 +566,20 @@ def save_data_to_db_batch(df_leads_with_purchases):
     finally:
         session.close()
     
+    return overall_success, _batch_user_message(overall_success, stats, total_batches, batch_size, error_messages)
+
+def _push_progress_lines(stats):
+    """Summary lines about resumed pushes and throughput, empty for the ORM mode."""
+    lines = ""
+    if stats.get("resumed_rows"):
+        lines += f"\n        - Resumed after {stats['resumed_rows']} records saved by an earlier push"
+    if stats.get("rows_per_second"):
+        rates = stats["rows_per_second"]
+        lines += f"\n        - Throughput: {sum(rates) // len(rates)} rows/s on average ({min(rates)} to {max(rates)} per batch)"
+    return lines
+
+def _batch_user_message(overall_success, stats, total_batches, batch_size, error_messages):
+    """Status message of a batch save for the user interface."""
     # Generate final message
     if overall_success:
         message = f"Successfully processed {stats['processed']} records in {total_batches} batches: {stats['inserted']} inserted, {stats['updated']} updated, {stats['errors']} errors"
@@ -422,7 +594,7 @@ def save_data_to_db_batch(df_leads_with_purchases):
         - Existing records updated: {stats['updated']}
         - Errors encountered: {stats['errors']}
         - Number of batches: {total_batches}
-        - Batch size: {batch_size}
+        - Batch size: {batch_size}{_push_progress_lines(stats)}
         """
     else:
         message = "Batch processing encountered errors: " + "; ".join(error_messages)
@@ -436,7 +608,7 @@ def save_data_to_db_batch(df_leads_with_purchases):
         - New records added: {stats['inserted']}
         - Existing records updated: {stats['updated']}
         - Errors encountered: {stats['errors']}
-        - Number of batches: {total_batches}
+        - Number of batches: {total_batches}{_push_progress_lines(stats)}
         
         **Error Details:**
         ```
@@ -446,7 +618,23 @@ def save_data_to_db_batch(df_leads_with_purchases):
         Some data may have been saved. Please check your database.
         """
     
-    return overall_success, user_message
+    return user_message
+
+def _save_data_to_db_bulk(df_leads_with_purchases, mode, batch_size=5000, on_batch=None):
+    """Upsert and copy modes of save_data_to_db_batch."""
+    frame, missing_ids = mkt_lead_frame(df_leads_with_purchases)
+    if missing_ids:
+        logging.warning(f"Skipping {missing_ids} records with missing lead ID")
+
+    logging.info(f"Start {mode}: {len(frame)} records")
+    if mode == "copy":
+        stats, error_messages = copy_mkt_leads(frame, on_batch=on_batch)
+    else:
+        stats, error_messages = upsert_mkt_leads(mkt_lead_rows(frame), batch_size=batch_size, checkpoint=upload_hash(frame, batch_size), on_batch=on_batch)
+    stats["processed"] += missing_ids
+    stats["errors"] += missing_ids
+    overall_success = not error_messages
+    return overall_success, _batch_user_message(overall_success, stats, stats["batches"], batch_size, error_messages)
 
 def extract_agendamentos(status_dict):
     """
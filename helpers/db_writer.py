@@ -0,0 +1,134 @@
+"""
+db_writer.py
+runs the mkt_leads pushes on a background thread, so the Streamlit script never waits for the database.
+
+The page submits a push and keeps the returned job id in st.session_state; every rerun (or
+fragment refresh) reads the job's progress back with job_status. The pool outlives the
+script reruns because it lives in this module. Pushes are written one at a time in the
+order they were submitted: they all write mkt_leads, so two at once would only contend for
+the same table (and SQLite takes a single writer anyway).
+"""
+
+import uuid
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from helpers.data_wrestler import save_data_to_db_batch
+
+class PushJob:
+    """
+    State of one background push, updated by the worker thread and read by the page.
+
+    Args:
+        job_id: Id returned to the page
+        label: Name shown next to the progress bar
+        total_records: Rows of the pushed DataFrame
+    """
+
+    def __init__(self, job_id, label, total_records):
+        self.job_id = job_id
+        self.label = label
+        self.total_records = total_records
+        self.status = "queued"
+        self.finished_batches = 0
+        self.total_batches = 0
+        self.message = ""
+        self.submitted_at = time.time()
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    def _start(self):
+        with self._lock:
+            self.status = "running"
+
+    def _on_batch(self, finished_batches, total_batches):
+        with self._lock:
+            self.finished_batches, self.total_batches = finished_batches, total_batches
+
+    def _finish(self, status, message):
+        with self._lock:
+            self.status, self.message, self.finished_at = status, message, time.time()
+
+    def snapshot(self):
+        """Consistent copy of the job state as a dict (status, progress, message...)."""
+        with self._lock:
+            progress = self.finished_batches / self.total_batches if self.total_batches else float(self.status in ("done", "failed"))
+            return {
+                "job_id": self.job_id,
+                "label": self.label,
+                "status": self.status,
+                "progress": progress,
+                "finished_batches": self.finished_batches,
+                "total_batches": self.total_batches,
+                "total_records": self.total_records,
+                "message": self.message,
+                "elapsed": (self.finished_at or time.time()) - self.submitted_at,
+            }
+
+class BackgroundWriter:
+    """
+    Thread-pool job queue for database pushes.
+
+    Args:
+        max_workers: Pushes written at the same time, the others wait in the queue. Keep 1 unless
+            the database takes concurrent writers to mkt_leads without lock waits
+        max_finished_jobs: Finished jobs kept for the page to read, oldest dropped first
+    """
+
+    def __init__(self, max_workers=1, max_finished_jobs=50):
+        self.max_finished_jobs = max_finished_jobs
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db-writer")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, df_leads_with_purchases, label=None, mode="upsert"):
+        """
+        Queues a push of the funnel DataFrame (see save_data_to_db_batch).
+
+        Args:
+            df_leads_with_purchases: DataFrame to push, copied so the page can keep changing its own
+            label: Name shown next to the progress bar
+            mode: Save mode of save_data_to_db_batch
+
+        Returns:
+            Job id to poll with job_status
+        """
+        job = PushJob(uuid.uuid4().hex, label or f"{len(df_leads_with_purchases)} leads", len(df_leads_with_purchases))
+        with self._lock:
+            self._forget_finished()
+            self._jobs[job.job_id] = job
+        self._executor.submit(self._run, job, df_leads_with_purchases.copy(), mode)
+        logging.info(f"Queued database push {job.job_id} ({job.label})")
+        return job.job_id
+
+    def _run(self, job, df_leads_with_purchases, mode):
+        job._start()
+        try:
+            success, message = save_data_to_db_batch(df_leads_with_purchases, mode=mode, on_batch=job._on_batch)
+            job._finish("done" if success else "failed", message)
+        except Exception as e:
+            logging.error(f"Database push {job.job_id} failed: {str(e)}")
+            job._finish("failed", f"Erro ao salvar dados: {str(e)}")
+
+    def _forget_finished(self):
+        finished = [job for job in self._jobs.values() if job.finished_at is not None]
+        for job in sorted(finished, key=lambda job: job.finished_at)[:max(0, len(finished) - self.max_finished_jobs)]:
+            del self._jobs[job.job_id]
+
+    def job_status(self, job_id):
+        """Snapshot of a job (see PushJob.snapshot), None when the id is unknown."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        return job.snapshot() if job is not None else None
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def get_writer():
+    """Writer shared by every session and rerun of the app."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = BackgroundWriter()
+        return _writer
@@ -0,0 +1,139 @@
+"""
+identity.py
+groups leads, appointments and sales into customers by the telephones, emails and CPFs they share.
+
+Every record contributes its identity keys ('phone:11999990000', 'email:ana@x.com',
+'cpf:12345678900'). Keys of the same record belong to the same person, and a union-find
+over the keys of all the frames joins records that share any key, even through a chain
+(a lead's email on an appointment whose telephone is on a sale). Each group gets a stable
+customer key, the smallest key it contains, so frames can be joined with one hash join.
+"""
+
+import numpy as np
+import pandas as pd
+from helpers.cleaner import explode_telephones
+
+# Records a key may appear on before it is taken for a placeholder shared by unrelated
+# people (a reception telephone or email typed in for walk-ins). Above a month of funnel
+# records of one real customer, far below what a placeholder collects.
+MAX_KEY_RECORDS = 50
+
+def _as_columns(columns):
+    if columns is None:
+        return []
+    return [columns] if isinstance(columns, str) else list(columns)
+
+def _normalize_emails(emails):
+    emails = emails.dropna().astype(str).str.strip().str.lower()
+    return emails[emails.str.contains('@', regex=False)]
+
+def _normalize_taxvats(taxvats):
+    taxvats = taxvats.dropna().astype(str).str.replace(r'\D', '', regex=True)
+    valid = taxvats.str.len().isin([11, 14]) & ~taxvats.str.fullmatch(r'(\d)\1*')
+    return taxvats[valid]
+
+def record_keys(df, phones=None, emails=None, taxvats=None):
+    """
+    Identity keys of every record of a frame.
+
+    Args:
+        df: Leads, appointments or sales
+        phones: Column(s) with telephones, multi-number fields are split
+        emails: Column(s) with emails, compared lowercase (values without '@' are ignored)
+        taxvats: Column(s) with CPF/CNPJ, compared on digits
+
+    Returns:
+        Series of keys indexed by the row position in df (a position repeats for every key)
+    """
+    rows = df.reset_index(drop=True)
+    keys = []
+    for column in _as_columns(phones):
+        numbers = explode_telephones(rows[column], canonical=True)
+        valid = (numbers.str.len() >= 8) & ~numbers.str.fullmatch(r'(\d)\1*')
+        keys.append('phone:' + numbers[valid])
+    for column in _as_columns(emails):
+        keys.append('email:' + _normalize_emails(rows[column]))
+    for column in _as_columns(taxvats):
+        keys.append('cpf:' + _normalize_taxvats(rows[column]))
+    if not keys:
+        return pd.Series(dtype=object)
+    return pd.concat(keys).astype(object)
+
+class IdentityIndex:
+    """
+    Union-find over identity keys.
+
+    Args:
+        max_key_records: Keys found on more records than this are ignored as placeholders
+            (e.g. a store telephone typed in for every walk-in), None keeps every key
+    """
+
+    def __init__(self, max_key_records=MAX_KEY_RECORDS):
+        self.max_key_records = max_key_records
+
+    @staticmethod
+    def _find(parent, node):
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    def resolve(self, keys_by_frame):
+        """
+        Customer key of every record of several frames.
+
+        Args:
+            keys_by_frame: List of record_keys results, one per frame
+
+        Returns:
+            List of {row position: customer key} dicts, one per frame. Records without keys
+            are left out.
+        """
+        frame_ids = np.concatenate([np.full(len(keys), frame, dtype=np.int64) for frame, keys in enumerate(keys_by_frame)])
+        rows = np.concatenate([keys.index.to_numpy(dtype=np.int64) for keys in keys_by_frame])
+        values = np.concatenate([keys.to_numpy(dtype=object) for keys in keys_by_frame])
+        records = pd.DataFrame({'frame': frame_ids, 'row': rows, 'key': values}).drop_duplicates()
+
+        if self.max_key_records is not None and len(records):
+            counts = records['key'].map(records['key'].value_counts())
+            records = records[counts <= self.max_key_records]
+        if records.empty:
+            return [{} for _ in keys_by_frame]
+
+        codes, uniques = pd.factorize(records['key'])
+        records = records.assign(code=codes)
+        parent = list(range(len(uniques)))
+
+        # Every key of a record is joined to the record's first key
+        first_code = records.groupby(['frame', 'row'], sort=False)['code'].transform('first').to_numpy()
+        for first, code in zip(first_code.tolist(), codes.tolist()):
+            root_a, root_b = self._find(parent, first), self._find(parent, code)
+            if root_a != root_b:
+                parent[max(root_a, root_b)] = min(root_a, root_b)
+
+        roots = np.fromiter((self._find(parent, code) for code in range(len(uniques))), dtype=np.int64, count=len(uniques))
+        labels = pd.Series(uniques.astype(object)).groupby(roots).transform('min').to_numpy()
+
+        records = records.assign(customer=labels[first_code]).drop_duplicates(['frame', 'row'])
+        customers_by_frame = [{} for _ in keys_by_frame]
+        for frame, row, customer in zip(records['frame'].tolist(), records['row'].tolist(), records['customer'].tolist()):
+            customers_by_frame[frame][row] = customer
+        return customers_by_frame
+
+def resolve_customers(frames, max_key_records=MAX_KEY_RECORDS):
+    """
+    Customer key of every row of several frames.
+
+    Args:
+        frames: List of (df, {'phones': ..., 'emails': ..., 'taxvats': ...}) pairs, see record_keys
+        max_key_records: See IdentityIndex
+
+    Returns:
+        List of Series indexed like each df, with None for rows without identity keys
+    """
+    keys_by_frame = [record_keys(df, **columns) for df, columns in frames]
+    customers_by_frame = IdentityIndex(max_key_records).resolve(keys_by_frame)
+    return [
+        pd.Series([customers.get(position) for position in range(len(df))], index=df.index, dtype=object)
+        for (df, _), customers in zip(frames, customers_by_frame)
+    ]
@@ -0,0 +1,40 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import pytest
+from apiCrm.resolvers.dashboard.fetch_appointmentReport import (
+    build_appointments_query,
+    process_appointments_data,
+    resolve_appointment_columns,
+)
+
+def test_projected_query_only_selects_needed_fields():
+    query = build_appointments_query(['Status', 'Unidade do agendamento'], 'createdAtRange')
+
+    assert 'createdAtRange: { start: $start, end: $end }' in query
+    for field in ('id', 'status {', 'label', 'store {', 'name'):
+        assert field in query
+    for field in ('afterPhotoUrl', 'latestProgressComment', 'oldestParent', 'customer', 'comments'):
+        assert field not in query
+
+def test_full_query_keeps_every_field():
+    query = build_appointments_query()
+
+    for field in ('afterPhotoUrl', 'latestProgressComment', 'oldestParent', 'telephones', 'endDate', 'code'):
+        assert field in query
+    assert 'startDateRange' in query
+
+def test_columns_always_include_the_id_and_reject_unknown_names():
+    assert resolve_appointment_columns(['Status', 'ID agendamento']) == ['ID agendamento', 'Status']
+    assert resolve_appointment_columns(None) is None
+    with pytest.raises(ValueError):
+        resolve_appointment_columns(['Status', 'Cor favorita'])
+
+def test_transform_handles_a_projected_payload():
+    rows = process_appointments_data(
+        [{'id': 7, 'status': {'label': 'Agendado'}, 'createdBy': {'name': 'Ana'}}],
+        ['ID agendamento', 'Status', 'Nome da primeira atendente'],
+    )
+
+    assert rows == [{'ID agendamento': 7, 'Status': 'Agendado', 'Nome da primeira atendente': 'Ana'}]
@@ -0,0 +1,38 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import asyncio
+from apiCrm.resolvers.client_session import CrmClientManager
+
+def test_session_is_shared_across_asyncio_run_calls():
+    manager = CrmClientManager(limit_per_host=5)
+    try:
+        async def grab(session):
+            return session
+
+        first = asyncio.run(manager.run(grab))
+        second = asyncio.run(manager.run(grab))
+
+        assert first is second
+        assert not first.closed
+        assert first.connector.limit_per_host == 5
+    finally:
+        manager.close()
+
+def test_close_allows_a_fresh_session():
+    manager = CrmClientManager()
+
+    async def grab(session):
+        return session
+
+    first = asyncio.run(manager.run(grab))
+    manager.close()
+    assert first.closed
+
+    second = asyncio.run(manager.run(grab))
+    try:
+        assert second is not first
+        assert not second.closed
+    finally:
+        manager.close()
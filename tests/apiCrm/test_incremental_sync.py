@@ -0,0 +1,146 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import pytest
+import pyarrow as pa
+from apiCrm.resolvers.incremental_sync import SnapshotStore, fetch_incremental, merge_changes
+from apiCrm.resolvers.paginator import _record_failure
+from apiCrm.resolvers.sharding import fetch_sharded
+
+def test_merge_changes_updates_moves_and_drops():
+    partitions = {
+        '2024-01-02': pa.Table.from_pylist([{'id': 1, 'Data': '2024-01-02 10:00', 'Status': 'Agendado'}]),
+        '2024-01-03': pa.Table.from_pylist([
+            {'id': 2, 'Data': '2024-01-03 10:00', 'Status': 'Agendado'},
+            {'id': 5, 'Data': '2024-01-03 11:00', 'Status': 'Agendado'},
+        ]),
+    }
+    changes = pa.Table.from_pylist([
+        {'id': 1, 'Data': '2024-01-02 10:00', 'Status': 'Atendido'},
+        {'id': 2, 'Data': '2024-02-10 10:00', 'Status': 'Agendado'},  # rescheduled out of the range
+        {'id': 5, 'Data': '2024-01-04 09:00', 'Status': 'Agendado'},  # moved to a day without snapshot
+        {'id': 4, 'Data': '2024-03-01 09:00', 'Status': 'Agendado'},  # never belonged to the range
+    ])
+
+    merged = merge_changes(partitions, changes, 'id', 'Data', ['2024-01-02', '2024-01-03', '2024-01-04'])
+
+    assert {day: [(row['id'], row['Status']) for row in table.to_pylist()] for day, table in merged.items()} == {
+        '2024-01-02': [(1, 'Atendido')],
+        '2024-01-03': [],
+        '2024-01-04': [(5, 'Agendado')],
+    }
+
+@pytest.mark.asyncio
+async def test_second_load_only_fetches_the_delta(tmp_path):
+    store = SnapshotStore(root=tmp_path)
+    calls = []
+
+    async def fetch_full(start, end):
+        calls.append(('full', start, end))
+        return [{'id': 1, 'Data': '2024-01-02 10:00', 'Status': 'Agendado'}]
+
+    async def fetch_updated(start, end):
+        calls.append(('delta', start, end))
+        return [{'id': 1, 'Data': '2024-01-02 10:00', 'Status': 'Atendido'}]
+
+    args = ('appointmentsReport', fetch_full, fetch_updated, '2024-01-01', '2024-01-31')
+    first = await fetch_incremental(*args, id_key='id', date_key='Data', store=store)
+    second = await fetch_incremental(*args, id_key='id', date_key='Data', store=store)
+
+    assert [call[0] for call in calls] == ['full', 'delta']
+    assert first[0]['Status'] == 'Agendado'
+    assert second[0]['Status'] == 'Atendido'
+
+@pytest.mark.asyncio
+async def test_failed_delta_falls_back_to_full_fetch(tmp_path):
+    store = SnapshotStore(root=tmp_path)
+    calls = []
+
+    async def fetch_full(start, end):
+        calls.append('full')
+        return [{'id': 1, 'Data': '2024-01-02 10:00'}]
+
+    async def fetch_updated(start, end):
+        calls.append('delta')
+        _record_failure('appointmentsReport', 1)
+        return []
+
+    args = ('appointmentsReport', fetch_full, fetch_updated, '2024-01-01', '2024-01-31')
+    await fetch_incremental(*args, id_key='id', date_key='Data', store=store)
+    rows = await fetch_incremental(*args, id_key='id', date_key='Data', store=store)
+
+    assert calls == ['full', 'delta', 'full']
+    assert rows == [{'id': 1, 'Data': '2024-01-02 10:00'}]
+
+@pytest.mark.asyncio
+async def test_dataframe_output(tmp_path):
+    store = SnapshotStore(root=tmp_path)
+
+    async def fetch_full(start, end):
+        return [{'id': 1, 'Data': '2024-01-02 10:00'}, {'id': 2, 'Data': '2024-01-03 10:00'}]
+
+    async def fetch_updated(start, end):
+        return [{'id': 2, 'Data': '2024-01-05 10:00'}]
+
+    args = ('appointmentsReport', fetch_full, fetch_updated, '2024-01-01', '2024-01-31')
+    await fetch_incremental(*args, id_key='id', date_key='Data', store=store)
+    df = await fetch_incremental(*args, id_key='id', date_key='Data', store=store, output='dataframe')
+
+    assert df.to_dict('list') == {'id': [1, 2], 'Data': ['2024-01-02 10:00', '2024-01-05 10:00']}
+
+@pytest.mark.asyncio
+async def test_growing_range_reuses_the_stored_days(tmp_path):
+    store = SnapshotStore(root=tmp_path)
+    calls = []
+
+    async def fetch_full(start, end):
+        calls.append(('full', start, end))
+        return [{'id': day, 'Data': f"{day} 10:00"} for day in ('2024-01-01', '2024-01-02', '2024-01-03') if start <= day <= end]
+
+    async def fetch_updated(start, end):
+        calls.append(('delta',))
+        return []
+
+    await fetch_incremental('appointmentsReport', fetch_full, fetch_updated, '2024-01-01', '2024-01-02', id_key='id', date_key='Data', store=store)
+    rows = await fetch_incremental('appointmentsReport', fetch_full, fetch_updated, '2024-01-01', '2024-01-03', id_key='id', date_key='Data', store=store)
+
+    assert calls == [('full', '2024-01-01', '2024-01-02'), ('delta',), ('full', '2024-01-03', '2024-01-03')]
+    assert [row['id'] for row in rows] == ['2024-01-01', '2024-01-02', '2024-01-03']
+
+@pytest.mark.asyncio
+async def test_expired_days_are_fetched_again_without_deleted_records(tmp_path):
+    store = SnapshotStore(root=tmp_path, max_age=0)
+    responses = [[{'id': 1, 'Data': '2024-01-02'}, {'id': 2, 'Data': '2024-01-02'}], [{'id': 1, 'Data': '2024-01-02'}]]
+
+    async def fetch_full(start, end):
+        return responses.pop(0)
+
+    async def fetch_updated(start, end):
+        raise AssertionError('expired days are not patched')
+
+    args = ('appointmentsReport', fetch_full, fetch_updated, '2024-01-01', '2024-01-31')
+    await fetch_incremental(*args, id_key='id', date_key='Data', store=store)
+    rows = await fetch_incremental(*args, id_key='id', date_key='Data', store=store)
+
+    assert rows == [{'id': 1, 'Data': '2024-01-02'}]
+
+@pytest.mark.asyncio
+async def test_failed_shard_is_not_stored(tmp_path):
+    store = SnapshotStore(root=tmp_path)
+
+    async def fetch_shard(start, end):
+        if start == '2024-01-08':
+            raise RuntimeError('timeout')
+        return [{'id': start, 'Data': start}]
+
+    async def fetch_full(start, end):
+        return await fetch_sharded(fetch_shard, start, end, shard='week')
+
+    async def fetch_updated(start, end):
+        return []
+
+    rows = await fetch_incremental('appointmentsReport', fetch_full, fetch_updated, '2024-01-01', '2024-01-14', id_key='id', date_key='Data', store=store)
+
+    assert rows == [{'id': '2024-01-01', 'Data': '2024-01-01'}]
+    assert not list(tmp_path.rglob('*.parquet'))
@@ -0,0 +1,70 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import asyncio
+import pytest
+from unittest.mock import patch
+from apiCrm.resolvers.paginator import AdaptiveConcurrency, fetch_all_pages
+
+def _page(page, rows, last_page, total=None, per_page=None):
+    meta = {'currentPage': page, 'lastPage': last_page, 'total': total, 'perPage': per_page}
+    return {'data': {'leadsReport': {'data': rows, 'meta': meta}}}
+
+@pytest.mark.asyncio
+async def test_fetch_all_pages_keeps_page_order():
+    in_flight, peak = 0, 0
+
+    async def fake_fetch_graphql(session, url, query, variables, on_response=None):
+        nonlocal in_flight, peak
+        page = variables['currentPage']
+        in_flight += 1
+        peak = max(peak, in_flight)
+        # Later pages answer first, the result must still be in page order
+        await asyncio.sleep(0.01 * (6 - page))
+        in_flight -= 1
+        on_response(200, 0.01)
+        return _page(page, [{'id': page}], last_page=5)
+
+    with patch('apiCrm.resolvers.paginator.fetch_graphql', new=fake_fetch_graphql):
+        rows = await fetch_all_pages(None, 'url', 'query', {'start': 'a'}, 'leadsReport', max_concurrency=2)
+
+    assert [row['id'] for row in rows] == [1, 2, 3, 4, 5]
+    assert peak <= 2
+
+@pytest.mark.asyncio
+async def test_fetch_all_pages_caps_last_page_and_skips_failed_pages():
+    requested = []
+
+    async def fake_fetch_graphql(session, url, query, variables, on_response=None):
+        page = variables['currentPage']
+        requested.append(page)
+        if page == 2:
+            return None
+        return _page(page, [{'id': page}], last_page=50, total=5, per_page=2)
+
+    with patch('apiCrm.resolvers.paginator.fetch_graphql', new=fake_fetch_graphql):
+        rows = await fetch_all_pages(None, 'url', 'query', {}, 'leadsReport')
+
+    assert sorted(requested) == [1, 2, 3]
+    assert [row['id'] for row in rows] == [1, 3]
+
+@pytest.mark.asyncio
+async def test_fetch_all_pages_returns_none_when_first_page_fails():
+    async def fake_fetch_graphql(session, url, query, variables, on_response=None):
+        return {'errors': [{'message': 'boom'}]}
+
+    with patch('apiCrm.resolvers.paginator.fetch_graphql', new=fake_fetch_graphql):
+        assert await fetch_all_pages(None, 'url', 'query', {}, 'leadsReport') is None
+
+def test_adaptive_concurrency_backs_off_and_recovers():
+    limiter = AdaptiveConcurrency(max_concurrency=8, increase_after=2)
+
+    limiter.observe(429)
+    assert limiter.limit == 4
+    limiter.observe(503)
+    assert limiter.limit == 2
+
+    limiter.observe(200)
+    limiter.observe(200)
+    assert limiter.limit == 3
@@ -0,0 +1,49 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import time
+import asyncio
+import pytest
+from email.utils import formatdate
+from apiCrm.resolvers.fetch_graphql import AdaptiveTokenBucket, parse_retry_after
+
+def test_bucket_paces_requests_beyond_the_burst():
+    bucket = AdaptiveTokenBucket(rate=20, capacity=2, max_rate=20)
+
+    async def take(n):
+        for _ in range(n):
+            await bucket.acquire()
+
+    started_at = time.monotonic()
+    asyncio.run(take(4))
+
+    # Two tokens come from the burst, the other two refill at 20 req/s
+    assert time.monotonic() - started_at >= 0.09
+
+def test_bucket_backs_off_and_recovers():
+    bucket = AdaptiveTokenBucket(rate=4, min_rate=1, max_rate=5, latency_target=1, increase_step=0.5)
+
+    bucket.on_throttle()
+    assert bucket.rate == 2
+    bucket.on_throttle()
+    bucket.on_throttle()
+    assert bucket.rate == 1
+
+    bucket.on_success(0.1)
+    assert bucket.rate == 1.5
+    bucket.on_success(3)
+    assert bucket.rate == pytest.approx(1.2)
+
+def test_retry_after_blocks_every_caller():
+    bucket = AdaptiveTokenBucket(rate=10, capacity=5)
+
+    bucket.on_throttle(retry_after=30)
+
+    assert bucket._reserve() > 29
+
+def test_parse_retry_after():
+    assert parse_retry_after('3') == 3.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after('soon') is None
+    assert 50 < parse_retry_after(formatdate(time.time() + 60, usegmt=True)) <= 60
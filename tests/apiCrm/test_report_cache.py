@@ -0,0 +1,147 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import os
+import time
+import pytest
+from datetime import date
+import pyarrow.parquet as pq
+from apiCrm.resolvers.report_cache import ReportCache
+from apiCrm.resolvers.paginator import _record_failure
+
+@pytest.mark.asyncio
+async def test_only_missing_days_are_fetched(tmp_path):
+    cache = ReportCache(root=tmp_path, enabled=True)
+    calls = []
+
+    async def fetch_range(start, end):
+        calls.append((start, end))
+        return [{'id': f"{start}-1", 'value': 1.5, 'comment': None}]
+
+    first = await cache.fetch('leadsReport', fetch_range, '2024-01-01', '2024-01-03')
+    assert calls == [('2024-01-01', '2024-01-01'), ('2024-01-02', '2024-01-02'), ('2024-01-03', '2024-01-03')]
+
+    calls.clear()
+    second = await cache.fetch('leadsReport', fetch_range, '2024-01-02', '2024-01-04')
+    assert calls == [('2024-01-04', '2024-01-04')]
+    assert second[0] == {'id': '2024-01-02-1', 'value': 1.5, 'comment': None}
+    assert [row['id'] for row in first] == ['2024-01-01-1', '2024-01-02-1', '2024-01-03-1']
+
+@pytest.mark.asyncio
+async def test_recent_days_expire_and_failed_days_are_not_cached(tmp_path):
+    cache = ReportCache(root=tmp_path, enabled=True, recent_ttl=60)
+    today = date.today().isoformat()
+    calls = []
+
+    async def fetch_range(start, end):
+        calls.append(start)
+        if start == '2024-01-02':
+            _record_failure('leadsReport', 2)
+        return [{'id': start}]
+
+    await cache.fetch('leadsReport', fetch_range, today, today)
+    await cache.fetch('leadsReport', fetch_range, '2024-01-02', '2024-01-02')
+    assert not list(tmp_path.rglob('2024-01-02.parquet'))
+
+    # Age today's file past the TTL
+    path = next(tmp_path.rglob(f'{today}.parquet'))
+    stale = time.time() - 120
+    os.utime(path, (stale, stale))
+
+    calls.clear()
+    await cache.fetch('leadsReport', fetch_range, today, today)
+    await cache.fetch('leadsReport', fetch_range, '2024-01-02', '2024-01-02')
+    assert calls == [today, '2024-01-02']
+
+@pytest.mark.asyncio
+async def test_changed_resolver_uses_a_fresh_cache(tmp_path):
+    cache = ReportCache(root=tmp_path, enabled=True)
+
+    async def resolver_v1(start, end):
+        return [{'id': 'v1'}]
+
+    async def resolver_v2(start, end):
+        return [{'id': 'v2', 'extra': 'new field'}]
+
+    assert await cache.fetch('r', resolver_v1, '2024-01-01', '2024-01-01') == [{'id': 'v1'}]
+    assert await cache.fetch('r', resolver_v2, '2024-01-01', '2024-01-01') == [{'id': 'v2', 'extra': 'new field'}]
+
+@pytest.mark.asyncio
+async def test_columnar_outputs_merge_days_as_tables(tmp_path):
+    cache = ReportCache(root=tmp_path, enabled=True)
+
+    async def fetch_range(start, end):
+        # The same record shows up on two days, and one day has no value for 'note'
+        if start == '2024-01-01':
+            return [{'id': 'a', 'note': None}, {'id': 'shared', 'note': None}]
+        return [{'id': 'shared', 'note': 'x'}, {'id': 'b', 'note': 'y'}]
+
+    await cache.fetch('leadsReport', fetch_range, '2024-01-01', '2024-01-02')
+    columns = await cache.fetch('leadsReport', fetch_range, '2024-01-01', '2024-01-02', output='columns')
+    df = await cache.fetch('leadsReport', fetch_range, '2024-01-01', '2024-01-02', output='dataframe')
+
+    assert columns == {'id': ['a', 'shared', 'b'], 'note': [None, None, 'y']}
+    assert df['id'].tolist() == ['a', 'shared', 'b']
+
+@pytest.mark.asyncio
+async def test_days_fetched_as_columns(tmp_path):
+    cache = ReportCache(root=tmp_path, enabled=True)
+
+    async def fetch_range(start, end):
+        return {'id': [f"{start}-1", f"{start}-2"], 'value': [1, None]}
+
+    columns = await cache.fetch('grossSalesReport', fetch_range, '2024-01-01', '2024-01-02', output='columns')
+    records = await cache.fetch('grossSalesReport', fetch_range, '2024-01-01', '2024-01-02')
+    uncached = await ReportCache(root=tmp_path, enabled=False).fetch('grossSalesReport', fetch_range, '2024-01-01', '2024-01-01')
+
+    assert columns == {'id': ['2024-01-01-1', '2024-01-01-2', '2024-01-02-1', '2024-01-02-2'], 'value': [1, None, 1, None]}
+    assert records[2] == {'id': '2024-01-02-1', 'value': 1}
+    assert uncached == [{'id': '2024-01-01-1', 'value': 1}, {'id': '2024-01-01-2', 'value': None}]
+
+@pytest.mark.asyncio
+async def test_days_whose_rows_fail_to_process_are_not_cached(tmp_path, monkeypatch):
+    from apiCrm.resolvers.dashboard import fetch_grossSalesReport as gross_sales
+
+    async def fetch_all_pages(*args, **kwargs):
+        return [{'id': 1}]
+
+    def broken_process(sales_data, output='records'):
+        raise KeyError('bill')
+
+    monkeypatch.setattr(gross_sales, 'fetch_all_pages', fetch_all_pages)
+    monkeypatch.setattr(gross_sales, 'process_gross_sales_data', broken_process)
+    cache = ReportCache(root=tmp_path, enabled=True)
+
+    rows = await cache.fetch(
+        'grossSalesReport', lambda start, end: gross_sales.fetch_grossSalesReport(None, start, end, output='columns'),
+        '2024-01-01', '2024-01-01',
+    )
+
+    assert rows == []
+    assert not list(tmp_path.rglob('*.parquet'))
+
+@pytest.mark.asyncio
+async def test_lead_report_range_is_stamped_after_the_cached_days_merge(tmp_path, monkeypatch):
+    from apiCrm.resolvers.dashboard import fetch_leadReport as leads
+
+    async def fetch_all_pages(session, url, query, variables, report_name):
+        return [{'id': variables['startDate'], 'createdAt': f"{variables['startDate']}T10:00:00"}]
+
+    class Client:
+        async def run(self, handler):
+            return await handler(None)
+
+    monkeypatch.setattr(leads, 'fetch_all_pages', fetch_all_pages)
+    monkeypatch.setattr(leads, 'crm_client', Client())
+    monkeypatch.setattr(leads, 'report_cache', ReportCache(root=tmp_path, enabled=True))
+
+    await leads.fetch_and_process_lead_report('2024-01-01', '2024-01-02')
+    records = await leads.fetch_and_process_lead_report('2024-01-02', '2024-01-02')
+    df = await leads.fetch_and_process_lead_report('2024-01-01', '2024-01-02', output='dataframe')
+
+    assert [(row['ID do lead'], row['report_start_date'], row['report_end_date']) for row in records] == [
+        ('2024-01-02', '2024-01-02', '2024-01-02')
+    ]
+    assert df['report_start_date'].tolist() == ['2024-01-01', '2024-01-01']
+    assert all('report_start_date' not in pq.read_schema(path).names for path in tmp_path.rglob('*.parquet'))
@@ -0,0 +1,60 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import pytest
+from apiCrm.resolvers.paginator import track_fetch_failures
+from apiCrm.resolvers.sharding import split_date_range, fetch_sharded
+
+def test_split_date_range_by_week_and_day():
+    assert split_date_range('2025-01-01', '2025-01-17', 'week') == [
+        ('2025-01-01', '2025-01-07'),
+        ('2025-01-08', '2025-01-14'),
+        ('2025-01-15', '2025-01-17'),
+    ]
+    assert split_date_range('2025-02-27', '2025-03-01', 'day') == [
+        ('2025-02-27', '2025-02-27'),
+        ('2025-02-28', '2025-02-28'),
+        ('2025-03-01', '2025-03-01'),
+    ]
+    assert split_date_range('2025-01-01', '2025-01-01') == [('2025-01-01', '2025-01-01')]
+
+def test_split_date_range_rejects_unknown_shard():
+    with pytest.raises(ValueError):
+        split_date_range('2025-01-01', '2025-01-31', 'month')
+
+@pytest.mark.asyncio
+async def test_fetch_sharded_merges_and_dedupes():
+    calls = []
+
+    async def fetch_range(start, end):
+        calls.append((start, end))
+        if start == '2025-01-08':
+            raise RuntimeError('boom')
+        # Row 7 straddles the first shard boundary and is returned twice
+        return [{'id': start}, {'id': 7}, {'name': 'no id'}]
+
+    with track_fetch_failures() as failures:
+        rows = await fetch_sharded(fetch_range, '2025-01-01', '2025-01-20', shard='week')
+
+    assert len(calls) == 3
+    assert failures == ['shard 2025-01-08 to 2025-01-14 (boom)']
+    assert [row.get('id') for row in rows] == ['2025-01-01', 7, None, '2025-01-15', None]
+
+@pytest.mark.asyncio
+async def test_fetch_sharded_small_range_is_a_single_call():
+    async def fetch_range(start, end):
+        return [{'id': 1}, {'id': 1}]
+
+    # A single shard is passed through untouched
+    assert await fetch_sharded(fetch_range, '2025-01-01', '2025-01-03') == [{'id': 1}, {'id': 1}]
+
+@pytest.mark.asyncio
+async def test_fetch_sharded_keeps_column_shards_as_columns():
+    async def fetch_range(start, end):
+        # Record 'x' straddles the shard boundary and is returned twice
+        return {'id': [start, 'x'], 'note': [None, start]}
+
+    columns = await fetch_sharded(fetch_range, '2025-01-01', '2025-01-10', shard='week')
+
+    assert columns == {'id': ['2025-01-01', 'x', '2025-01-08'], 'note': [None, '2025-01-01', None]}
@@ -0,0 +1,94 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import asyncio
+import pytest
+from unittest.mock import patch
+from apiCrm.resolvers.fetch_graphql import SingleFlight, fetch_graphql
+
+@pytest.mark.asyncio
+async def test_identical_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+
+    async def call(name):
+        calls.append(name)
+        await asyncio.sleep(0.01)
+        return {'rows': [name]}
+
+    results = await asyncio.gather(
+        flight.do('a', lambda: call('a')),
+        flight.do('a', lambda: call('a')),
+        flight.do('b', lambda: call('b')),
+    )
+
+    assert calls == ['a', 'b']
+    assert results[0] is results[1]
+    assert flight.in_flight() == 0
+
+    # Once finished, the next call runs again
+    await flight.do('a', lambda: call('a'))
+    assert calls == ['a', 'b', 'a']
+
+@pytest.mark.asyncio
+async def test_errors_are_shared_and_leader_cancellation_hands_over():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError('boom')
+
+    results = await asyncio.gather(flight.do('x', fail), flight.do('x', fail), return_exceptions=True)
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        return 'done'
+
+    leader = asyncio.create_task(flight.do('y', slow))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(flight.do('y', slow))
+    await asyncio.sleep(0.01)
+    leader.cancel()
+
+    assert await follower == 'done'
+
+@pytest.mark.asyncio
+async def test_fetch_graphql_coalesces_identical_queries():
+    calls = []
+
+    async def fake_post(session, url, query, variables, on_response=None):
+        calls.append(variables['currentPage'])
+        await asyncio.sleep(0.01)
+        return {'data': {}}
+
+    with patch('apiCrm.resolvers.fetch_graphql._post_graphql', new=fake_post):
+        session = object()
+        await asyncio.gather(
+            fetch_graphql(session, 'url', 'query', {'start': '2024-01-01', 'currentPage': 1}),
+            fetch_graphql(session, 'url', 'query', {'currentPage': 1, 'start': '2024-01-01'}),
+            fetch_graphql(session, 'url', 'query', {'start': '2024-01-01', 'currentPage': 2}),
+        )
+
+    assert sorted(calls) == [1, 2]
+
+@pytest.mark.asyncio
+async def test_coalesced_callers_all_observe_the_shared_responses():
+    async def fake_post(session, url, query, variables, on_response=None):
+        await asyncio.sleep(0.01)
+        on_response(429, 0.2)
+        on_response(200, 0.1)
+        return {'data': {}}
+
+    leader, follower = [], []
+    with patch('apiCrm.resolvers.fetch_graphql._post_graphql', new=fake_post):
+        session = object()
+        await asyncio.gather(
+            fetch_graphql(session, 'url', 'query', {'currentPage': 1}),
+            fetch_graphql(session, 'url', 'query', {'currentPage': 1}, on_response=lambda *response: leader.append(response)),
+            fetch_graphql(session, 'url', 'query', {'currentPage': 1}, on_response=lambda *response: follower.append(response)),
+        )
+        await fetch_graphql(session, 'url', 'query', {'currentPage': 1})
+
+    assert leader == follower == [(429, 0.2), (200, 0.1)]
@@ -0,0 +1,96 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import pytest
+from apiCrm.resolvers.transformer import Coalesce, Concat, Const, Field, Join, Transformer
+from apiCrm.resolvers.dashboard.fetch_appointmentReport import APPOINTMENT_COLUMN_FIELDS, APPOINTMENTS_TRANSFORM
+from apiCrm.resolvers.dashboard.fetch_grossSalesReport import process_gross_sales_data
+
+def test_nested_fields_follow_dict_get_defaults():
+    transform = Transformer([
+        Field('store', 'store.name', ''),
+        Field('source', 'customer.source.title', 'none'),
+        Field('flag', 'photoUrl', '', convert=lambda value: 'Sim' if value else 'Não'),
+        Const('machine'),
+    ])
+
+    rows = transform.records([
+        {'store': {'name': 'Moema'}, 'customer': {'source': {'title': 'Instagram'}}, 'photoUrl': 'x'},
+        {'store': None, 'customer': {'source': None}},
+        None,
+        {'store': {'name': None}, 'customer': None, 'photoUrl': None},
+    ])
+
+    assert rows == [
+        {'store': 'Moema', 'source': 'Instagram', 'flag': 'Sim', 'machine': None},
+        {'store': '', 'source': 'none', 'flag': 'Não', 'machine': None},
+        {'store': None, 'source': 'none', 'flag': 'Não', 'machine': None},
+    ]
+
+def test_joins_coalesce_and_concat():
+    transform = Transformer([
+        Join('telephones', 'customer.telephones', item='number'),
+        Join('groups', 'items', item='procedure.groupLabel', when='procedure', sep='; '),
+        Join('items', 'items', template='{description} (Q:{quantity})', sep='; ', default=''),
+        Coalesce('created_by', ['parent.createdBy.name', 'createdBy.name'], '_não disponível'),
+        Concat('address', ['address.street', 'address.number', 'address.city'], fallback='addressLine'),
+    ])
+
+    full, empty = transform.records([
+        {
+            'customer': {'telephones': [{'number': '11 9999'}, None, {'number': '11 8888'}]},
+            'items': [{'description': 'Botox', 'quantity': 1, 'procedure': {'groupLabel': 'Injetáveis'}}, {'description': 'Taxa'}],
+            'parent': {'createdBy': {'name': None}},
+            'createdBy': {'name': 'Ana'},
+            'address': {'street': 'Rua A', 'number': 10, 'city': None},
+        },
+        {'customer': {'telephones': []}, 'items': None, 'address': {}, 'addressLine': 'Rua B, 20'},
+    ])
+
+    assert full == {
+        'telephones': '11 9999, 11 8888',
+        'groups': 'Injetáveis',
+        'items': 'Botox (Q:1); Taxa (Q:)',
+        'created_by': 'Ana',
+        'address': 'Rua A, 10',
+    }
+    assert empty == {'telephones': None, 'groups': None, 'items': '', 'created_by': '_não disponível', 'address': 'Rua B, 20'}
+
+def test_select_outputs_and_signature():
+    transform = Transformer([Field('id', 'id'), Field('name', 'customer.name')])
+    rows = [{'id': 1, 'customer': {'name': 'Ana'}}, {'id': 2}]
+
+    assert transform.select(['name', 'id']).records(rows) == [{'name': 'Ana', 'id': 1}, {'name': None, 'id': 2}]
+    assert transform.select(['name']) is transform.select(['name'])
+    assert transform.transform(rows, 'columns') == {'id': [1, 2], 'name': ['Ana', None]}
+    assert list(transform.transform([], 'dataframe').columns) == ['id', 'name']
+    assert transform.signature == Transformer([Field('id', 'id'), Field('name', 'customer.name')]).signature
+    assert transform.signature != Transformer([Field('id', 'id'), Field('name', 'customer.email')]).signature
+    with pytest.raises(ValueError):
+        transform.select(['email'])
+    with pytest.raises(ValueError):
+        Transformer([Field('id', 'id'), Field('id', 'uuid')])
+
+def test_appointments_transform_covers_every_column():
+    assert APPOINTMENTS_TRANSFORM.names == list(APPOINTMENT_COLUMN_FIELDS)
+
+def test_gross_sales_transform():
+    sale = {
+        'id': 7,
+        'status': 'SIGNED',
+        'store': {'name': 'Moema'},
+        'evaluations': [{'employee': {'name': 'Bia'}}, {'employee': None}],
+        'bill': {'chargableTotal': 300, 'items': [
+            {'description': 'Botox', 'quantity': 1, 'amount': 300, 'discountAmount': 0, 'discountPercentage': 0, 'procedure': {'groupLabel': 'Injetáveis'}},
+        ]},
+        'customer': {'name': 'Ana', 'telephones': [{'number': '11 9999'}], 'source': {'title': 'Instagram'}, 'occupation': None},
+    }
+
+    [row] = process_gross_sales_data([sale])
+
+    assert row['employees'] == 'Bia'
+    assert row['bill_items'] == 'Botox (Q:1, V:300, D:0 - 0%)'
+    assert row['procedure_groupLabels'] == 'Injetáveis'
+    assert row['telephones'] == '11 9999'
+    assert (row['source'], row['occupation'], row['createdBy']) == ('Instagram', None, None)
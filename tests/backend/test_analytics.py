@@ -0,0 +1,72 @@
+import sys
+from pathlib import Path
+# Add project root to sys.path for robust import resolution
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from datetime import date, datetime
+from decimal import Decimal
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from backend.database import Base
+from backend.crud import aggregate
+from backend.crud.rollup import rebuild_rollups
+from backend.models import Sale
+
+SALES = [
+    # unit, seller, day, final_value, lead_id
+    ('MOEMA', 'Ana', 6, '100.00', 1),
+    ('MOEMA', 'Ana', 7, '50.00', 1),
+    ('MOEMA', 'Bia', 14, '30.00', 2),
+    ('TATUAPE', 'Ana', 15, '20.00', 3),
+    ('TATUAPE', 'Ana', 31, '999.00', 4),
+]
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'api.db'}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all(
+            Sale(lead_id=lead_id, date=datetime(2025, 1, day, 15), procedure='BOTOX', unit=unit,
+                 total_value=Decimal(value), final_value=Decimal(value), payment_method='Pix', status='Pago', seller=seller)
+            for unit, seller, day, value, lead_id in SALES
+        )
+        session.commit()
+        rebuild_rollups(session)
+        session.commit()
+        yield session
+
+def test_group_by_dimensions_and_time_bucket(db):
+    rows = aggregate(db, 'sales', ['unit', 'week'], ['count', 'count_distinct_leads', 'sum_final_value'],
+                     date_from=date(2025, 1, 1), date_to=date(2025, 1, 15))
+
+    assert rows == [
+        {'unit': 'MOEMA', 'week': '2025-01-06', 'count': 2, 'count_distinct_leads': 1, 'sum_final_value': Decimal('150.00')},
+        {'unit': 'MOEMA', 'week': '2025-01-13', 'count': 1, 'count_distinct_leads': 1, 'sum_final_value': Decimal('30.00')},
+        {'unit': 'TATUAPE', 'week': '2025-01-13', 'count': 1, 'count_distinct_leads': 1, 'sum_final_value': Decimal('20.00')},
+    ]
+
+@pytest.mark.parametrize('use_rollups', [True, False])
+def test_rollup_adds_subtotals_and_grand_total(db, use_rollups):
+    rows = aggregate(db, 'sales', ['unit', 'seller'], ['count'], rollup=True, use_rollups=use_rollups)
+
+    assert [(row['unit'], row['seller'], row['count'], row['grouping']) for row in rows] == [
+        ('MOEMA', 'Ana', 2, 0), ('MOEMA', 'Bia', 1, 0), ('TATUAPE', 'Ana', 2, 0),
+        ('MOEMA', None, 3, 1), ('TATUAPE', None, 2, 1),
+        (None, None, 5, 3),
+    ]
+
+def test_daily_rollup_gives_the_raw_totals(db):
+    args = (db, 'sales', ['unit', 'month'], ['count', 'sum_final_value', 'sum_commission'])
+    kwargs = {'date_from': date(2025, 1, 7), 'date_to': date(2025, 1, 31), 'rollup': True}
+
+    assert aggregate(*args, **kwargs) == aggregate(*args, use_rollups=False, **kwargs)
+
+def test_unknown_names_are_rejected(db):
+    with pytest.raises(ValueError):
+        aggregate(db, 'sales', ['category'], ['count'])
+    with pytest.raises(ValueError):
+        aggregate(db, 'leads', ['unit'], ['sum_final_value'])
+    with pytest.raises(ValueError):
+        aggregate(db, 'orders', [], ['count'])
@@ -0,0 +1,56 @@
+import sys
+from pathlib import Path
+# Add project root to sys.path for robust import resolution
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import csv
+import io
+import json
+from datetime import datetime
+import pyarrow as pa
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from backend.database import Base
+from backend.crud import select_mkt_leads
+from backend.export import stream_table
+from backend.models import MktLead
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'api.db'}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all(
+            MktLead(lead_id=lead_id, lead_source='Google' if lead_id % 2 else 'Meta', lead_message='oi, "tudo"\nbem',
+                    appointment_date=datetime(2025, 1, lead_id), sales_purchased=lead_id == 3)
+            for lead_id in range(1, 8)
+        )
+        session.commit()
+    return engine
+
+def test_ndjson_and_csv_stream_in_chunks(engine):
+    chunks = list(stream_table(select_mkt_leads(source='Google'), 'ndjson', chunk_size=2, bind=engine))
+    rows = [json.loads(line) for chunk in chunks for line in chunk.decode().splitlines()]
+
+    assert len(chunks) == 2
+    assert [row['lead_id'] for row in rows] == [1, 3, 5, 7]
+    assert rows[1]['appointment_date'] == '2025-01-03T00:00:00'
+    assert rows[1]['sales_purchased'] is True
+
+    text = b''.join(stream_table(select_mkt_leads(), 'csv', chunk_size=3, bind=engine)).decode()
+    table = list(csv.DictReader(io.StringIO(text)))
+
+    assert [row['lead_id'] for row in table] == [str(lead_id) for lead_id in range(1, 8)]
+    assert table[0]['lead_message'] == 'oi, "tudo"\nbem'
+
+def test_arrow_stream_keeps_the_table_schema(engine):
+    data = b''.join(stream_table(select_mkt_leads(source='Meta'), 'arrow', chunk_size=2, bind=engine))
+    table = pa.ipc.open_stream(data).read_all()
+
+    assert table.column('lead_id').to_pylist() == [2, 4, 6]
+    assert table.schema.field('appointment_date').type == pa.timestamp('us')
+    assert table.schema.field('sales_purchased').type == pa.bool_()
+
+    empty = pa.ipc.open_stream(b''.join(stream_table(select_mkt_leads(source='none'), 'arrow', bind=engine))).read_all()
+    assert empty.num_rows == 0 and empty.schema == table.schema
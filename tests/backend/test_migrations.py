@@ -0,0 +1,32 @@
+import sys
+from pathlib import Path
+# Add project root to sys.path for robust import resolution
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from sqlalchemy import create_engine, inspect, text
+from backend.database import Base
+from backend.migrations import ensure_indexes, missing_indexes
+
+def test_ensure_indexes_adds_the_indexes_of_existing_tables(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'api.db'}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for name in ("ix_sales_unit_status_seller_date", "ix_mkt_leads_store_status_source"):
+            conn.execute(text(f"DROP INDEX {name}"))
+
+    assert sorted(index.name for index in missing_indexes(engine)) == ["ix_mkt_leads_store_status_source", "ix_sales_unit_status_seller_date"]
+    assert sorted(ensure_indexes(engine)) == ["ix_mkt_leads_store_status_source", "ix_sales_unit_status_seller_date"]
+    assert ensure_indexes(engine) == []
+    columns = {index["name"]: index["column_names"] for index in inspect(engine).get_indexes("sales")}
+    assert columns["ix_sales_unit_status_seller_date"] == ["unit", "status", "seller", "date"]
+
+def test_ensure_indexes_rebuilds_invalid_indexes_on_postgresql(postgres_engine):
+    # What an interrupted CREATE INDEX CONCURRENTLY leaves behind
+    with postgres_engine.begin() as conn:
+        conn.execute(text("UPDATE pg_index SET indisvalid = false WHERE indexrelid = 'ix_sales_unit_status_seller_date'::regclass"))
+
+    assert [index.name for index in missing_indexes(postgres_engine)] == ["ix_sales_unit_status_seller_date"]
+    assert ensure_indexes(postgres_engine) == ["ix_sales_unit_status_seller_date"]
+    assert missing_indexes(postgres_engine) == []
+    with postgres_engine.connect() as conn:
+        assert conn.execute(text("SELECT indisvalid FROM pg_index WHERE indexrelid = 'ix_sales_unit_status_seller_date'::regclass")).scalar()
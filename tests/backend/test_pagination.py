@@ -0,0 +1,61 @@
+import sys
+from pathlib import Path
+# Add project root to sys.path for robust import resolution
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from backend.database import Base
+from backend.models import Lead, MktLead, Sale
+from backend.crud import get_mkt_leads_page, get_sales_page
+
+@pytest.fixture
+def db(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'api.db'}")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
+
+def test_mkt_leads_keyset_pages(db):
+    db.add_all(MktLead(lead_id=lead_id, lead_store='MOEMA' if lead_id % 2 else 'TATUAPE') for lead_id in range(1, 11))
+    db.commit()
+
+    first, total, cursor = get_mkt_leads_page(db, limit=3, unit='MOEMA', total='window')
+    second, second_total, _ = get_mkt_leads_page(db, after_id=cursor[-1], limit=3, unit='MOEMA', total='window')
+    last, _, end = get_mkt_leads_page(db, after_id=5, limit=3, unit='MOEMA', total='exact')
+
+    assert [lead.lead_id for lead in first] == [1, 3, 5]
+    assert (total, cursor) == (5, (5,))
+    assert [lead.lead_id for lead in second] == [7, 9]
+    assert second_total is None
+    assert ([lead.lead_id for lead in last], end) == ([7, 9], None)
+    assert get_mkt_leads_page(db, after_id=5, unit='MOEMA', total='exact')[1] is None
+    assert get_mkt_leads_page(db, limit=2, unit='MOEMA', total='exact')[1] == 5
+    assert get_mkt_leads_page(db, limit=2, skip=20, unit='MOEMA', total='window')[:2] == ([], 5)
+    assert get_mkt_leads_page(db, limit=2)[1] == 10
+    assert get_mkt_leads_page(db, limit=2, total='none')[1] is None
+
+def test_sales_pages_by_date_and_id(db):
+    db.add(Lead(id=1, name='Ana'))
+    start = datetime(2025, 1, 1)
+    days = [3, 1, 2, 1, 3, 2]
+    db.add_all(
+        Sale(id=sale_id, lead_id=1, date=start + timedelta(days=day), procedure='Botox', unit='MOEMA',
+             total_value=100, final_value=100, payment_method='Pix', status='ok', seller='Bia')
+        for sale_id, day in enumerate(days, start=1)
+    )
+    db.commit()
+
+    ids, cursor = [], None
+    while True:
+        after = {'after_date': cursor[0], 'after_id': cursor[1]} if cursor else {}
+        sales, _, cursor = get_sales_page(db, order_by='date', limit=4, **after)
+        ids += [sale.id for sale in sales]
+        if cursor is None:
+            break
+
+    assert ids == [2, 4, 3, 6, 1, 5]
+    with pytest.raises(ValueError):
+        get_sales_page(db, order_by='date', after_id=3)
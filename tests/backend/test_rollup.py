@@ -0,0 +1,95 @@
+import sys
+from pathlib import Path
+# Add project root to sys.path for robust import resolution
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import threading
+import time
+from datetime import date, datetime
+from decimal import Decimal
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from backend.database import Base
+from backend.crud import create_sale, delete_sale, get_sales_by_seller, update_sale
+from backend.crud.rollup import backfill_rollups, refresh_rollups, rollup_days
+from backend.models import DailySalesByStoreSeller, Lead, Sale
+from backend.schemas.sale import SaleCreate, SaleUpdate
+
+def _sale(day, seller, value):
+    return SaleCreate(lead_id=1, date=datetime(2025, 2, day, 10), procedure='BOTOX', unit='MOEMA', total_value=value,
+                      final_value=value, payment_method='Pix', status='Pago', seller=seller)
+
+def _rollup(db):
+    return sorted(
+        (row.day, row.seller, row.sale_count, row.total_value)
+        for row in db.query(DailySalesByStoreSeller)
+    )
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'api.db'}")
+    Base.metadata.create_all(engine)
+    return engine
+
+def test_crud_writes_keep_the_daily_rollup_up_to_date(engine):
+    with Session(engine) as db:
+        first = create_sale(db, _sale(3, 'Ana', Decimal('100.00')))
+        create_sale(db, _sale(3, 'Ana', Decimal('50.00')))
+        second = create_sale(db, _sale(4, 'Bia', Decimal('30.00')))
+        assert _rollup(db) == [
+            (date(2025, 2, 3), 'Ana', 2, Decimal('150.00')),
+            (date(2025, 2, 4), 'Bia', 1, Decimal('30.00')),
+        ]
+
+        update_sale(db, first.id, SaleUpdate(date=datetime(2025, 2, 4, 9), seller='Bia', status='Pago'))
+        delete_sale(db, second.id)
+        assert _rollup(db) == [
+            (date(2025, 2, 3), 'Ana', 1, Decimal('50.00')),
+            (date(2025, 2, 4), 'Bia', 1, Decimal('100.00')),
+        ]
+        assert [(row['seller'], row['count']) for row in get_sales_by_seller(db)] == [('Ana', 1), ('Bia', 1)]
+
+def test_backfill_builds_empty_rollups_only(engine):
+    with Session(engine) as db:
+        db.add(Sale(**_sale(5, 'Ana', Decimal('10.00')).model_dump()))
+        db.commit()
+
+    backfill_rollups(engine)
+    backfill_rollups(engine)
+
+    with Session(engine) as db:
+        assert _rollup(db) == [(date(2025, 2, 5), 'Ana', 1, Decimal('10.00'))]
+
+@pytest.mark.parametrize('database', ['sqlite', 'postgresql'])
+def test_overlapping_writes_of_the_same_day_count_once(engine, database, request):
+    if database == 'postgresql':
+        engine = request.getfixturevalue('postgres_engine')
+    with Session(engine) as db:
+        db.add(Lead(id=1, name='Ana'))
+        db.commit()
+    errors = []
+
+    def second_writer():
+        try:
+            with Session(engine) as db:
+                create_sale(db, _sale(3, 'Ana', Decimal('50.00')))
+        except Exception as e:
+            errors.append(e)
+
+    # The first writer has refreshed the day but not committed when the second one starts
+    first = Session(engine)
+    sale = Sale(**_sale(3, 'Ana', Decimal('100.00')).model_dump())
+    first.add(sale)
+    first.flush()
+    refresh_rollups(first, Sale, rollup_days(first, Sale, [sale.id]))
+    second = threading.Thread(target=second_writer)
+    second.start()
+    time.sleep(0.5)
+    first.commit()
+    first.close()
+    second.join()
+
+    assert errors == []
+    with Session(engine) as db:
+        assert _rollup(db) == [(date(2025, 2, 3), 'Ana', 2, Decimal('150.00'))]
@@ -2,3 +2,23 @@ import sys
 from pathlib import Path
 # Always add project root to sys.path for all test discovery and imports
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import os
+import pytest
+
+@pytest.fixture
+def postgres_engine():
+    """Engine on the TEST_POSTGRES_URL database with every model table, skipped when it is not set."""
+    url = os.getenv("TEST_POSTGRES_URL")
+    if not url:
+        pytest.skip("TEST_POSTGRES_URL is not set")
+    from sqlalchemy import create_engine
+    from backend.database import Base
+    import backend.models  # noqa: F401 - registers every table on Base
+
+    engine = create_engine(url)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    yield engine
+    Base.metadata.drop_all(engine)
+    engine.dispose()
@@ -0,0 +1,51 @@
+import sys
+from pathlib import Path
+# Add project root to sys.path for robust import resolution
+sys.path.insert(0, str(Path(__file__).resolve().parents[3]))
+
+import random
+import pandas as pd
+from frontend.leads.lead_category import KeywordCategorizer, category_mapping, categorize, get_categorizer, process_lead_categories
+
+def _first_keyword(text):
+    for keyword, category in category_mapping.items():
+        if keyword.lower() in str(text).lower():
+            return category
+    return 'Indefinido'
+
+def test_categorizer_keeps_the_mapping_priority():
+    random.seed(3)
+    words = list(category_mapping) + ['Corporal', 'lp', 'olá', 'ULTRA', 'mama', '-', ' ']
+    texts = [''.join(random.choice(words) for _ in range(random.randint(0, 4))) for _ in range(2000)]
+    texts += ['CRIOLIPÓLISE', 'preenchimentocorporal', 'Mamoplastia Redutora', None, 3.5]
+
+    assert [categorize(text) for text in texts] == [_first_keyword(text) for text in texts]
+    assert KeywordCategorizer({'b': 'B', 'ab': 'AB'}).categorize('xab') == 'B'
+    assert KeywordCategorizer({}).categorize('botox') == 'Indefinido'
+
+def test_process_lead_categories():
+    leads = pd.DataFrame({
+        'Content': ['botox_feed', 'preenchimentocorporal', 'lp', 'lp', None, 'lp'],
+        'Mensagem': ['', '', 'Quero ULTRAFORMER', 'Lead salvo pelo modal de WhatsApp da Isa', 'oi', 'oi'],
+        'Fonte': ['Google', 'Google', 'Google', 'Google', 'CRM BÔNUS', 'Indique e Multiplique'],
+    }, index=[5, 5, 6, 7, 8, 9])
+
+    result = process_lead_categories(leads)
+
+    assert result['Categoria'].tolist() == [
+        'Botox', 'Preenchimento Corporal', 'Ultraformer', 'Quer Falar no Whatsapp', 'Cortesia CRM Bônus', 'Cortesia Indique',
+    ]
+
+def test_categorizer_is_memoized_until_the_mapping_changes():
+    mapping = {'botox': 'Botox'}
+    categorizer = get_categorizer(mapping)
+    categorizer.categorize_series(pd.Series(['botox_feed', 'lp', 'botox_feed']))
+
+    assert categorizer.memo == {'botox_feed': 'Botox', 'lp': 'Indefinido'}
+    assert get_categorizer(mapping) is categorizer
+
+    mapping['lp'] = 'Landing'
+
+    assert get_categorizer(mapping) is not categorizer
+    assert get_categorizer(mapping).categorize('lp') == 'Landing'
+    assert get_categorizer() is get_categorizer(category_mapping)
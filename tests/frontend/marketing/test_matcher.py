@@ -0,0 +1,92 @@
+import sys
+from pathlib import Path
+# Add project root to sys.path for robust import resolution
+sys.path.insert(0, str(Path(__file__).resolve().parents[3]))
+
+import random
+import pandas as pd
+from frontend.marketing.matcher import match_first_appointment
+from frontend.marketing.worker import check_if_lead_has_atendido_status
+from frontend.marketing.sales_checker import check_if_lead_has_purchased
+
+def test_match_keeps_the_first_appointment_by_phone_or_email():
+    leads = pd.DataFrame({
+        'Telefone do lead': ['1133334444', '', '+55 11 9999-0000', '1100000000'],
+        'Email do lead': ['x@x.com', 'b@b.com', None, None],
+    }, index=[10, 11, 12, 13])
+    appointments = pd.DataFrame({
+        'Telefone': ['11 1111-1111', '11 99999-0000 / 11 3333-4444', '', '11 3333-4444'],
+        'Email': ['b@b.com', 'a@a.com', '', 'x@x.com'],
+        'Status': ['Falta', 'Atendido', 'Agendado', 'Cancelado'],
+        'Data': pd.to_datetime(['2025-01-01', '2025-01-02', '2025-01-03', '2025-01-04']),
+    }, index=[7, 3, 5, 1])
+
+    result = match_first_appointment(leads, appointments, {'status': 'Status', 'data_agenda': 'Data'})
+
+    assert result.index.tolist() == [10, 11, 12, 13]
+    assert result['status'].tolist() == ['Atendido', 'Falta', 'Atendido', None]
+    assert result.loc[11, 'data_agenda'] == pd.Timestamp('2025-01-01')
+
+def test_worker_matches_the_first_appointment_of_the_lead_keys():
+    random.seed(7)
+    people = [
+        {'phones': [f"11{random.randint(10**8, 10**9 - 1)}" for _ in range(2)], 'email': f"person{i}@mail.com"}
+        for i in range(300)
+    ]
+    appointment_people = [random.randrange(300) for _ in range(400)]
+    appointments = pd.DataFrame({
+        'Telefone': [' / '.join(random.sample(people[p]['phones'], random.randint(0, 2))) for p in appointment_people],
+        'Email': [people[p]['email'] for p in appointment_people],
+        'Status': [random.choice(['Atendido', 'Agendado', 'Falta']) for _ in appointment_people],
+        'Data': pd.Timestamp('2025-01-01'),
+        'Procedimento': 'AVALIAÇÃO ESTÉTICA',
+        'Unidade do agendamento': 'MOEMA',
+    })
+    lead_people = [random.randrange(300) for _ in range(500)]
+    lead_phones = [random.choice(people[p]['phones'] + ['']) for p in lead_people]
+    lead_emails = [random.choice([people[p]['email'], None]) for p in lead_people]
+    leads = pd.DataFrame({'Telefone do lead': lead_phones, 'Email do lead': lead_emails})
+
+    # Earliest appointment having the lead's own telephone or email
+    appointment_keys = [
+        {number for number in phones.replace(' ', '').split('/') if number} | {email}
+        for phones, email in zip(appointments['Telefone'], appointments['Email'])
+    ]
+    expected = []
+    for phone, email in zip(lead_phones, lead_emails):
+        rows = [row for row, keys in enumerate(appointment_keys) if phone in keys or email in keys]
+        expected.append(appointments['Status'][rows[0]] if rows else None)
+
+    checked = check_if_lead_has_atendido_status(leads, appointments)
+
+    assert checked['status'].tolist() == expected
+    assert checked['status'].notna().any()
+
+def test_match_does_not_follow_links_through_other_records():
+    # The second lead shares Ana's email with the first one, but only her telephone is on an appointment
+    leads = pd.DataFrame({'Telefone do lead': ['11999990000', '21988887777'], 'Email do lead': ['ana@x.com', 'ana@x.com']})
+    appointments = pd.DataFrame({'Telefone': ['21 98888-7777'], 'Email': [''], 'Status': ['Atendido'], 'Data': [pd.Timestamp('2025-01-01')]})
+
+    result = match_first_appointment(leads, appointments, {'status': 'Status'})
+
+    assert result['status'].tolist() == [None, 'Atendido']
+
+def test_purchases_match_every_sale_of_the_lead_customer():
+    leads = pd.DataFrame({
+        'ID do lead': [1, 2, 3, 4],
+        'Telefone do lead': ['11 3333-4444', '', '11 3333-4444', '11 5555-6666'],
+        'Email do lead': [None, 'b@b.com', None, None],
+        'Unidade': ['MOEMA'] * 4,
+    })
+    sales = pd.DataFrame({
+        'Telefones Limpos': ['11 9999-0000', '1133334444', '1133334444', '11 9999-0000'],
+        'Email do cliente': ['b@b.com', None, None, None],
+        'Unidade': ['TATUAPE', 'MOEMA', 'JARDINS', 'OSASCO'],
+        'Valor líquido': [100, 200, 300, 400],
+    })
+
+    result = check_if_lead_has_purchased(leads, sales)
+
+    assert result['ID do lead'].tolist() == [1, 2, 3, 4]
+    assert result['Unidade_y'].tolist() == ['MOEMA', 'TATUAPE', 'MOEMA', 'Não comprou']
+    assert result['comprou'].tolist() == [True, True, True, False]
@@ -0,0 +1,27 @@
+import sys
+from pathlib import Path
+# Add project root to sys.path for robust import resolution
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import numpy as np
+import pandas as pd
+from helpers.cleaner import clean_telephone, clean_telephone_series, explode_telephones, split_telephones
+
+def test_clean_telephone_series_matches_clean_telephone():
+    telefones = pd.Series(['+55 (11) 99999-0000', '(21) 3333-4444 / 21 98888-7777', None, np.nan, 'Cliente sem telefone', 5511987654321, ''])
+
+    assert clean_telephone_series(telefones).tolist() == [clean_telephone(telefone) for telefone in telefones.astype(str)]
+
+def test_canonical_numbers_get_the_mobile_ninth_digit():
+    telefones = pd.Series(['11 9999-0000', '011 99999-0000', '11 3333-4444', '999990000'])
+
+    assert clean_telephone_series(telefones, canonical=True).tolist() == ['11999990000', '11999990000', '1133334444', '999990000']
+
+def test_multi_number_fields_are_exploded():
+    telefones = pd.Series(['11 99999-0000 / 11 3333-4444', 'Cliente sem telefone', '11 5555-6666, 11 97777-8888', ['1122223333']], index=[5, 5, 7, 8])
+
+    numbers = explode_telephones(telefones)
+
+    assert numbers.tolist() == ['11999990000', '1133334444', '1155556666', '11977778888', '1122223333']
+    assert numbers.index.tolist() == [5, 5, 7, 7, 8]
+    assert split_telephones(telefones).tolist() == [['11999990000', '1133334444'], [], ['1155556666', '11977778888'], ['1122223333']]
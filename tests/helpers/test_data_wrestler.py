@@ -0,0 +1,155 @@
+import sys
+from pathlib import Path
+# Add project root to sys.path for robust import resolution
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import pandas as pd
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from backend.database import Base
+from backend.models.daily_rollup import DailyMktLeadsByStoreSource
+from backend.models.mkt_lead import MktLead
+from backend.models.push_checkpoint import PushCheckpoint
+from backend.crud.rollup import refresh_rollups
+import helpers.data_wrestler as data_wrestler
+from helpers.data_wrestler import (
+    _copy_chunks, _write_mkt_leads_orm, copy_mkt_leads, mkt_lead_frame, mkt_lead_rows, upload_hash, upsert_mkt_leads,
+)
+
+def _funnel(ids, emails):
+    return pd.DataFrame({
+        'ID lead': ids,
+        'Email do lead': emails,
+        'Dia da entrada': pd.to_datetime(['2025-03-04'] * len(ids)),
+        'Data Na Agenda': pd.to_datetime(['2025-03-10'] + [None] * (len(ids) - 1)),
+        'comprou': [True] + [None] * (len(ids) - 1),
+        'intervalo da compra': [6] + [0] * (len(ids) - 1),
+    })
+
+def test_upsert_inserts_then_updates(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'leads.db'}")
+    Base.metadata.create_all(engine)
+
+    frame, missing_ids = mkt_lead_frame(_funnel([1.0, 2.0, None], ['a@a.com', None, 'x@x.com']))
+    stats, errors = upsert_mkt_leads(mkt_lead_rows(frame), bind=engine, batch_size=1)
+
+    assert missing_ids == 1
+    assert (stats['inserted'], stats['updated'], stats['batches'], errors) == (2, 0, 2, [])
+
+    frame, _ = mkt_lead_frame(_funnel([2, 3, 2], ['b@b.com', 'c@c.com', 'last@b.com']))
+    stats, errors = upsert_mkt_leads(mkt_lead_rows(frame), bind=engine)
+
+    assert (stats['inserted'], stats['updated'], errors) == (1, 1, [])
+    with Session(engine) as session:
+        leads = {lead.lead_id: lead for lead in session.query(MktLead)}
+    assert {lead_id: lead.lead_email for lead_id, lead in leads.items()} == {1: 'a@a.com', 2: 'last@b.com', 3: 'c@c.com'}
+    assert (leads[1].lead_entry_day, leads[1].sales_purchased, leads[1].sales_interval) == (4, True, 6)
+    assert leads[1].appointment_date == pd.Timestamp('2025-03-10').to_pydatetime()
+    assert (leads[3].sales_purchased, leads[3].sales_interval, leads[3].appointment_date) == (False, None, None)
+    with Session(engine) as session:
+        rollup = {row.day: (row.lead_count, row.purchased_count) for row in session.query(DailyMktLeadsByStoreSource)}
+    assert rollup == {pd.Timestamp('2025-03-10').date(): (1, 1), None: (2, 0)}
+
+def test_copy_payload_escapes_text_and_nulls():
+    frame, _ = mkt_lead_frame(_funnel([1, 2, 3], ['a\tb\\c\nd', '', None]))
+
+    payloads = list(_copy_chunks(frame[['lead_id', 'lead_email', 'appointment_date', 'sales_purchased']], chunk_rows=2))
+
+    assert payloads == [
+        '1\ta\\tb\\\\c\\nd\t2025-03-10 00:00:00\tTrue\n2\t\t\\N\tFalse\n',
+        '3\t\\N\t\\N\tFalse\n',
+    ]
+
+def test_copy_falls_back_to_upserts_outside_postgresql(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'leads.db'}")
+    Base.metadata.create_all(engine)
+    frame, _ = mkt_lead_frame(_funnel([1, 2], ['a@a.com', 'b@b.com']))
+
+    stats, errors = copy_mkt_leads(frame, bind=engine)
+
+    assert (stats['inserted'], stats['updated'], errors) == (2, 0, [])
+
+def test_orm_writes_use_the_converted_rows(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'leads.db'}")
+    Base.metadata.create_all(engine)
+
+    with Session(engine) as session:
+        frame, _ = mkt_lead_frame(_funnel([1, 2], ['a@a.com', 'b@b.com']))
+        assert _write_mkt_leads_orm(session, mkt_lead_rows(frame)) == (2, 0)
+        session.commit()
+
+        frame, _ = mkt_lead_frame(_funnel([2, 3], ['new@b.com', 'c@c.com']))
+        assert _write_mkt_leads_orm(session, mkt_lead_rows(frame)) == (1, 1)
+        session.commit()
+
+        assert session.get(MktLead, 2).lead_email == 'new@b.com'
+        assert session.get(MktLead, 1).lead_entry_day == 4
+
+def test_checkpointed_push_resumes_from_the_failed_batch(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'leads.db'}")
+    Base.metadata.create_all(engine)
+    frame, _ = mkt_lead_frame(_funnel([1, 2, 3, 4, 5], ['a@a.com'] * 5))
+    rows = mkt_lead_rows(frame)
+    checkpoint = upload_hash(frame, 2)
+    broken = rows[:2] + [dict(rows[2], lead_email=object())] + rows[3:]
+
+    stats, errors = upsert_mkt_leads(broken, bind=engine, batch_size=2, checkpoint=checkpoint)
+
+    assert (stats['inserted'], stats['batches'], len(errors)) == (2, 2, 1)
+    with Session(engine) as session:
+        assert session.get(PushCheckpoint, checkpoint).committed_batches == 1
+
+    stats, errors = upsert_mkt_leads(rows, bind=engine, batch_size=2, checkpoint=checkpoint)
+
+    assert (stats['resumed_rows'], stats['inserted'], stats['batches'], errors) == (2, 3, 2, [])
+    assert len(stats['rows_per_second']) == 2
+    with Session(engine) as session:
+        assert session.query(MktLead).count() == 5
+        assert session.get(PushCheckpoint, checkpoint) is None
+    assert upload_hash(frame, 2) == checkpoint
+    assert upload_hash(frame, 3) != checkpoint
+    assert upload_hash(mkt_lead_frame(_funnel([1, 2, 3, 4, 5], ['b@a.com'] * 5))[0], 2) != checkpoint
+
+def test_copy_merges_into_postgresql(postgres_engine):
+    frame, _ = mkt_lead_frame(_funnel([1, 2], ['a\tb@a.com', None]))
+    stats, errors = copy_mkt_leads(frame, bind=postgres_engine, chunk_rows=1)
+
+    assert (stats['inserted'], stats['updated'], stats['batches'], errors) == (2, 0, 2, [])
+
+    frame, _ = mkt_lead_frame(_funnel([2, 3], ['b@b.com', 'c@c.com']))
+    stats, errors = copy_mkt_leads(frame, bind=postgres_engine)
+
+    assert (stats['inserted'], stats['updated'], errors) == (1, 1, [])
+    with Session(postgres_engine) as session:
+        assert {lead.lead_id: lead.lead_email for lead in session.query(MktLead)} == {1: 'a\tb@a.com', 2: 'b@b.com', 3: 'c@c.com'}
+        rollup = {row.day: (row.lead_count, row.purchased_count) for row in session.query(DailyMktLeadsByStoreSource)}
+    assert rollup == {pd.Timestamp('2025-03-10').date(): (2, 2), None: (1, 0)}
+
+    # A value too long for its column fails the whole load, nothing is merged
+    frame, _ = mkt_lead_frame(_funnel([4], ['x' * 200]))
+    stats, errors = copy_mkt_leads(frame, bind=postgres_engine)
+
+    assert (stats['errors'], len(errors)) == (1, 1)
+    assert errors[0].startswith('COPY load failed')
+    with Session(postgres_engine) as session:
+        assert session.get(MktLead, 4) is None
+
+def test_undated_rollup_bucket_is_refreshed_once_per_push(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'leads.db'}")
+    Base.metadata.create_all(engine)
+    refreshed = []
+
+    def refresh(conn, model, days):
+        refreshed.append(set(days))
+        refresh_rollups(conn, model, days)
+
+    monkeypatch.setattr(data_wrestler, 'refresh_rollups', refresh)
+    frame, _ = mkt_lead_frame(_funnel([1, 2, 3, 4], ['a@a.com'] * 4))
+
+    stats, errors = upsert_mkt_leads(mkt_lead_rows(frame), bind=engine, batch_size=1)
+
+    assert (stats['batches'], errors) == (4, [])
+    assert sum(None in days for days in refreshed) == 1
+    with Session(engine) as session:
+        rollup = {row.day: (row.lead_count, row.purchased_count) for row in session.query(DailyMktLeadsByStoreSource)}
+    assert rollup == {pd.Timestamp('2025-03-10').date(): (1, 1), None: (3, 0)}
@@ -0,0 +1,38 @@
+import sys
+from pathlib import Path
+# Add project root to sys.path for robust import resolution
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import threading
+import pandas as pd
+import helpers.db_writer as db_writer
+from helpers.db_writer import BackgroundWriter
+
+def test_pushes_run_in_the_background_and_report_progress(monkeypatch):
+    release = threading.Event()
+    pushed = []
+
+    def fake_save(df, mode, on_batch):
+        on_batch(1, 2)
+        release.wait(5)
+        on_batch(2, 2)
+        pushed.append((len(df), mode))
+        return len(df) > 1, f"{len(df)} rows"
+
+    monkeypatch.setattr(db_writer, 'save_data_to_db_batch', fake_save)
+    writer = BackgroundWriter()
+    ok = writer.submit(pd.DataFrame({'ID lead': [1, 2]}), label='ok')
+    bad = writer.submit(pd.DataFrame({'ID lead': [3]}), mode='orm')
+
+    # One push at a time: the second waits for the first
+    assert writer.job_status(ok)['status'] in ('queued', 'running')
+    assert writer.job_status(bad)['status'] == 'queued'
+    release.set()
+    writer._executor.shutdown(wait=True)
+
+    assert pushed == [(2, 'upsert'), (1, 'orm')]
+    assert {key: writer.job_status(ok)[key] for key in ('label', 'status', 'progress', 'message')} == {
+        'label': 'ok', 'status': 'done', 'progress': 1.0, 'message': '2 rows',
+    }
+    assert writer.job_status(bad)['status'] == 'failed'
+    assert writer.job_status('unknown') is None
@@ -0,0 +1,53 @@
+import sys
+from pathlib import Path
+# Add project root to sys.path for robust import resolution
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+import pandas as pd
+from helpers.identity import IdentityIndex, record_keys, resolve_customers
+
+def test_record_keys_normalize_and_skip_placeholders():
+    df = pd.DataFrame({
+        'phone': ['+55 11 9999-0000 / 11 3333-4444', 'Cliente sem telefone', '1111111111'],
+        'email': [' Ana@X.com', 'None', None],
+        'cpf': ['123.456.789-00', '000.000.000-00', None],
+    }, index=['a', 'b', 'c'])
+
+    keys = record_keys(df, phones='phone', emails='email', taxvats='cpf')
+
+    assert sorted(zip(keys.index, keys)) == [
+        (0, 'cpf:12345678900'), (0, 'email:ana@x.com'), (0, 'phone:1133334444'), (0, 'phone:11999990000'),
+    ]
+
+def test_records_sharing_keys_get_one_stable_customer_key():
+    leads = pd.DataFrame({'phone': ['11 99999-0000', '', '21 97777-6666'], 'email': ['ana@x.com', 'bia@x.com', None]}, index=[5, 6, 7])
+    appointments = pd.DataFrame({
+        'phone': ['11 3333-4444 / 11 99999-0000', '11 3333-4444', '31 95555-4444'],
+        'email': ['', 'bia@x.com', 'caio@x.com'],
+    })
+    sales = pd.DataFrame({'phones': [['31955554444'], ['41911112222']]})
+
+    lead_keys, appointment_keys, sale_keys = resolve_customers([
+        (leads, {'phones': 'phone', 'emails': 'email'}),
+        (appointments, {'phones': 'phone', 'emails': 'email'}),
+        (sales, {'phones': 'phones'}),
+    ])
+
+    # Ana and Bia are linked through the telephone the two appointments share
+    assert lead_keys.tolist() == ['email:ana@x.com', 'email:ana@x.com', 'phone:21977776666']
+    assert lead_keys.index.tolist() == [5, 6, 7]
+    assert appointment_keys.tolist() == ['email:ana@x.com', 'email:ana@x.com', 'email:caio@x.com']
+    assert sale_keys.tolist() == ['email:caio@x.com', 'phone:41911112222']
+
+def test_placeholder_keys_shared_by_too_many_records_are_ignored():
+    keys = pd.Series(['phone:1130000000', 'phone:1130000000', 'phone:1130000000', 'email:a@x.com'], index=[0, 1, 2, 2])
+
+    assert IdentityIndex().resolve([keys]) == [{0: 'email:a@x.com', 1: 'email:a@x.com', 2: 'email:a@x.com'}]
+    assert IdentityIndex(max_key_records=2).resolve([keys]) == [{2: 'email:a@x.com'}]
+
+def test_resolve_customers_caps_shared_keys_by_default():
+    reception = pd.DataFrame({'phone': ['11 3000-0000'] * 60, 'email': [f"c{i}@x.com" for i in range(60)]})
+
+    (customers,) = resolve_customers([(reception, {'phones': 'phone', 'emails': 'email'})])
+
+    assert customers.nunique() == 60